@@ -0,0 +1,326 @@
+"""
+Treasure, XP and valuation accounting of a finished dungeon.
+
+After the walk, account_dungeon goes through the room, wet monster and
+wandering monster records once. It rolls each monster's lair check, its
+treasure and the gem, jewellery and magic valuations of that treasure. The
+results are kept as records:
+
+- rooms: per room number, the level it is on and the record of its monster
+  and of the monster in its pool or lake
+- wandering: per wandering monster number, its level and the XP and
+  treasure of each of its entries
+- dungeon wide totals of XP, coins and valuations, and the total gold
+  equivalent
+
+The room key under the classic map (classic_mapper.level_notes_html) and
+the stats frame only read these records. So every figure is rolled once per
+dungeon, and a run without the classic map writes no room key at all.
+
+Everything that needs no roll is kept as running totals while the walk
+goes: count_room, count_wandering and count_trap add each room, wandering
+monster and trap as it is made, so the room treasure and its valuations, the
+monster, wet monster and wandering monster counts and XP, and the trap count
+can be read at any point of the walk. account_dungeon starts from these and
+only adds what it rolls.
+"""
+
+from treasure import roll_dice, select_gemstone, select_jewellery, select_magic_item, treasure_choice, update_gemstone
+
+
+TREASURE_KINDS = ['copper', 'silver', 'electrum', 'gold', 'platinum', 'gems', 'jewellery', 'magic']
+
+
+def empty_treasure():
+    return {kind: 0 for kind in TREASURE_KINDS}
+
+
+def add_treasure(total, treasure):
+    """Add a treasure roll to a running total, counting the items when magic is a list of them."""
+    for kind in TREASURE_KINDS:
+        if kind == 'magic' and isinstance(treasure['magic'], list): #if no data
+            total['magic'] = total['magic'] + len(treasure['magic'])
+        else:
+            total[kind] = total[kind] + treasure[kind]
+
+
+def monster_xp(details, xp_d, verbosity=0):
+    """XP of a monster record: XP times number, or a base per level for a character party."""
+    if isinstance(details['type'], dict):
+        # problems with no encounter here
+        if verbosity:
+            print("CHARACTER PARTY!")
+        xp = 0
+        for c in details['type']:
+            if 'level' in details['type'][c]: #hack for a base xp points based on DMG table
+                xp = xp + xp_d[details['type'][c]['level']]
+            else:
+                xp = xp + 20
+        return xp
+    if verbosity:
+        print("MNO:", details['No'], "WNXP", details['XP'])
+    return details['XP'] * details['No']
+
+
+def monster_record(details, xp_d, verbosity=0):
+    """
+    Roll the lair check, treasure and valuations of a room or wet monster.
+
+    Args:
+        details: The monster's contents record, with No, XP, type, lair,
+            treasure_individual and treasure_lair
+        xp_d: XP per level of character parties
+
+    Returns:
+        Dict of xp, lairtry, lair_roll (None when there is no lair chance),
+        inlair, has_treasure, treasure and valuations
+    """
+    record = {
+        'xp': monster_xp(details, xp_d, verbosity),
+        'lairtry': int(details['lair'].replace('%','')),
+        'lair_roll': None,
+        'inlair': False,
+        'has_treasure': len(details['treasure_individual'] + details['treasure_lair']) > 0,
+    }
+    monster_treasure = empty_treasure()
+    monster_valuations = {'gems':[],'jewellery':[], 'magic':[], 'magic_list':[], 'magic_xp':[], 'magic_values':[]}
+
+    if record['lairtry'] > 0:
+        record['lair_roll'] = roll_dice(1,100)
+        record['inlair'] = record['lair_roll'] <= record['lairtry']
+
+    if record['inlair']:
+        for t in details['treasure_lair']:
+            if 'x' not in t:
+                treasure = treasure_choice(t, details['No'])
+                #has been an exception here, maybe a treasure type problem in monster dict
+                try:
+                    add_treasure(monster_treasure, treasure)
+                except Exception as treasureE:
+                    print(details['treasure_lair'])
+                    print(treasure)
+                    print(treasureE)
+                    print("OBSCURE BUG TO FIX TRACKING") #H, S, T U
+                    quit()
+    else:
+        for t in details['treasure_individual']:
+            if 'x' not in t:
+                treasure = treasure_choice(t, details['No'])
+                for n in range(details['No']):
+                    if verbosity:
+                        print("MTMAGIC",monster_treasure['magic'],treasure['magic'])
+                    add_treasure(monster_treasure, treasure)
+
+    #do valuations
+    for g in range(monster_treasure['gems']):
+        base_value, description = select_gemstone()
+        monster_valuations['gems'].append(update_gemstone(base_value))
+    for g in range(monster_treasure['jewellery']):
+        base_value, description = select_jewellery()
+        monster_valuations['jewellery'].append(base_value)
+    for g in range(monster_treasure['magic']):
+        item, choice = select_magic_item()
+        monster_valuations['magic_list'].append([item, choice])
+    for m in monster_valuations['magic_list']:
+        monster_valuations['magic_xp'].append(m[1][1])
+        monster_valuations['magic_values'].append(m[1][2])
+
+    record['treasure'] = monster_treasure
+    record['valuations'] = monster_valuations
+    return record
+
+
+def add_monster_totals(accounting, record):
+    """Add a monster record's treasure and valuations to the dungeon's monster totals."""
+    if not record['has_treasure']:
+        return
+    add_treasure(accounting['monster_treasure'], record['treasure'])
+    totals = accounting['monster_valuations']
+    valuations = record['valuations']
+    totals['jewellery'] = totals['jewellery'] + valuations['jewellery']
+    totals['gems'] = totals['gems'] + valuations['gems']
+    totals['magic_list'] = totals['magic_list'] + valuations['magic_list']
+    totals['magic_xp'] = totals['magic_xp'] + valuations['magic_xp']
+    totals['magic_values'] = totals['magic_values'] + valuations['magic_values']
+
+
+def new_totals():
+    """Running totals of a dungeon with nothing walked yet."""
+    return {
+        'rooms': 0,
+        'room_treasure': empty_treasure(),
+        'room_valuations': {'gems': 0, 'jewellery': 0, 'magic': 0},
+        'monsters': 0,
+        'monster_xp': 0,
+        'wet_monsters': 0,
+        'wet_xp': 0,
+        'wandering': 0,
+        'wm_xp': 0,
+        'traps': 0,
+    }
+
+
+def wet_kind(shape):
+    """'pool' or 'lake' when a room's water has a monster in it, otherwise None."""
+    kind = None
+    if 'water' in shape and shape['water'] != 'N':
+        for wett in ['pool', 'lake']:
+            if wett in shape and 'monster_details' in shape[wett]:
+                kind = wett
+    return kind
+
+
+def count_room(totals, shape, xp_d, sign=1):
+    """
+    Add a finished room to the running totals.
+
+    Args:
+        totals: Running totals from new_totals
+        shape: The room's shape_dict, with its contents and water
+        xp_d: XP per level of character parties
+        sign: -1 takes back a room whose number is being given to another
+    """
+    totals['rooms'] += sign
+    if 'empty' not in shape['contents']:
+        for key in shape['contents']:
+            if key == 'treasure':
+                room_treasure = shape['contents'][key]
+                for tkey in totals['room_treasure']:
+                    totals['room_treasure'][tkey] = totals['room_treasure'][tkey] + sign * room_treasure['type'][tkey]
+                    #one value at a time, so the sum comes out as summing the whole list would
+                    if tkey in ('gems', 'jewellery') and room_treasure['type'][tkey] > 0:
+                        for value in room_treasure[tkey + '_values']:
+                            totals['room_valuations'][tkey] = totals['room_valuations'][tkey] + sign * value
+                    if tkey == 'magic' and room_treasure['type'][tkey] > 0:
+                        for value in room_treasure['magic_values']:
+                            totals['room_valuations']['magic'] = totals['room_valuations']['magic'] + sign * int(value)
+            if key == 'monster':
+                totals['monsters'] += sign
+                totals['monster_xp'] = totals['monster_xp'] + sign * monster_xp(shape['contents'][key], xp_d)
+
+    kind = wet_kind(shape)
+    if kind is not None:
+        xp = sign * monster_xp(shape[kind]['monster_details'], xp_d)
+        totals['monsters'] += sign
+        totals['monster_xp'] = totals['monster_xp'] + xp
+        totals['wet_monsters'] += sign
+        totals['wet_xp'] = totals['wet_xp'] + xp
+
+
+def count_wandering(totals, details, xp_d):
+    """Add a wandering monster's record to the running totals."""
+    totals['wandering'] += 1
+    totals['wm_xp'] = totals['wm_xp'] + monster_xp(details, xp_d)
+
+
+def count_trap(totals):
+    totals['traps'] += 1
+
+
+def stack_totals(room_stack, wandering_monster_stack, trap_stack, xp_d):
+    """Running totals of stacks walked elsewhere, e.g. merged level shards."""
+    totals = new_totals()
+    for room in room_stack.get('shape_dict', {}):
+        count_room(totals, room_stack['shape_dict'][room], xp_d)
+    for wm in range(wandering_monster_stack['key_count']):
+        for key in wandering_monster_stack[wm+1]:
+            count_wandering(totals, wandering_monster_stack[wm+1][key], xp_d)
+    totals['traps'] = trap_stack['key_count']
+    return totals
+
+
+def totals_text(totals):
+    """One line summary of the running totals, for progress output."""
+    treasure = totals['room_treasure']
+    return ("ROOMS: " + str(totals['rooms']) + " MONSTERS: " + str(totals['monsters']) + " (" + str(totals['wet_monsters']) + " wet) XP: " + str(totals['monster_xp'])
+            + " WM: " + str(totals['wandering']) + " XP: " + str(totals['wm_xp']) + " TRAPS: " + str(totals['traps'])
+            + " ROOM GP: " + str(treasure['copper'] / 100.0 + treasure['silver'] / 10.0 + treasure['electrum']/2.0 + treasure['gold'] + treasure['platinum'] * 10))
+
+
+def account_dungeon(room_stack, wandering_monster_stack, xp_d, verbosity=0, totals=None):
+    """
+    Account for every room, wet monster and wandering monster once.
+
+    Args:
+        room_stack: Room records from the walk
+        wandering_monster_stack: Wandering monster records from the walk
+        xp_d: XP per level of character parties
+        verbosity: Print debugging output
+        totals: Running totals kept during the walk, rebuilt from the stacks
+            when not given
+
+    Returns:
+        Accounting dict of records and totals, see the module docstring
+    """
+    if totals is None:
+        totals = stack_totals(room_stack, wandering_monster_stack, {'key_count': 0}, xp_d)
+    accounting = {
+        'rooms': {},
+        'wandering': {},
+        'monsters': totals['monsters'],
+        'monster_xp': totals['monster_xp'],
+        'wet_monsters': totals['wet_monsters'],
+        'room_treasure': dict(totals['room_treasure']),
+        'room_valuations': dict(totals['room_valuations']),
+        'monster_treasure': empty_treasure(),
+        'monster_valuations': {'gems':[],'jewellery':[], 'magic':[], 'magic_xp':[], 'magic_values':[], 'magic_list':[]},
+        'wm_xp': totals['wm_xp'],
+        'wm_treasure': empty_treasure(),
+    }
+
+    for room in room_stack.get('shape_dict', {}):
+        shape = room_stack['shape_dict'][room]
+        keylist = list(room_stack[room].keys())
+        if verbosity:
+            print(keylist,room_stack[room][keylist[0]])
+        record = {'level': abs(keylist[0][2]) - 1, 'monster': None, 'wet': None, 'wet_kind': None}
+
+        if 'empty' not in shape['contents'] and 'monster' in shape['contents']:
+            record['monster'] = monster_record(shape['contents']['monster'], xp_d, verbosity)
+            add_monster_totals(accounting, record['monster'])
+
+        record['wet_kind'] = wet_kind(shape)
+        if record['wet_kind'] is not None:
+            ## doing second round of monster accounting
+            record['wet'] = monster_record(shape[record['wet_kind']]['monster_details'], xp_d, verbosity)
+            add_monster_totals(accounting, record['wet'])
+        if verbosity and 'water' in shape and shape['water'] != 'N':
+            print("HAS WATER TO DO")
+
+        accounting['rooms'][room] = record
+
+    for wm in range(wandering_monster_stack['key_count']):
+        wmkeylist = list(wandering_monster_stack[wm+1].keys())
+        entries = []
+        for key in wandering_monster_stack[wm+1]:
+            details = wandering_monster_stack[wm+1][key]
+            if verbosity:
+                print("LOOP:",wm,"WMKEY:",wandering_monster_stack[wm+1])
+            entry = {'xp': details['XP'] * details['No'], 'encounter': 'NO-ENCOUNTER' not in details['type'], 'treasures': []}
+            if entry['encounter']:
+                #treasures
+                for t in details['treasure_individual']:
+                    if 'x' not in t:
+                        treasure = treasure_choice(t, details['No'])
+                        add_treasure(accounting['wm_treasure'], treasure)
+                        entry['treasures'].append(treasure)
+            entries.append(entry)
+        accounting['wandering'][wm] = {'level': abs(wmkeylist[0][2]) - 1, 'entries': entries}
+
+    total_treasure = empty_treasure()
+    for kind in TREASURE_KINDS:
+        total_treasure[kind] = accounting['room_treasure'][kind] + accounting['wm_treasure'][kind] + accounting['monster_treasure'][kind]
+    accounting['total_treasure'] = total_treasure
+
+    accounting['coins'] = total_treasure['copper'] / 100.0 + total_treasure['silver'] / 10.0 + total_treasure['electrum']/2.0 + total_treasure['gold'] + total_treasure['platinum'] * 10
+    accounting['gems_value'] = 0
+    accounting['jewellery_value'] = 0
+    accounting['magic_value'] = 0
+    if total_treasure['gems'] > 0:
+        accounting['gems_value'] = sum(accounting['monster_valuations']['gems'], accounting['room_valuations']['gems'])
+    if total_treasure['jewellery'] > 0:
+        accounting['jewellery_value'] = sum(accounting['monster_valuations']['jewellery'], accounting['room_valuations']['jewellery'])
+    if total_treasure['magic'] > 0:
+        accounting['magic_value'] = sum((int(m) for m in accounting['monster_valuations']['magic_values']), accounting['room_valuations']['magic'])
+    accounting['gold_equivalent'] = accounting['coins'] + accounting['gems_value'] + accounting['jewellery_value'] + accounting['magic_value']
+    return accounting
@@ -0,0 +1,138 @@
+"""
+Multi-process batch engine for running many dungeon simulations.
+
+The generator is pure Python, so threads serialise on the GIL. This runs
+dungeon_sim in a spawn-context process pool instead:
+
+- tasks are submitted in chunks so each worker call amortises its overhead
+- every worker runs an initialiser that imports the generator (and pandas,
+  numpy) once, before its first task
+- only a bounded number of chunks are in flight at any time
+- every task gets a deterministic seed derived from the batch seed and its
+  index, so a run can be reproduced regardless of which worker ran it
+- results are yielded back as soon as their chunk finishes
+"""
+
+import concurrent.futures
+import hashlib
+import multiprocessing as mp
+import os
+import random
+import traceback
+
+
+def task_seed(base_seed, index):
+    """Derive a stable 64 bit seed for task index of a batch."""
+    digest = hashlib.sha256((str(base_seed) + ':' + str(index)).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def make_task(index, base_seed, usepath, periodic_checks, verbosity=0, rooms_check=0, levels_check=0, seed=None, outputs=None):
+    """
+    Build a task dict for run_task.
+
+    seed overrides the one derived from base_seed. outputs is the list of
+    output sinks the run writes (see output_sinks), None for the defaults.
+    """
+    return {
+        'index': index,
+        'seed': task_seed(base_seed, index) if seed is None else seed,
+        'usepath': usepath,
+        'periodic_checks': periodic_checks,
+        'verbosity': verbosity,
+        'rooms_check': rooms_check,
+        'levels_check': levels_check,
+        'outputs': outputs,
+    }
+
+
+def warm_worker():
+    """
+    Process pool initialiser: import the generator modules once per worker.
+
+    The monster tables are plain dict literals rebuilt by every dungeon_sim
+    call (about 0.1 ms), so only the imports are worth paying up front.
+    """
+    import numpy
+    import pandas
+    import dungeon_simulation
+    import output_sinks
+    import monsters
+    import treasure
+
+
+def run_task(task):
+    """
+    Run a single simulation task in the current process.
+
+    Returns:
+        Tuple of (task, stats row dict or None, formatted traceback or None)
+    """
+    from dungeon_simulation import dungeon_sim
+
+    random.seed(task['seed'])
+    try:
+        df = dungeon_sim(task['index'], task['usepath'], task['periodic_checks'], task['verbosity'], task['rooms_check'], task['levels_check'], task.get('outputs'))
+        row = df.to_dict('records')[0]
+        row['seed'] = task['seed']
+        return task, row, None
+    except Exception:
+        return task, None, traceback.format_exc()
+
+
+def render_task(task, outputs=('classic', 'enhanced')):
+    """
+    Rerun a finished task with map output switched on.
+
+    The task seed makes the run repeat exactly, so a stats-only batch can
+    render any dungeon it is interested in afterwards.
+    """
+    return run_task(dict(task, outputs=list(outputs)))
+
+
+def run_chunk(chunk):
+    """Run a list of tasks in one worker call."""
+    return [run_task(task) for task in chunk]
+
+
+def chunked(tasks, chunksize):
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(tasks, workers=None, chunksize=4, max_inflight=None):
+    """
+    Run tasks across a process pool, yielding results as they finish.
+
+    Args:
+        tasks: Iterable of task dicts from make_task (consumed lazily)
+        workers: Number of worker processes, defaults to the CPU count
+        chunksize: Tasks per worker call
+        max_inflight: Maximum chunks submitted but not finished, defaults to 2 per worker
+
+    Yields:
+        Tuples of (task, stats row dict or None, formatted traceback or None)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_inflight is None:
+        max_inflight = workers * 2
+
+    ctx = mp.get_context("spawn")
+    chunks = chunked(tasks, chunksize)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=warm_worker) as executor:
+        inflight = set()
+        for chunk in chunks:
+            inflight.add(executor.submit(run_chunk, chunk))
+            if len(inflight) >= max_inflight:
+                done, inflight = concurrent.futures.wait(inflight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in concurrent.futures.as_completed(inflight):
+            yield from future.result()
@@ -0,0 +1,321 @@
+"""
+Streaming aggregation of batch simulation statistics.
+
+Each run's stats row is appended to disk as soon as it arrives, either as a
+CSV row or, for the columnar format, as raw float64 values appended to one
+file per numeric column (readable with numpy.fromfile). Running aggregates -
+count, mean, variance, min/max and P-squared quantile estimates - are kept
+for rooms, levels, XP and GP, so memory stays constant however many runs a
+batch has and a crash only loses the row being written.
+"""
+
+import csv
+import json
+import math
+import numbers
+import os
+import struct
+
+
+# metric name -> function of a stats row
+METRICS = {
+    'rooms': lambda row: row['rooms'],
+    'levels': lambda row: row['z'],
+    'xp': lambda row: row['monster_xp'] + row['wm_xp'],
+    'gp': lambda row: row['Total Gold Equivalent'],
+}
+
+# stats columns the metrics above are built from
+METRIC_COLUMNS = ['rooms', 'z', 'monster_xp', 'wm_xp', 'Total Gold Equivalent']
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class P2Quantile:
+    """P-squared streaming quantile estimate (Jain & Chlamtac) with five markers."""
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        h = self.heights
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                q = self.parabolic(i, d)
+                if not h[i - 1] < q < h[i + 1]:
+                    q = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = q
+                n[i] += d
+
+    def parabolic(self, i, d):
+        h = self.heights
+        n = self.positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        h = self.heights
+        if not h:
+            return None
+        if len(h) < 5:
+            return sorted(h)[min(len(h) - 1, int(round(self.p * (len(h) - 1))))]
+        return h[2]
+
+
+class RunningStats:
+    """Count, mean, variance (Welford), min/max and quantiles of one metric."""
+
+    def __init__(self, quantiles=QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+
+    def add(self, x):
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        for q in self.quantiles.values():
+            q.add(x)
+
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'variance': self.variance(),
+            'std': math.sqrt(self.variance()),
+            'min': self.min,
+            'max': self.max,
+            'quantiles': {str(p): q.value() for p, q in self.quantiles.items()},
+        }
+
+
+def is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def to_float(value):
+    """Parse a CSV cell, None when it is empty or not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def truncate_torn_line(path, block=1 << 16):
+    """Cut a file back to its last newline, dropping a partly written last line."""
+    with open(path, 'rb+') as fd:
+        end = fd.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block)
+            fd.seek(start)
+            chunk = fd.read(pos - start)
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            pos = start
+        else:
+            keep = 0
+        if keep < end:
+            fd.truncate(keep)
+
+
+class StatsSink:
+    """
+    Append-only stats writer with online aggregates.
+
+    Args:
+        path: CSV file, or directory for the columnar format
+        fmt: 'csv' or 'columnar'
+        summary_every: Rewrite the summary JSON after this many rows
+        resume: Keep an existing output and append to it, otherwise start over
+
+    Resuming streams the rows already on disk back through the aggregates. A
+    row torn by a crash - a CSV line without its newline, or column files of
+    different lengths - is cut off first so the next row starts clean.
+    """
+
+    def __init__(self, path, fmt='csv', summary_every=100, resume=False):
+        self.path = path
+        self.fmt = fmt
+        self.summary_every = summary_every
+        self.stats = {name: RunningStats() for name in METRICS}
+        self.fieldnames = None
+        self.fd = None
+        self.writer = None
+        self.columns = {}
+
+        if fmt == 'csv':
+            self.summary_path = path + '.summary.json'
+            if os.path.exists(path):
+                if resume:
+                    self.resume_csv()
+                else:
+                    os.remove(path)
+        elif fmt == 'columnar':
+            self.summary_path = os.path.join(path, 'summary.json')
+            if not os.path.exists(path):
+                os.makedirs(path)
+            if resume:
+                self.resume_columnar()
+            else:
+                self.clear_columnar()
+        else:
+            raise ValueError('unknown stats format: ' + str(fmt))
+
+    def resume_csv(self):
+        truncate_torn_line(self.path)
+        with open(self.path, newline='') as fd:
+            reader = csv.DictReader(fd)
+            self.fieldnames = reader.fieldnames
+            for row in reader:
+                self.aggregate({key: to_float(row.get(key)) for key in METRIC_COLUMNS})
+
+    def resume_columnar(self):
+        schema_path = os.path.join(self.path, 'schema.json')
+        if not os.path.exists(schema_path):
+            return
+        with open(schema_path) as fd:
+            self.fieldnames = json.load(fd)
+
+        #a crash part way through a row leaves some columns one value longer,
+        #cut them all back to the last complete row
+        paths = [os.path.join(self.path, name + '.f8') for name in self.fieldnames]
+        rows = min(os.path.getsize(p) // 8 if os.path.exists(p) else 0 for p in paths) if paths else 0
+        for p in paths:
+            with open(p, 'ab') as fd:
+                fd.truncate(rows * 8)
+
+        readers = {name: open(os.path.join(self.path, name + '.f8'), 'rb') for name in METRIC_COLUMNS if name in self.fieldnames}
+        try:
+            for i in range(rows):
+                row = {name: struct.unpack('<d', fd.read(8))[0] for name, fd in readers.items()}
+                self.aggregate(row)
+        finally:
+            for fd in readers.values():
+                fd.close()
+
+    def clear_columnar(self):
+        schema_path = os.path.join(self.path, 'schema.json')
+        if not os.path.exists(schema_path):
+            return
+        with open(schema_path) as fd:
+            names = json.load(fd)
+        for name in names:
+            p = os.path.join(self.path, name + '.f8')
+            if os.path.exists(p):
+                os.remove(p)
+        os.remove(schema_path)
+
+    def aggregate(self, row):
+        for name, metric in METRICS.items():
+            try:
+                self.stats[name].add(metric(row))
+            except (KeyError, TypeError, ValueError):
+                pass
+
+    def add(self, row):
+        """Append one run's stats row and update the aggregates."""
+        if self.fieldnames is None:
+            self.fieldnames = list(row.keys())
+        if self.fmt == 'csv':
+            self.write_csv(row)
+        else:
+            self.write_columnar(row)
+        self.aggregate(row)
+
+        if self.stats['rooms'].count % self.summary_every == 0:
+            self.write_summary()
+
+    def write_csv(self, row):
+        if self.writer is None:
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self.fd = open(self.path, 'a', newline='')
+            self.writer = csv.DictWriter(self.fd, fieldnames=self.fieldnames, extrasaction='ignore')
+            if new_file:
+                self.writer.writeheader()
+        self.writer.writerow(row)
+        self.fd.flush()
+
+    def write_columnar(self, row):
+        if not self.columns:
+            numeric = [key for key in self.fieldnames if is_number(row.get(key))]
+            schema_path = os.path.join(self.path, 'schema.json')
+            if not os.path.exists(schema_path):
+                with open(schema_path, 'w') as fd:
+                    json.dump(numeric, fd)
+            else:
+                with open(schema_path) as fd:
+                    numeric = json.load(fd)
+            self.fieldnames = numeric
+            self.columns = {key: open(os.path.join(self.path, key + '.f8'), 'ab') for key in numeric}
+        for key, fd in self.columns.items():
+            value = row.get(key)
+            fd.write(struct.pack('<d', float(value) if is_number(value) else math.nan))
+            fd.flush()
+
+    def summary(self):
+        return {name: stat.summary() for name, stat in self.stats.items()}
+
+    def write_summary(self):
+        tmp_path = self.summary_path + '.tmp'
+        with open(tmp_path, 'w') as fd:
+            json.dump(self.summary(), fd, indent=2)
+        os.replace(tmp_path, self.summary_path)
+
+    def close(self):
+        self.write_summary()
+        if self.fd is not None:
+            self.fd.close()
+        for fd in self.columns.values():
+            fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
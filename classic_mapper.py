@@ -0,0 +1,498 @@
+"""
+Classic dungeon mapper: the original colour coded HTML table map.
+
+Each level is written as dungeon_N.html, one <td> per cell, followed by the
+room key, accounting totals, level links and legend. level_notes_html writes
+those from the records of accounting.py, so nothing is rolled here.
+
+Levels are padded to the whole dungeon's x/y extent, so most squares are
+empty rock ('B'). Runs of those are written as one colspan cell, and a level
+can also be cropped to its own extent with crop_level.
+"""
+
+import itertools
+
+import numpy as np
+
+
+CLASSIC_HEAD = '''
+
+        <html>
+        <head>
+        <title>DUNGEON 
+        ''' 
+
+CLASSIC_STYLE = '''
+        <style>
+            table,
+            th,
+            td {
+                padding: 10px;
+                border: 1px solid black;
+                border-collapse: collapse;
+                width:auto
+            }
+            .red_background {
+                    background-color: red;
+                }
+            .green_background {
+                    background-color: green;
+                }
+            .gray_background {
+                    background-color: gray;
+                }
+            .grey_background {
+                    background-color: grey;
+                }
+            .brown_background {
+                    background-color: brown;
+                }
+
+            .blue_background {
+                    background-color: blue;
+                }
+            .black_background {
+                    background-color: black;
+                }
+            col {
+                    width: 2em;
+                }
+
+            divl {
+                border-left-style: dotted
+            }            
+            divr {
+                border-right-style: dotted
+            }            
+            divt {
+                border-top-style: dotted
+            }            
+            divb {
+                border-bottom-style: dotted
+            }            
+
+
+            </style>
+        </head>
+        <body>
+        <table>
+        '''
+
+# legend under the room key
+NOTES_LEGEND = {
+    'O': "Outside Entrance",
+    'C': "Corridor/Passage",
+    'R': "Chamber/Room",
+    'D': "Dead End",
+    'CH': "Chasm",
+    'ri': "river",
+    'br': "bridge",
+    'bo': "boat - opposide side",
+    'bn': "boat - near side",
+    'L': "Lake",
+    'P': "Pool",
+    'W': "Well",
+    'S': "Shaft",
+    'd': "door",
+    ':': "direction of Door",
+    'wm': "Wandering Monster",
+    'sd': "Secret Door",
+    'st': "Stairs",
+    'sn': "Stairs dead end",
+    'ch': "Chute",
+    'cm': "Chimney",
+    'td': "Trapdoor",
+    'pi': "Pit Trap",
+    'pt': "Pit Trap: Secret Door",
+    'ps': "Pit Trap: Spikes",
+    'pc': "Pit Trap: Crushing Walls",
+    'el': "Elevator Trap",
+    'ar': "Arrow Trap",
+    'sp': "Spear Trap",
+    'df': "Door Falls Trap",
+    'sf': "Stone Falls Trap",
+    'gs': "Gas Trap",
+    'bw': "Blocked Wall Trap",
+    'ol': "Oil Trap",
+    'm': "Monster",
+    't': "Treasure",
+    'p': "Treasure: Platinum",
+    'c': "Treasure: Copper",
+    's': "Treasure: Silver",
+    'e': "Treasure: Electrum",
+    'g': "Treasure: Gold",
+    'G': "Treasure: Gems",
+    'j': "Treasure: Jewellery",
+    'M': "Treasure: Magic",
+}
+
+NOTES_BACKGROUNDS = {
+    'black': 'nothing',
+    'green': 'outside entrance',
+    'blue': 'water',
+    'red': 'bad_things',
+    'white': 'corridor/passage',
+    'brown': 'dead end',
+}
+
+ENHANCED_LINK_STYLE = 'display: inline-block; background: linear-gradient(135deg, #ffd700 0%, #ffed4e 100%); color: #000; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: bold; margin-bottom: 10px;'
+
+CLASSIC_END = '''
+        </body>
+        </html>
+        '''
+
+
+def colorcheck(dungeonstr):
+    '''
+    html coloring for copper, silver, electrum, gold, platinum, Gems, jewellery, Magic
+    '''
+
+    if 'c' in dungeonstr:
+        return '#B87333'
+    elif 'g' in dungeonstr:
+        return '#FFD700'
+    elif 'p' in dungeonstr:
+        return '#E5E4E2'
+    elif 'e' in dungeonstr:
+        return '#E7G697'
+    elif 'G' in dungeonstr:
+        return '#B9F2FF'
+    elif 'j' in dungeonstr:
+        return '#E0115F '
+    elif 'M' in dungeonstr: 
+        return '#FF1493'
+    elif 's' in dungeonstr:
+        if 'sd' not in dungeonstr:
+            return '#C0C0C0'
+        else:
+            return '#EAEAEA'
+    else:
+        return 'notreasure'
+
+
+def classic_head(level_num):
+    """Return the page head and opening <table> tag for a level (0-indexed)."""
+    return CLASSIC_HEAD + str(level_num+1) + '</title>' + CLASSIC_STYLE
+
+
+BORDERS = {
+    'l': ('<divl>', '</divl>'),
+    'r': ('<divr>', '</divr>'),
+    't': ('<divt>', '</divt>'),
+    'b': ('<divb>', '</divb>'),
+}
+
+# border_index side -> dotted border, dead end angles are drawn on the left
+SIDE_BORDERS = {'xmin': 'l', 'xmax': 'r', 'ymin': 't', 'ymax': 'b'}
+
+
+def cell_kind(fill):
+    """Which colour branch of the map a fill code falls in."""
+    if fill == 'B':
+        return 'B'
+    #water [boats/bridges]
+    elif 'CH' in fill:
+        #differentiate from blue bridges
+        return 'CH'
+    elif 'P' in fill or 'L' in fill or 'W' in fill or 'S' in fill or 'br' in fill or 'bn' in fill or 'bo' in fill or 'ri' in fill:
+        return 'water'
+    elif 'C' in fill:  #could have door markers etc
+        return 'C'
+    elif 'R' in fill:  #could have numbering
+        return 'R'
+    elif 'D' in fill:
+        return 'D'
+    elif fill == 'O':
+        return 'O'
+    else:
+        return 'other'
+
+
+def room_number_text(fill):
+    """What is left of a room fill once the letters are taken out, the room number for R12sd."""
+    usestr = fill
+    for letters in ['R', 'sd', 'c', 'e', 'g', 'j', 'G', 'm', 'p', 's', 't', 'w']:
+        usestr = usestr.replace(letters, '')
+    return usestr
+
+
+def room_td(fill, border=None):
+    """<td> for a room square, with the secret door border on side border if given."""
+    color = colorcheck(fill)
+    if color == 'notreasure':
+        td = '<td class="gray_background">'
+    else:
+        td = '<td class="gray_background" style="color:' + color + '">'
+    if border is not None:
+        td = td + BORDERS[border][0] + fill + BORDERS[border][1] + '</td>'
+    else:
+        td = td + fill + '</td>'
+
+    usestr = fill
+    if 'sd' in fill:
+        usestr = room_number_text(fill)
+    if 'd' in usestr and 's' not in usestr:  #number and d
+        td = '<td class="gray_background" style="color:' + color + '">' + BORDERS['b'][0] + fill + BORDERS['b'][1] + '</td>'
+    return td
+
+
+def cell_template(fill):
+    """
+    <td> for a fill code, for every square whose look depends only on its fill.
+
+    Returns:
+        The <td> string, or None for secret doors, whose border depends on
+        where they are
+    """
+    kind = cell_kind(fill)
+    if kind == 'B':
+        return '<td class="black_background">' + fill + '</td>'
+    elif kind == 'CH':
+        return '<td class="brown_background">' + fill + '</td>'
+    elif kind == 'water':
+        return '<td class="blue_background">' + fill + '</td>'
+    elif kind == 'C':
+        usestr = fill.replace('C','')
+        if 'd' in usestr and 's' not in usestr:  #number and d
+            return '<td>' + BORDERS['b'][0] + fill + BORDERS['b'][1] + '</td>'
+        return '<td>' + fill + '</td>'
+    elif kind == 'R':
+        if 'sd' in fill:
+            return None
+        return room_td(fill)
+    elif kind == 'D':
+        if 'sd' in fill:
+            return None
+        return '<td class="brown_background">' + fill + '</td>'
+    elif kind == 'O':
+        return '<td class="green_background">' + fill + '</td>'
+    else:
+        return '<td class="red_background">' + fill + '</td>'
+
+
+def secret_door_td(fill, coord, border_index, error_dict, VERBOSITY=0):
+    """<td> for a room or dead end square with a secret door, bordered on the door's side."""
+    side = border_index.get(coord)
+    if cell_kind(fill) == 'R':
+        if side is None:
+            return room_td(fill)
+        if VERBOSITY:
+            print("found a secret door!", coord)
+        return room_td(fill, SIDE_BORDERS.get(side, 'l'))
+
+    if side is None:
+        error_dict[error_dict['key_count']] = str(KeyError(coord)) + " dead end output 3976"
+        error_dict['key_count'] += 1
+        if VERBOSITY:
+            print("ERROR no dead end at", coord)
+        return '<td class="brown_background">' + fill + '</td>'
+    if VERBOSITY:
+        print("found Dead End Secret door")
+    border = SIDE_BORDERS.get(side, 'l')
+    return '<td class="brown_background">' + BORDERS[border][0] + fill + BORDERS[border][1] + '</td>'
+
+
+def crop_level(level, coord_limits):
+    """
+    Cut a level down to the squares that are not empty rock.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1)
+        coord_limits: Tuple of (min_coords, max_coords) of the whole dungeon
+
+    Returns:
+        Tuple of (cropped level, coord_limits of the cropped level), the
+        level unchanged if it is all rock
+    """
+    used = level[:, :, 0] != 'B'
+    xs = np.flatnonzero(used.any(axis=1))
+    ys = np.flatnonzero(used.any(axis=0))
+    if len(xs) == 0:
+        return level, coord_limits
+    xmin, ymin, zmin = coord_limits[0]
+    xmax, ymax, zmax = coord_limits[1]
+    cropped = level[xs[0]:xs[-1]+1, ys[0]:ys[-1]+1, :]
+    limits = ((xmin + int(xs[0]), ymin + int(ys[0]), zmin), (xmin + int(xs[-1]), ymin + int(ys[-1]), zmax))
+    return cropped, limits
+
+
+def classic_table(level, down, border_index, coord_limits, error_dict, VERBOSITY=0, colspan=True):
+    """
+    Build the map rows of one level as HTML table rows.
+
+    Each distinct fill code is turned into its <td> once and reused; only
+    secret door squares are looked up by coordinate.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1)
+        down: The level number (0-indexed)
+        border_index: Wall side of each secret door and dead end, keyed by coordinate
+        coord_limits: Tuple of (min_coords, max_coords)
+        error_dict: Error log, lookup failures are added to it
+        VERBOSITY: Print debugging output
+        colspan: Write runs of empty rock as one cell spanning the run
+
+    Returns:
+        HTML string of the <TR> rows
+    """
+    xmin, ymin, zmin = coord_limits[0]
+    templates = {}
+    rows = []
+    if colspan:
+        #fixed column widths, so columns that are only ever spanned keep their size
+        rows.append('<colgroup><col span="' + str(level.shape[0]) + '"></colgroup>')
+    #rows of the table run along y
+    for j, column in enumerate(level[:, :, 0].T.tolist()):
+        cells = []
+        i = 0
+        for fill, run in itertools.groupby(column):
+            count = len(list(run))
+            if fill == 'B' and colspan and count > 1:
+                cells.append('<td class="black_background" colspan="' + str(count) + '">B</td>')
+                i += count
+                continue
+            if fill not in templates:
+                templates[fill] = cell_template(fill)
+            td = templates[fill]
+            for k in range(count):
+                if templates[fill] is None:
+                    td = secret_door_td(fill, (i+xmin,j+ymin,0 - down -1), border_index, error_dict, VERBOSITY)
+                cells.append(td)
+                i += 1
+        rows.append('<TR>' + ''.join(cells) + '</TR>')
+    return ''.join(rows)
+
+
+def generate_classic_html(level, down, notes, border_index, coord_limits, error_dict, VERBOSITY=0, colspan=True, crop=False):
+    """
+    Generate the classic HTML page for one level.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1)
+        down: The level number (0-indexed)
+        notes: HTML for the room key, totals, links and legend under the map
+        border_index: Wall side of each secret door and dead end, keyed by coordinate
+        coord_limits: Tuple of (min_coords, max_coords)
+        error_dict: Error log, lookup failures are added to it
+        VERBOSITY: Print debugging output
+        colspan: Write runs of empty rock as one spanning cell
+        crop: Cut the level to its own extent instead of the whole dungeon's
+
+    Returns:
+        HTML string for the level
+    """
+    if crop:
+        level, coord_limits = crop_level(level, coord_limits)
+    return ''.join([
+        classic_head(down),
+        classic_table(level, down, border_index, coord_limits, error_dict, VERBOSITY, colspan),
+        '</table>',
+        notes,
+        CLASSIC_END,
+    ])
+
+
+def monster_notes(record, heading, VERBOSITY=0):
+    """Room key lines of a room or wet monster's accounting record."""
+    notes = []
+    if VERBOSITY and record['lair_roll'] is not None:
+        notes.append("LairTry:" + str(record['lair_roll']) + ' from ' + str(record['lairtry']))
+    if record['inlair'] and (VERBOSITY or heading != 'room'):
+        notes.append(' is in lair: ' + str(record['inlair'])  + '<br>')
+    if record['has_treasure'] and record['inlair']:
+        if heading == 'room':
+            notes.append('<i>Monster Lair Treasure:</i>')
+        else:
+            notes.append('<h5>Wet Monster Lair Treasure:</h5>')
+        notes.append(str(record['treasure']) + '<br>')
+        notes.append(str(record['valuations']) + '<br>')
+        if heading != 'room':
+            notes.append('<br>')
+    return notes
+
+
+def level_notes_html(run, down):
+    """
+    Room key, wandering monsters, dungeon totals, level links and legend under a level's map.
+
+    Args:
+        run: Run dict from dungeon_sim, with its accounting records
+        down: The level number (0-indexed)
+
+    Returns:
+        HTML string
+    """
+    room_stack = run['room_stack']
+    wandering_monster_stack = run['wandering_monster_stack']
+    accounting = run['accounting']
+    VERBOSITY = run['verbosity']
+    notes = []
+
+    for room, record in accounting['rooms'].items():
+        if record['level'] != down:
+            continue
+        shape = room_stack['shape_dict'][room]
+        if VERBOSITY:
+            notes.append('<h4>Data: ' + str(room) + '</h4>')
+            notes.append(str(shape) + '<br>')
+        notes.append('<br><b>Key ' + str(room) + ': </b>')
+        if 'empty' in shape['contents']:
+            notes.append('Empty<br>')
+        else:
+            for key in shape['contents']:
+                if key == 'monster' or key == 'treasure' or key == 'trap' or key == 'level':
+                    notes.append(str(key) + ":" + str(shape['contents'][key]) + '<br>')
+                    if key == 'monster':
+                        notes.extend(monster_notes(record['monster'], 'room', VERBOSITY))
+        if 'water' in shape and shape['water'] != 'N':
+            for wett in ['pool', 'lake']:
+                if wett in shape:
+                    notes.append("water:" + str(shape[wett]) + '<br>')
+            if record['wet'] is not None:
+                notes.extend(monster_notes(record['wet'], 'wet', VERBOSITY))
+
+    notes.append('<br>')
+    for wm, record in accounting['wandering'].items():
+        if record['level'] != down:
+            continue
+        notes.append('<b>Wandering Monster ' + str(wm) + ': </b>')
+        notes.append(str(wandering_monster_stack[wm+1]) + ' ')
+        for entry in record['entries']:
+            if entry['encounter']:
+                notes.append(" - XP:" + str(entry['xp']) + '<br>')
+            for treasure in entry['treasures']:
+                notes.append("Treasure:" + str(treasure) + '<br>')
+
+    room_valuations = accounting['room_valuations']
+    notes.append('<br><b>Full Dungeon Stats:</b><br>')
+    notes.append('<br>' + "Monster Total XP: " + str(accounting['monster_xp']) + '<br>')
+    notes.append('' + "Monster Total Treasure: " + str(accounting['monster_treasure']) + " Total Valuations: " + str(accounting['monster_valuations']) + '<br>')
+    notes.append('<br>' + "Wandering Monster Total XP: " + str(accounting['wm_xp']) + '<br>')
+    notes.append('' + "Wandering Monster Total Treasure: " + str(accounting['wm_treasure']) + '<br>')
+    if VERBOSITY:
+        notes.append('<br>' + "Wandering Monster Subtable:" + str(run['wandering_monster_subtable']) + '<br>')
+    notes.append('<br>' + "Room Total Treasure:" + str(accounting['room_treasure']) + '<br>')
+    notes.append('' + "Room Total Gems: " + str(room_valuations['gems']) + " Jewellery: " + str(room_valuations['jewellery']) + " Magic:" + str(room_valuations['magic']) + '<br>')
+
+    notes.append('<h4>Total Treasure: ' + str(accounting['total_treasure']) + '</h4>')
+    notes.append('Coins: ' + str(accounting['coins']) + '<br>')
+    notes.append('Gems: ' + str(accounting['gems_value']) + '<br>')
+    notes.append('Jewellery: ' + str(accounting['jewellery_value']) + '<br>')
+    notes.append('Magic: ' + str(accounting['magic_value']) + '<br>')
+    notes.append('<b>Total Gold Equivalent: ' + str(accounting['gold_equivalent']) + '</b><br>')
+    notes.append('<b>Total Rooms: ' + str(room_stack['key_count'])  + '</b>')
+    notes.append('<br><br>')
+
+    enhanced_url = 'dungeon_' + str(down+1) + '_enhanced.html'
+    notes.append('<a href="' + enhanced_url + '" style="' + ENHANCED_LINK_STYLE + '">🏰 View Enhanced Map</a>' + '<br><br>')
+    for link in range(run['levels']):
+        url = 'dungeon_' + str(link+1) + '.html'
+        notes.append('<a href="' + url + '"' + '>Dungeon Level ' + str(link+1) + '</a>' + '<br>')
+
+    notes.append('<br><b>Legend</b><br>')
+    for key in NOTES_LEGEND:
+        notes.append(str(key) + ':' + ' ' + str(NOTES_LEGEND[key]) + '<br>')
+    for key in NOTES_BACKGROUNDS:
+        notes.append(str(key) + ':' + ' ' + str(NOTES_BACKGROUNDS[key]) + '<br>')
+    return ''.join(notes)
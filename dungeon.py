@@ -3,6 +3,7 @@
 
 import sys
 from dungeon_simulation import dungeon_sim
+from roll_log import record_rolls, replay_rolls
 
 if __name__ == "__main__":
     #make 3rd one, number of sims!
@@ -16,6 +17,11 @@ if __name__ == "__main__":
     VERBOSITY = 0
     ROOMS_CHECK = 0
     LEVELS_CHECK = 0
+    ROLL_LOG = ''
+    REPLAY = 0
+    OUTPUTS = None
+    RENDER_WORKERS = None
+    RENDER_CACHE = None
 
     if len(ARGV) > 1:
         if int(ARGV[1]) > 1:
@@ -27,11 +33,40 @@ if __name__ == "__main__":
     if len(ARGV) > 3:
         ROOMS_CHECK = int(ARGV[3])
 
-    if len(ARGV) > 3:
+    if len(ARGV) > 4:
         LEVELS_CHECK = int(ARGV[4])
 
+    #roll log file to record to, or replay from if the next flag is 1
+    if len(ARGV) > 5:
+        ROLL_LOG = ARGV[5]
+
+    if len(ARGV) > 6:
+        REPLAY = int(ARGV[6])
+
+    #comma separated output sinks, e.g. stats or classic,enhanced [default classic,enhanced,stats]
+    if len(ARGV) > 7:
+        OUTPUTS = [name for name in ARGV[7].split(',') if name]
+    #processes to render the level pages in [default 1, in turn]
+    if len(ARGV) > 8:
+        RENDER_WORKERS = int(ARGV[8])
+    #directory to keep rendered level pages in and reuse them from
+    if len(ARGV) > 9:
+        RENDER_CACHE = ARGV[9]
+
     print(suffix, usepath, PERIODIC_CHECKS, VERBOSITY)
-    df = dungeon_sim(suffix, usepath, PERIODIC_CHECKS, VERBOSITY, ROOMS_CHECK, LEVELS_CHECK)
+    if ROLL_LOG == '':
+        df = dungeon_sim(suffix, usepath, PERIODIC_CHECKS, VERBOSITY, ROOMS_CHECK, LEVELS_CHECK, OUTPUTS, render_workers=RENDER_WORKERS, render_cache=RENDER_CACHE)
+    elif REPLAY:
+        with replay_rolls(ROLL_LOG) as header:
+            #the recorded parameters win so the walk matches the log
+            params = header['params']
+            print("REPLAYING:", ROLL_LOG, params)
+            df = dungeon_sim(suffix, usepath, params['periodic_checks'], VERBOSITY, params['rooms_check'], params['levels_check'], OUTPUTS, render_workers=RENDER_WORKERS, render_cache=RENDER_CACHE)
+    else:
+        params = {'periodic_checks': PERIODIC_CHECKS, 'rooms_check': ROOMS_CHECK, 'levels_check': LEVELS_CHECK}
+        with record_rolls(ROLL_LOG, params=params) as recorder:
+            df = dungeon_sim(suffix, usepath, PERIODIC_CHECKS, VERBOSITY, ROOMS_CHECK, LEVELS_CHECK, OUTPUTS, render_workers=RENDER_WORKERS, render_cache=RENDER_CACHE)
+        print("ROLL LOG:", ROLL_LOG, recorder.count, "rolls")
 
     #print(df)
     
@@ -0,0 +1,300 @@
+"""
+Local dungeon generation service.
+
+A small asyncio HTTP server for localhost that keeps a pool of warm worker
+processes, so a table-top tool can ask for dungeons without a cold start per
+request. Jobs go through a bounded queue: when it is full the service answers
+503 with Retry-After instead of piling up work. A /generate for more seeds
+than the whole queue holds could never be taken, so it gets 400 instead.
+
+Endpoints (GET, parameters in the query string):
+
+- /generate?seed=S&rolls=N[&seed=S2...][&rooms=R][&levels=L]
+  one JSON line per dungeon, streamed back as each one finishes
+- /render?seed=S&rolls=N&level=L[&format=classic|enhanced|canvas]
+  the HTML map of level L (1-indexed) of that dungeon
+- /status
+  queue and worker counts
+
+A seed always gives the same dungeon, so a render can run on any worker;
+each worker also keeps its last few dungeons so rendering one it just
+generated skips the walk.
+
+Usage:
+    python dungeon_service.py [port] [workers] [queue size]
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import traceback
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from batch_runner import warm_worker
+from output_sinks import register_sink
+
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+# dungeons kept per worker for renders
+RUN_CACHE_SIZE = 8
+
+RUNS = OrderedDict()
+CAPTURED = {}
+
+
+def capture_run(run):
+    """Output sink that keeps the run dict in the worker instead of writing files."""
+    CAPTURED['run'] = run
+
+
+register_sink('service', finish=capture_run)
+
+
+def json_default(value):
+    """Make numpy scalars and tuples of them JSON serialisable."""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def get_run(seed, rolls, rooms=0, levels=0):
+    """Generate a dungeon in this worker, or reuse a cached one."""
+    from dungeon_simulation import dungeon_sim
+
+    key = (seed, rolls, rooms, levels)
+    if key in RUNS:
+        RUNS.move_to_end(key)
+        return RUNS[key]
+
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dungeon_sim('', '', rolls, 0, rooms, levels, outputs=['service'])
+    run = CAPTURED.pop('run')
+
+    RUNS[key] = run
+    if len(RUNS) > RUN_CACHE_SIZE:
+        RUNS.popitem(last=False)
+    return run
+
+
+def generate_job(seed, rolls, rooms=0, levels=0):
+    """Worker job: generate a dungeon and return its stats."""
+    run = get_run(seed, rolls, rooms, levels)
+    return {
+        'seed': seed,
+        'rolls': rolls,
+        'rooms_check': rooms,
+        'levels_check': levels,
+        'levels': run['levels'],
+        'stats': run['df'].to_dict('records')[0],
+    }
+
+
+def render_job(seed, rolls, level, fmt='enhanced', rooms=0, levels=0):
+    """Worker job: render one level (1-indexed) of a dungeon as HTML."""
+    from classic_mapper import generate_classic_html, level_notes_html
+    from enhanced_mapper import generate_canvas_html, generate_enhanced_html
+
+    run = get_run(seed, rolls, rooms, levels)
+    if level < 1 or level > run['levels']:
+        raise ValueError('level ' + str(level) + ' out of range, dungeon has ' + str(run['levels']))
+    down = level - 1
+    if fmt == 'classic':
+        return generate_classic_html(run['downlist'][down], down, level_notes_html(run, down), run['border_index'], run['coord_lim'], run['error_dict'])
+    if fmt == 'canvas':
+        return generate_canvas_html({'level': level}, down, run['room_stack'], run['downlist'], run['coord_lim'], run['border_index'])
+    return generate_enhanced_html({'level': level}, down, run['room_stack'], run['downlist'], run['coord_lim'], run['border_index'])
+
+
+class DungeonService:
+    """
+    Bounded queue in front of a process pool.
+
+    Args:
+        workers: Worker processes, defaults to the CPU count
+        queue_size: Jobs that may wait for a worker before requests get 503
+    """
+
+    def __init__(self, workers=None, queue_size=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = None
+        self.dispatchers = []
+        self.running = 0
+
+    async def start(self, host=HOST, port=PORT):
+        ctx = mp.get_context('spawn')
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=warm_worker)
+        #one dispatcher per worker, so jobs wait in the bounded queue rather than inside the pool
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for i in range(self.workers)]
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            func, args, future = await self.queue.get()
+            self.running += 1
+            try:
+                result = await loop.run_in_executor(self.executor, func, *args)
+                if not future.cancelled():
+                    future.set_result(result)
+            except Exception as exc:
+                if not future.cancelled():
+                    future.set_exception(exc)
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    def room(self):
+        return self.queue.maxsize - self.queue.qsize()
+
+    def submit(self, func, *args):
+        """Queue a job, returning a future; raises asyncio.QueueFull when there is no room."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((func, args, future))
+        return future
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            parts = request.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] not in ('GET', 'POST'):
+                await self.respond(writer, 405, 'text/plain', b'only GET is supported\n')
+                return
+            url = urlsplit(parts[1])
+            query = parse_qs(url.query)
+            if url.path == '/generate':
+                await self.generate(writer, query)
+            elif url.path == '/render':
+                await self.render(writer, query)
+            elif url.path == '/status':
+                status = {'workers': self.workers, 'running': self.running, 'queued': self.queue.qsize(), 'queue_size': self.queue.maxsize}
+                await self.respond(writer, 200, 'application/json', json.dumps(status).encode('utf-8') + b'\n')
+            else:
+                await self.respond(writer, 404, 'text/plain', b'not found\n')
+        except ValueError as exc:
+            await self.respond(writer, 400, 'text/plain', (str(exc) + '\n').encode('utf-8'))
+        except ConnectionError:
+            pass
+        except Exception:
+            await self.respond(writer, 500, 'text/plain', traceback.format_exc().encode('utf-8'))
+        finally:
+            writer.close()
+
+    async def generate(self, writer, query):
+        seeds = [int(seed) for value in query.get('seed', ['0']) for seed in value.split(',')]
+        rolls = int(query.get('rolls', ['1'])[0])
+        rooms = int(query.get('rooms', ['0'])[0])
+        levels = int(query.get('levels', ['0'])[0])
+        if len(seeds) > self.queue.maxsize > 0:
+            #would get 503 however long the client waited
+            raise ValueError(str(len(seeds)) + ' seeds can never fit the queue of ' + str(self.queue.maxsize) + ', ask for at most that many at once')
+        if self.room() < len(seeds):
+            await self.busy(writer)
+            return
+
+        futures = [self.submit(generate_job, seed, rolls, rooms, levels) for seed in seeds]
+        await self.start_chunked(writer, 'application/x-ndjson')
+        try:
+            for future in asyncio.as_completed(futures):
+                try:
+                    result = await future
+                except Exception:
+                    result = {'error': traceback.format_exc()}
+                line = json.dumps(result, default=json_default) + '\n'
+                writer.write(b'%x\r\n%s\r\n' % (len(line.encode('utf-8')), line.encode('utf-8')))
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        except ConnectionError:
+            #client went away, the remaining jobs just finish unread
+            for future in futures:
+                future.cancel()
+
+    async def render(self, writer, query):
+        if 'seed' not in query or 'level' not in query:
+            raise ValueError('render needs seed and level')
+        seed = int(query['seed'][0])
+        rolls = int(query.get('rolls', ['1'])[0])
+        level = int(query['level'][0])
+        fmt = query.get('format', ['enhanced'])[0]
+        rooms = int(query.get('rooms', ['0'])[0])
+        levels = int(query.get('levels', ['0'])[0])
+        if fmt not in ('classic', 'enhanced', 'canvas'):
+            raise ValueError('format must be classic, enhanced or canvas')
+        if self.room() < 1:
+            await self.busy(writer)
+            return
+        try:
+            page = await self.submit(render_job, seed, rolls, level, fmt, rooms, levels)
+        except ValueError as exc:
+            await self.respond(writer, 404, 'text/plain', (str(exc) + '\n').encode('utf-8'))
+            return
+        await self.respond(writer, 200, 'text/html; charset=utf-8', page.encode('utf-8'))
+
+    async def busy(self, writer):
+        await self.respond(writer, 503, 'text/plain', b'queue full, try again\n', {'Retry-After': '1'})
+
+    async def respond(self, writer, code, content_type, body, headers=None):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+        head = 'HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n' % (code, reasons[code], content_type, len(body))
+        for key, value in (headers or {}).items():
+            head += key + ': ' + value + '\r\n'
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+
+    async def start_chunked(self, writer, content_type):
+        head = 'HTTP/1.1 200 OK\r\nContent-Type: %s\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n' % content_type
+        writer.write(head.encode('latin-1'))
+        await writer.drain()
+
+
+async def serve(host=HOST, port=PORT, workers=None, queue_size=64):
+    service = DungeonService(workers, queue_size)
+    server = await service.start(host, port)
+    print("SERVING:", 'http://' + host + ':' + str(port), "WORKERS:", service.workers, "QUEUE:", queue_size)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == '__main__':
+    ARGV = sys.argv
+    port = PORT
+    workers = None
+    queue_size = 64
+
+    if len(ARGV) > 1:
+        port = int(ARGV[1])
+
+    if len(ARGV) > 2:
+        workers = int(ARGV[2])
+
+    if len(ARGV) > 3:
+        queue_size = int(ARGV[3])
+
+    try:
+        asyncio.run(serve(HOST, port, workers, queue_size))
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,4 @@
-def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels_check):
+def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels_check, outputs=None, start=None, render_workers=None, render_cache=None):
     print("START STUFF",suffix, usepath)
 
     import timeit
@@ -17,12 +17,16 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
     import json
     import pickle
     import math
+    import io
 
     from monsters import monster_tables, monster_subtables_wet
     from treasure import select_gemstone, update_gemstone, select_jewellery, select_magic_item, treasure_choice
-    from enhanced_mapper import generate_enhanced_html
+    from output_sinks import resolve_outputs, write_outputs
+    from level_codes import LevelList
+    from accounting import TREASURE_KINDS, account_dungeon, count_room, count_trap, count_wandering, new_totals, stack_totals, totals_text
 
     VERBOSITY = verbosity
+    OUTPUTS = resolve_outputs(outputs, verbosity)
     ROOMS_CHECK = rooms_check
     LEVELS_CHECK = levels_check
 
@@ -69,6 +73,20 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
 
         return [coord_min, coord_max]
 
+    def level_buckets(dungeon, coord_lim, levels):
+        #one pass over the dungeon: array indices and fills of the filled squares of each level down
+        xmin = coord_lim[0][0]
+        ymin = coord_lim[0][1]
+        buckets = [([], [], []) for down in range(levels)]
+        for key, square in dungeon.items():
+            down = 0 - key[2] - 1
+            if 0 <= down < levels and 'fill' in square:
+                xs, ys, fills = buckets[down]
+                xs.append(key[0] - xmin)
+                ys.append(key[1] - ymin)
+                fills.append(square['fill'])
+        return [(np.array(xs, dtype=np.intp), np.array(ys, dtype=np.intp), np.array(fills, dtype='U10')) for xs, ys, fills in buckets]
+
     def coord_random(dungeon):
         
         coordlist = list(dungeon.keys())
@@ -1216,6 +1234,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                     dungeon[(coord[0],coord[1]+1,coord[2])] = {}
                     dungeon[(coord[0],coord[1]+1,coord[2])]['fill'] = 'D'
                     dead_end_dict[(coord[0],coord[1]+1,coord[2])] = 'ymax'
+                    border_index[(coord[0],coord[1]+1,coord[2])] = 'ymax'
                     #dead_end_dict[(coord[0],coord[1]+1,coord[2])] = {}
                     s = roll_dice(1,20)
                     if s <= 5:
@@ -1233,6 +1252,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                     dungeon[(coord[0]-1,coord[1],coord[2])] = {}
                     dungeon[(coord[0]-1,coord[1],coord[2])]['fill'] = 'D'
                     dead_end_dict[(coord[0]-1,coord[1],coord[2])] = 'xmin'
+                    border_index[(coord[0]-1,coord[1],coord[2])] = 'xmin'
                     s = roll_dice(1,20)
                     if s <= 5:
                         dungeon[(coord[0]-1,coord[1],coord[2])]['fill'] = 'Dsd'
@@ -1251,6 +1271,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                     dungeon[(coord[0]+1,coord[1],coord[2])] = {}
                     dungeon[(coord[0]+1,coord[1],coord[2])]['fill'] = 'D'
                     dead_end_dict[(coord[0]+1,coord[1],coord[2])] = 'xmax'
+                    border_index[(coord[0]+1,coord[1],coord[2])] = 'xmax'
                     s = roll_dice(1,20)
                     if s <= 5:
                         dungeon[(coord[0]-1,coord[1],coord[2])]['fill'] = 'Dsd'
@@ -1265,11 +1286,13 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                     dungeon[(coord[0]-1,coord[1]+1,coord[2])] = {}
                     dungeon[(coord[0]-1,coord[1]+1,coord[2])]['fill'] = 'D'
                     dead_end_dict[(coord[0]-1,coord[1]+1,coord[2])] = 'angle-minus'
+                    border_index[(coord[0]-1,coord[1]+1,coord[2])] = 'angle-minus'
                 will_fit = in_dungeon((coord[0]+1,coord[1]+1,coord[2]))
                 if not will_fit:
                     dungeon[(coord[0]+1,coord[1]+1,coord[2])] = {}
                     dungeon[(coord[0]+1,coord[1]+1,coord[2])]['fill'] = 'D'
                     dead_end_dict[(coord[0]+1,coord[1]+1,coord[2])] = 'angle-plus'
+                    border_index[(coord[0]+1,coord[1]+1,coord[2])] = 'angle-plus'
 
                 #print("dead end quit")
                 #quit()
@@ -1286,6 +1309,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
 
         elif pc_dict['direction'] == 'bad_things':
             trap_stack['key_count'] += 1
+            count_trap(totals)
             new_coord = coord
             t_dict = bad_things(coord, room_stack)
             if VERBOSITY:
@@ -1448,6 +1472,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                 error_dict[error_dict['key_count']] = str(wmE) + "wm roll error for level: " + str(wandering_monster_stack[wandering_monster_stack['key_count']][wm_coord]['level'])
                 error_dict['key_count'] += 1            
 
+            count_wandering(totals, wandering_monster_stack[wandering_monster_stack['key_count']][wm_coord], xp_d)
 
         return new_coord
 
@@ -2177,6 +2202,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
             shape_dict['contents']['level'] = {}
         elif r == 19:        
             trap_stack['key_count'] += 1
+            count_trap(totals)
             shape_dict['contents']['trap'] = {}
             shape_dict['contents']['trap'] = bad_things(coord, room_stack, size="R") #or should all traps be on room entry and this is ok?
             #trying this again
@@ -2492,6 +2518,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                                         print("DUNGEONERRORCHECK:",dungeon, "xmin sd")
                                         print("ROOMSTACKCHECK:",room_stack)
                                     continue
+                                border_index[(rxmin,y,rzmin)] = 'xmin'
 
                                 #exit check is one left of above
                                 #e_dict = exit((rxmin-1,y,rzmin))
@@ -2517,6 +2544,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                                         print("ROOMSTACKCHECK:",room_stack)
                                     #raise("coordinate fail error")
                                     continue
+                                border_index[(rxmax,y,rzmin)] = 'xmax'
 
                                 #exit check is one left of above
                                 #e_dict = exit((rxmax+1,y,rzmin))
@@ -2541,6 +2569,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                                         print("DUNGEONERRORCHECK:",dungeon, "ymin sd")
                                         print("ROOMSTACKCHECK:",room_stack)
                                     continue
+                                border_index[(x,rymin,rzmin)] = 'ymin'
                                 #exit check is one up min from above
                                 #e_dict = exit((x,rymin-1,rzmin))
                                 #exit_result(e_dict,(x,rymin-1,rzmin))
@@ -2564,6 +2593,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                                         print("DUNGEONERRORCHECK:",dungeon, "ymax sd")
                                         print("ROOMSTACKCHECK:",room_stack)
                                     continue
+                                border_index[(x,rymax,rzmin)] = 'ymax'
                                 
                                 #exit check is one down max from above
                                 #e_dict = exit((x,rymax+1,rzmin))
@@ -2687,7 +2717,11 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                 #exists need coloring for output so door/exit stack
             if VERBOSITY:                                          
                 print("adding ROOM:",room_stack['key_count'],"to stack")
+            if room_stack['key_count'] in room_stack['shape_dict']:
+                #a room made from this one's contents got the number first and is replaced here
+                count_room(totals, room_stack['shape_dict'][room_stack['key_count']], xp_d, -1)
             room_stack['shape_dict'][room_stack['key_count']] = copy.deepcopy(shape_dict)
+            count_room(totals, room_stack['shape_dict'][room_stack['key_count']], xp_d)
             return "GOOD"
         else:
             pass   #do we want a return
@@ -2953,6 +2987,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                 dungeon[(coord[0],coord[1]+1,coord[2])] = {}
                 dungeon[(coord[0],coord[1]+1,coord[2])]['fill'] = 'sn' #stair dead end
                 dead_end_dict[(coord[0],coord[1]+1,coord[2])] = 'ymax'
+                border_index[(coord[0],coord[1]+1,coord[2])] = 'ymax'
                 #new_coord = (coord[0],coord[1]+1,coord[2])  ##1 in 20 closes     
                 level_dict['type'] = 'UD'   
                 level_dict['new_coord'] = new_coord    
@@ -2976,6 +3011,7 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
                 dungeon[(coord[0],coord[1]+1,coord[2])] = {}
                 dungeon[(coord[0],coord[1]+1,coord[2])]['fill'] = 'sn' #stair dead end
                 dead_end_dict[(coord[0],coord[1]+1,coord[2])] = 'ymax'
+                border_index[(coord[0],coord[1]+1,coord[2])] = 'ymax'
                 #new_coord = (coord[0],coord[1]+1,coord[2])  ##1 in 20 closes            
                 level_dict['type'] = 'DD'       
                 level_dict['new_coord'] = new_coord
@@ -4201,11 +4237,26 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
     monster_stack['key_count'] = 0
 
     dead_end_dict = {}
+    #coord -> wall side (xmin, xmax, ymin, ymax) of every secret door and dead end, for the renderers
+    border_index = {}
 
     error_dict = {}
     error_dict['key_count'] = 0
     error_dict['type'] = {}
 
+    #level shards start from part of an already walked dungeon, see level_shards.py
+    if start is None:
+        start = {}
+    if 'stacks' in start:
+        room_stack = start['stacks']['room_stack']
+        trap_stack = start['stacks']['trap_stack']
+        wandering_monster_stack = start['stacks']['wandering_monster_stack']
+        dead_end_dict = start['stacks']['dead_end_dict']
+        border_index = start['stacks']['border_index']
+        exit_stack = start['stacks']['exit_stack']
+    LOCK_Z = start.get('z')
+    level_entries = {}
+
     if VERBOSITY:
         error_log = open("error_log.txt","w")
 
@@ -4217,17 +4268,29 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
     human_d = human_data()
     xp_d = xp_hack()
 
+    #treasure, XP and trap totals kept up as rooms, wandering monsters and traps are made, see accounting.py
+    if 'stacks' in start:
+        totals = stack_totals(room_stack, wandering_monster_stack, trap_stack, xp_d)
+    else:
+        totals = new_totals()
+
     "EXEC"
-    dungeon = {}
-    dungeon[(0,0,0)] = {}
-    dungeon[(0,0,0)]['direction'] = 'level'
-    dungeon[(0,0,0)]['check'] = 'up_down'
-    dungeon[(0,0,0)]['go'] = -1
+    if 'dungeon' in start:
+        dungeon = copy.deepcopy(start['dungeon'])
+    else:
+        dungeon = {}
+        dungeon[(0,0,0)] = {}
+        dungeon[(0,0,0)]['direction'] = 'level'
+        dungeon[(0,0,0)]['check'] = 'up_down'
+        dungeon[(0,0,0)]['go'] = -1
 
     facing = np.zeros(2) #x, y
     facing = facing.astype('int')
     facing[0] = int(0)
     facing[1] = int(1)
+    if 'facing' in start:
+        facing[0] = int(start['facing'][0])
+        facing[1] = int(start['facing'][1])
     if VERBOSITY:
         print(facing, facing[0])
     #start off as ahead
@@ -4236,75 +4299,108 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
     wandering_monster_rolls = []
     ## got to implement for all here eventually, complicates things
 
-    START_COORD = (0,0,-1)
+    def walk_step(roll, coord):
+        new_coord = check_action(roll, coord, room_stack, facing)
+        if LOCK_Z is not None and new_coord[2] != LOCK_Z:
+            #level shard: the stairs or chute is drawn but the walk stays on its own level
+            new_coord = coord
+        if new_coord[2] not in level_entries:
+            level_entries[new_coord[2]] = {'coord': new_coord, 'facing': (int(facing[0]), int(facing[1]))}
+        return new_coord
+
+    START_COORD = start.get('coord', (0,0,-1))
     coord = START_COORD
+    level_entries[coord[2]] = {'coord': coord, 'facing': (int(facing[0]), int(facing[1]))}
 
-    roll_first = random_check()
-    if VERBOSITY:
-        print("SETUP: roll_first", roll_first)
-    #no possible dead_end on first action
-    while roll_first == 18:
+    #merging level shards only needs the output stage
+    if start.get('walk', True):
         roll_first = random_check()
+        if VERBOSITY:
+            print("SETUP: roll_first", roll_first)
+        #no possible dead_end on first action
+        while roll_first == 18:
+            roll_first = random_check()
 
-    first_action = check_action(roll_first, coord, room_stack, facing)    
+        first_action = walk_step(roll_first, coord)    
 
-    i = 0
-    j = 0
-    result_coord = first_action
-    if VERBOSITY:
-        print("END SETUP:",)
+        i = 0
+        j = 0
+        result_coord = first_action
+        if VERBOSITY:
+            print("END SETUP:",)
 
-    if ROOMS_CHECK == 0 and LEVELS_CHECK == 0:
-        while i < PERIODIC_CHECKS:
-            if VERBOSITY:
-                print("\n--- ROLL:",i," ---\n")
-            roll_first = random_check()
-            result_coord = check_action(roll_first, result_coord, room_stack, facing)
-            if VERBOSITY:
-                print("\n--- END ROLL:",i," ---\n")
-            i +=1
+        if ROOMS_CHECK == 0 and LEVELS_CHECK == 0:
+            while i < PERIODIC_CHECKS:
+                if VERBOSITY:
+                    print("\n--- ROLL:",i," ---\n")
+                roll_first = random_check()
+                result_coord = walk_step(roll_first, result_coord)
+                if VERBOSITY:
+                    print("\n--- END ROLL:",i," ---")
+                    print(totals_text(totals), "\n")
+                i +=1
 
-    if ROOMS_CHECK >= 0 and LEVELS_CHECK == 0:
-        while i < ROOMS_CHECK:
-            if VERBOSITY:
-                print("\n--- ROLL:",i," ---\n")
-            roll_first = random_check()
-            result_coord = check_action(roll_first, result_coord, room_stack, facing)
-            if VERBOSITY:
-                print("\n--- END ROLL:",i," ---\n")
+        if ROOMS_CHECK >= 0 and LEVELS_CHECK == 0:
+            while i < ROOMS_CHECK:
+                if VERBOSITY:
+                    print("\n--- ROLL:",i," ---\n")
+                roll_first = random_check()
+                result_coord = walk_step(roll_first, result_coord)
+                if VERBOSITY:
+                    print("\n--- END ROLL:",i," ---")
+                    print(totals_text(totals), "\n")
 
-            if 'shape_dict' in room_stack:
-                i = len(room_stack['shape_dict'])
-            else:
-                i = room_stack['key_count']
+                if 'shape_dict' in room_stack:
+                    i = len(room_stack['shape_dict'])
+                else:
+                    i = room_stack['key_count']
 
-    if ROOMS_CHECK == 0 and LEVELS_CHECK >= 0:
-        print("LEVELS CHECK", LEVELS_CHECK)
-        while j < LEVELS_CHECK:
-            if VERBOSITY:
-                print("\n--- ROLL:",i," ---\n")
-            roll_first = random_check()
-            result_coord = check_action(roll_first, result_coord, room_stack, facing)
-            if VERBOSITY:
-                print("\n--- END ROLL:",i," ---\n")
+        if ROOMS_CHECK == 0 and LEVELS_CHECK >= 0:
+            print("LEVELS CHECK", LEVELS_CHECK)
+            while j < LEVELS_CHECK:
+                if VERBOSITY:
+                    print("\n--- ROLL:",i," ---\n")
+                roll_first = random_check()
+                result_coord = walk_step(roll_first, result_coord)
+                if VERBOSITY:
+                    print("\n--- END ROLL:",i," ---")
+                    print(totals_text(totals), "\n")
 
-            j = abs(result_coord[2])
+                j = abs(result_coord[2])
 
-    if ROOMS_CHECK >= 0 and LEVELS_CHECK >= 0:
-        print("LEVELS CHECK", LEVELS_CHECK)
-        while i < ROOMS_CHECK or j < LEVELS_CHECK:
-            if VERBOSITY:
-                print("\n--- ROLL:",i," ---\n")
-            roll_first = random_check()
-            result_coord = check_action(roll_first, result_coord, room_stack, facing)
-            if VERBOSITY:
-                print("\n--- END ROLL:",i," ---\n")
-            if 'shape_dict' in room_stack:
-                i = len(room_stack['shape_dict'])
-            else:
-                i = room_stack['key_count']
+        if ROOMS_CHECK >= 0 and LEVELS_CHECK >= 0:
+            print("LEVELS CHECK", LEVELS_CHECK)
+            while i < ROOMS_CHECK or j < LEVELS_CHECK:
+                if VERBOSITY:
+                    print("\n--- ROLL:",i," ---\n")
+                roll_first = random_check()
+                result_coord = walk_step(roll_first, result_coord)
+                if VERBOSITY:
+                    print("\n--- END ROLL:",i," ---")
+                    print(totals_text(totals), "\n")
+                if 'shape_dict' in room_stack:
+                    i = len(room_stack['shape_dict'])
+                else:
+                    i = room_stack['key_count']
+
+                j = abs(result_coord[2])
+    else:
+        result_coord = coord
+
+    #level shards only want the walked state back
+    if start.get('walk_only'):
+        return {
+            'dungeon': dungeon,
+            'room_stack': room_stack,
+            'trap_stack': trap_stack,
+            'wandering_monster_stack': wandering_monster_stack,
+            'dead_end_dict': dead_end_dict,
+            'border_index': border_index,
+            'exit_stack': exit_stack,
+            'level_entries': level_entries,
+            'totals': totals,
+        }
 
-            j = abs(result_coord[2])
 
     coord_lim = coord_limits(dungeon)
     xmin = coord_lim[0][0]
@@ -4338,944 +4434,76 @@ def dungeon_sim(suffix, usepath, periodic_checks, verbosity, rooms_check, levels
 
     #dungeonarray = np.full((xwidth,ywidth,zwidth-1), 'B', dtype='U10')
 
-    downlist = []
     if VERBOSITY:
         print("\nLEVELS DOWN:",zwidth-1)
+    #squares grouped by level once, rather than scanning the whole dungeon for every level
+    buckets = level_buckets(dungeon, coord_lim, zwidth-1)
+    if zwidth-1 > 0:
+        #only for first level: the start square is drawn as the entrance
+        xs, ys, fills = buckets[0]
+        keep = (xs != 0+xmin*-1) | (ys != 0+ymin*-1)
+        buckets[0] = (np.append(xs[keep], 0+xmin*-1), np.append(ys[keep], 0+ymin*-1), np.append(fills[keep], 'O'))
+    #cropped uint16 codes per level over one fill table, see level_codes.py
+    downlist = LevelList(buckets, (xwidth, ywidth))
+    if VERBOSITY:
+        print("LEVEL CODES:", len(downlist.fills), "FILLS", downlist.nbytes, "BYTES")
     for down in range(zwidth-1):
         if VERBOSITY:
-            print("downloop:",down)
-        chararray = np.full((xwidth,ywidth,1), 'B', dtype='U10')
-        if VERBOSITY:
-            print("SHAPE",chararray.shape)
-        for key in dungeon:
-            #print("KEY:",key,"KEYWIDTH:",key[0]+xwidth-1,key[1]+ywidth-1,key[2]+zwidth-1)
-            #print("KEY:",key,"KEYWIDTH:",key[0]+xmax-key[0],key[1]+ymax-key[1],key[2]+zmax - key[2])
-            #print("KEYTEST:",key)
-            if key[2] == (0 - down -1): #-1, -2, etc
-                if 'fill' in dungeon[key] :  
-                    if VERBOSITY:
-                        print("KEY:",key,"KEYWIDTH:",key[0]+xmin*-1,key[1]+ymin*-1,key[2]+zmin*-1,dungeon[key]['fill'])
-                    #chararray[[key][0],key[1],key[2]] = dungeon[key]['fill']
-                    #chararray[key[0]+xmax-key[0],key[1]+ymax-key[1],key[2]+zmax - key[2]] = dungeon[key]['fill']
-                    chararray[key[0]+xmin*-1,key[1]+ymin*-1,0] = dungeon[key]['fill']
-                else:
-                    if VERBOSITY:
-                        print("KEY:",key,"KEYWIDTH:",key[0]+xmin*-1,key[1]+ymin*-1,key[2]+zmin*-1)
-        downlist.append(chararray)
-
-        #only for first level        
-        if down == 0:
-            #print("START CHECK")
-            #possible bug here
-            #chararray[0+xmin*-1,0+ymin*-1,0+zmax*-1] = 'O'        
-            chararray[0+xmin*-1,0+ymin*-1,0] = 'O'          ##first thing and has only one z level
-            #print("START CHECK",chararray[0+xmin*-1,0+ymin*-1,0+zmin],0+xmin*-1,0+ymin*-1,-1)
-        #print(chararray)
-        #need a multi-level maker, this is just doing first for now
-        #Each side can be set individually using border-top-color, border-right-color, border-bottom-color, and border-left-color; or using the writing mode-aware border-block-start-color, border-block-end-color, border-inline-start-color, and border-inline-end-color.
-        #make dungeon html
-        #            
-
-        strhead = '''
-
-        <html>
-        <head>
-        <title>DUNGEON 
-        ''' 
-        strtitle = str(down+1) + '</title>'
-
-        strhead2 = '''
-        <style>
-            table,
-            th,
-            td {
-                padding: 10px;
-                border: 1px solid black;
-                border-collapse: collapse;
-                width:auto
-            }
-            .red_background {
-                    background-color: red;
-                }
-            .green_background {
-                    background-color: green;
-                }
-            .gray_background {
-                    background-color: gray;
-                }
-            .grey_background {
-                    background-color: grey;
-                }
-            .brown_background {
-                    background-color: brown;
-                }
-
-            .blue_background {
-                    background-color: blue;
-                }
-            .black_background {
-                    background-color: black;
-                }
-
-            divl {
-                border-left-style: dotted
-            }            
-            divr {
-                border-right-style: dotted
-            }            
-            divt {
-                border-top-style: dotted
-            }            
-            divb {
-                border-bottom-style: dotted
-            }            
-
-
-            </style>
-        </head>
-        <body>
-        <table>
-        '''
-
-        strend = '''
-        </table>
-        </body>
-        </html>
-        '''
-        strend = '''
-        </body>
-        </html>
-        '''
-
-        strusehead = strhead + strtitle + strhead2
-
-        legend_dict =  {}
-        legend_dict['O'] = "Outside Entrance"
-        legend_dict['C'] = "Corridor/Passage"
-        legend_dict['R'] = "Chamber/Room"
-        legend_dict['D'] = "Dead End"
-        legend_dict['CH'] = "Chasm"
-        legend_dict['ri'] = "river"
-        legend_dict['br'] = "bridge"
-        legend_dict['bo'] = "boat - opposide side"
-        legend_dict['bn'] = "boat - near side"
-        legend_dict['L'] = "Lake"
-        legend_dict['P'] = "Pool"
-        legend_dict['W'] = "Well"
-        legend_dict['S'] = "Shaft"
-        legend_dict['d'] = "door"
-        legend_dict[':'] = "direction of Door"
-        legend_dict['wm'] = "Wandering Monster"
-        legend_dict['sd'] = "Secret Door"
-        legend_dict['st'] = "Stairs"
-        legend_dict['sn'] = "Stairs dead end"
-        legend_dict['ch'] = "Chute"
-        legend_dict['cm'] = "Chimney"
-        legend_dict['td'] = "Trapdoor"
-        legend_dict['pi'] = "Pit Trap"
-        legend_dict['pt'] = "Pit Trap: Secret Door"
-        legend_dict['ps'] = "Pit Trap: Spikes"
-        legend_dict['pc'] = "Pit Trap: Crushing Walls"
-        legend_dict['el'] = "Elevator Trap"
-        legend_dict['ar'] = "Arrow Trap"
-        legend_dict['sp'] = "Spear Trap"
-        legend_dict['df'] = "Door Falls Trap"
-        legend_dict['sf'] = "Stone Falls Trap"
-        legend_dict['gs'] = "Gas Trap"
-        legend_dict['bw'] = "Blocked Wall Trap"
-        legend_dict['ol'] = "Oil Trap"
-        legend_dict['m'] = "Monster"
-        legend_dict['t'] = "Treasure"
-        legend_dict['p'] = "Pool"
-        legend_dict['c'] = "Treasure: Copper"  
-        legend_dict['s'] = "Treasure: Silver"
-        legend_dict['e'] = "Treasure: Electrum"
-        legend_dict['g'] = "Treasure: Gold"
-        legend_dict['p'] = "Treasure: Platinum"
-        legend_dict['G'] = "Treasure: Gems"
-        legend_dict['j'] = "Treasure: Jewellery"
-        legend_dict['M'] = "Treasure: Magic"
-
-        background_dict = {}
-        background_dict['black'] = 'nothing'
-        background_dict['green'] = 'outside entrance'
-        background_dict['blue'] = 'water'
-        background_dict['red'] = 'bad_things'
-        background_dict['white'] = 'corridor/passage'
-        background_dict['brown'] = 'dead end'
-
-        strlegendhead = '''
-        <table>
-        <th>Key</th>
-        <th>Explanation</th>
-        '''
-        
-        def colorcheck(dungeonstr):
-            '''
-            html coloring for copper, silver, electrum, gold, platinum, Gems, jewellery, Magic
-            '''
-
-            if 'c' in dungeonstr:
-                return '#B87333'
-            elif 'g' in dungeonstr:
-                return '#FFD700'
-            elif 'p' in dungeonstr:
-                return '#E5E4E2'
-            elif 'e' in dungeonstr:
-                return '#E7G697'
-            elif 'G' in dungeonstr:
-                return '#B9F2FF'
-            elif 'j' in dungeonstr:
-                return '#E0115F '
-            elif 'M' in dungeonstr: 
-                return '#FF1493'
-            elif 's' in dungeonstr:
-                if 'sd' not in dungeonstr:
-                    return '#C0C0C0'
-                else:
-                    return '#EAEAEA'
-            else:
-                return 'notreasure'
-
-        
-        if usepath != '' and str(suffix) != '':
-            print("USEPATH:",usepath, "SUFFIX",suffix)
-            if not os.path.exists(usepath):
-                os.mkdir(usepath)
-            if not os.path.exists(os.path.join(usepath, str(suffix))):
-                os.mkdir(os.path.join(usepath, str(suffix)))
-            strpath = os.path.join(usepath, str(suffix), 'dungeon_' + str(down+1) + '.html')
-        else:
-            strpath = 'dungeon_' + str(down+1) + '.html'
-
-       
-        with open(strpath,'w') as f:
-            #f.write(strhead)
-            f.write(strusehead)
-            
-            for j in range(downlist[down].shape[1]):            
-                f.write('<TR>')
-                for i in range(downlist[down].shape[0]):                
-                    if downlist[down][i,j,0] == 'B':
-                        strdata = '<td class="black_background">' + downlist[down][i,j,0] + '</td>'
-                    #water [boats/bridges]
-                    elif 'CH' in downlist[down][i,j,0]:
-                        #differentiate from blue bridges
-                        strdata = '<td class="brown_background">' + downlist[down][i,j,0] + '</td>'
-                    elif 'P' in downlist[down][i,j,0] or 'L' in downlist[down][i,j,0] or 'W' in downlist[down][i,j,0] or 'S' in downlist[down][i,j,0] or 'br' in downlist[down][i,j,0] or 'bn' in downlist[down][i,j,0] or 'bo' in downlist[down][i,j,0] or 'ri' in downlist[down][i,j,0]:
-                        strdata = '<td class="blue_background">' + downlist[down][i,j,0] + '</td>'
-                    elif 'C' in downlist[down][i,j,0]:  #could have door markers etc                    
-                        usestr = copy.deepcopy(downlist[down][i,j,0])
-                        usestr = usestr.replace('C','')
-
-                        if 'd' in usestr and 's' not in usestr:  #number and d
-                            if VERBOSITY:
-                                print("found door")
-                            borderdir = '<divb>'
-                            borderdire = '</divb>'
-                            strdata = '<td>' + borderdir + downlist[down][i,j,0] + borderdire + '</td>'
-                            borderdir = '<divt>'
-                            borderdire = '</divt>'
-                        else:
-                            strdata = '<td>' + downlist[down][i,j,0] + '</td>'
-                    elif 'R' in downlist[down][i,j,0]:  #could have numbering
-                        usestr = copy.deepcopy(downlist[down][i,j,0])
-                        sdstr = ''
-                        if 'sd' in downlist[down][i,j,0]:
-                            if VERBOSITY:
-                                print("HAVE SD HERE!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-                            usestr = copy.deepcopy(downlist[down][i,j,0])
-                            usestr = usestr.replace('R','')
-                            usestr = usestr.replace('sd','')
-                            usestr = usestr.replace('c','')
-                            usestr = usestr.replace('e','')
-                            usestr = usestr.replace('g','')
-                            usestr = usestr.replace('j','')
-                            usestr = usestr.replace('G','')
-                            usestr = usestr.replace('m','')
-                            usestr = usestr.replace('p','')
-                            usestr = usestr.replace('s','')
-                            usestr = usestr.replace('t','')
-                            usestr = usestr.replace('w','')
-                            
-                            ## get anything but number eventually regex
-                            #usestr = usestr[0]
-                            try:
-                                secret_door_dict = room_stack['shape_dict'][int(usestr)]['contents']['secret_door_dict']
-                                for s in secret_door_dict:
-                                    if VERBOSITY:
-                                        print("secret door",s,secret_door_dict[s],"ijk:",i+xmin,j+ymin,0 - down -1)
-                                    keylist = list(secret_door_dict[s].keys())
-                                    if keylist[0] == (i+xmin,j+ymin,0 - down -1):  ##try and match real coords
-                                        if VERBOSITY:
-                                            print("found a secret door!")
-                                        if secret_door_dict[s][keylist[1]]['loc'] == 'xminloc':
-                                            borderdir = '<divl>'
-                                            borderdire = '</divl>'
-                                        elif secret_door_dict[s][keylist[1]]['loc'] == 'xmaxloc':
-                                            borderdir = '<divr>'
-                                            borderdire = '</divr>'
-                                        elif secret_door_dict[s][keylist[1]]['loc'] == 'yminloc':                                    
-                                            borderdir = '<divt>'
-                                            borderdire = '</divt>'
-                                        else:
-                                            borderdir = '<divb>'
-                                            borderdire = '</divb>'
-
-                                        sdstr = 'border-' + borderdir + '-style: dashed'
-                            except Exception as secretdoorE:
-                                error_dict[error_dict['key_count']] = str(secretdoorE) + "secret door output 3960"
-                                error_dict['key_count'] += 1                            
-
-                        color = colorcheck(downlist[down][i,j,0])
-                        if color == 'notreasure':
-                            if sdstr == '':
-                                strdata = '<td class="gray_background">' + downlist[down][i,j,0] + '</td>'
-                            else:
-                                strdata = '<td class="gray_background">' + borderdir + downlist[down][i,j,0] + borderdire + '</td>'
-                        else:
-                            if sdstr == "":
-                                strdata = '<td class="gray_background" style="color:' + color + '">'  + downlist[down][i,j,0] + '</td>'
-                            else:
-                                strdata = '<td class="gray_background" style="color:' + color + '">' + borderdir  + downlist[down][i,j,0] + borderdire + '</td>'
-
-                        if 'd' in usestr and 's' not in usestr:  #number and d
-                            if VERBOSITY:
-                                print("found door")
-                            borderdir = '<divb>'
-                            borderdire = '</divb>'
-                            #strdata = '<td>' + borderdir + downlist[down][i,j,0] + borderdire + '</td>'
-                            strdata = '<td class="gray_background" style="color:' + color + '">' + borderdir  + downlist[down][i,j,0] + borderdire + '</td>'
-
-                    elif 'D' in downlist[down][i,j,0]:  #could have numbering:
-                        usestr = copy.deepcopy(downlist[down][i,j,0])
-                        usestr = usestr.replace('C','')
-
-
-                        if 'sd' in usestr:  #number and d
-                            try:
-                                dead_end = dead_end_dict[(i+xmin,j+ymin,0 - down -1)]
-                                if VERBOSITY:
-                                    print("found Dead End Secret door")
-                                if dead_end == 'ymax':
-                                    borderdir = '<divb>'
-                                    borderdire = '</divb>'
-                                elif dead_end == 'xmax':
-                                    borderdir = '<divr>'
-                                    borderdire = '</divr>'
-                                else:
-                                    borderdir = '<divl>'
-                                    borderdire = '</divl>'                            
-                                    strdata = '<td class="brown_background">' + borderdir + downlist[down][i,j,0] + borderdire + '</td>'
-                            except Exception as deadendE:
-                                error_dict[error_dict['key_count']] = str(deadendE) + " dead end output 3976"
-                                error_dict['key_count'] += 1
-
-                                if VERBOSITY:
-                                    print("ERROR",deadendE)
-                                strdata = '<td class="brown_background">' + downlist[down][i,j,0] + '</td>'
-                                #make an error log?
-
-                            
-                            borderdir = '<divt>'
-                            borderdire = '</divt>'
-                        else:
-                            strdata = '<td class="brown_background">' + downlist[down][i,j,0] + '</td>'
-
-                    elif downlist[down][i,j,0] == 'O':
-                        strdata = '<td class="green_background">' + downlist[down][i,j,0] + '</td>'
-                    else:
-                        strdata = '<td class="red_background">' + downlist[down][i,j,0] + '</td>'
-
-                    f.write(strdata)
-                f.write('</TR>')
-
-            
-            #f.write(strlegendhead)
-            #for key in legend_dict:
-                #f.write('<TR>')
-                #f.write('<td>' + key + '</td>')
-                #f.write('<td>' + legend_dict[key] + '</td>')
-                #f.write('</TR>')
-            f.write('</table>')
-
-            if 'shape_dict' in room_stack:
-                total_treasure =  {'copper': 0, 'silver': 0, 'electrum': 0, 'gold': 0, 'platinum': 0, 'gems': 0, 'jewellery': 0, 'magic': 0}
-                valuations = {'gems':[],'jewellery':[], 'magic':[]}
-
-                total_treasure_monster =  {'copper': 0, 'silver': 0, 'electrum': 0, 'gold': 0, 'platinum': 0, 'gems': 0, 'jewellery': 0, 'magic': 0}
-                total_valuations_monster = {'gems':[],'jewellery':[], 'magic':[], 'magic_xp':[],  'magic_values':[],   'magic_list':[]}
-
-                m_xp_total = 0
-
-                for room in room_stack['shape_dict']:
-                    keylist = list(room_stack[room].keys())
-
-                    if VERBOSITY:
-                        print(keylist,room_stack[room][keylist[0]])
-                        if abs(keylist[0][2]) == down + 1:
-                            f.write('<h4>Data: ' + str(room) + '</h4>')
-                            f.write(str(room_stack['shape_dict'][room]) + '<br>')
-
-                    #f.write("Contents:" + str(room_stack['shape_dict'][room]['contents']))
-
-                    if abs(keylist[0][2]) == down + 1:
-                        f.write('<br><b>Key ' + str(room) + ': </b>')
-                    if 'empty' in room_stack['shape_dict'][room]['contents']:
-                        if VERBOSITY:
-                            print(str(room_stack['shape_dict'][room]['contents']))
-                        if abs(keylist[0][2]) == down + 1:
-                            f.write('Empty<br>')
-                    else:
-                        for key in room_stack['shape_dict'][room]['contents']:
-                            if key == 'monster' or key == 'treasure' or key == 'trap' or key == 'level':
-                                if abs(keylist[0][2]) == down + 1:
-                                    f.write(str(key) + ":" + str(room_stack['shape_dict'][room]['contents'][key]) + '<br>')
-                                if key == 'treasure':
-                                    for tkey in total_treasure:
-                                        total_treasure[tkey] = total_treasure[tkey] + room_stack['shape_dict'][room]['contents'][key]['type'][tkey]
-                                        if tkey == 'gems' and room_stack['shape_dict'][room]['contents'][key]['type'][tkey] > 0:
-                                            valuations['gems'] = valuations['gems'] + room_stack['shape_dict'][room]['contents'][key]['gems_values']
-                                        if tkey == 'jewellery' and room_stack['shape_dict'][room]['contents'][key]['type'][tkey] > 0:
-                                            valuations['jewellery'] = valuations['jewellery'] + room_stack['shape_dict'][room]['contents'][key]['jewellery_values']
-                                        if tkey == 'magic' and room_stack['shape_dict'][room]['contents'][key]['type'][tkey] > 0:
-                                            valuations['magic'] = valuations['magic'] + room_stack['shape_dict'][room]['contents']['treasure']['magic_values']
-                                    ###make monster treasure
-                                if key == 'monster':    
-                                    ## work out XP then treasure
-                                    monster_stack['key_count'] += 1
-
-                                    mno = room_stack['shape_dict'][room]['contents'][key]['No']
-                                    mxp = room_stack['shape_dict'][room]['contents'][key]['XP']
-
-                                    if isinstance(room_stack['shape_dict'][room]['contents'][key]['type'], dict):
-                                        # problems with no encounter here
-                                        if VERBOSITY:
-                                            print("CHARACTER PARTY!")
-                                        for c in room_stack['shape_dict'][room]['contents'][key]['type']:
-                                            if 'level' in room_stack['shape_dict'][room]['contents'][key]['type'][c]: #hack for a base xp points based on DMG table
-                                                cxp = xp_d[room_stack['shape_dict'][room]['contents'][key]['type'][c]['level']]
-                                            else:
-                                                cxp = 20
-                                            m_xp_total = m_xp_total + cxp
-                                    else:
-                                        if VERBOSITY:
-                                            print("key:",key,"MNO:",mno,"WNXP",mxp)
-                                        m_xp_total = m_xp_total + mxp * mno
-
-                                    monster_treasure =  {'copper': 0, 'silver': 0, 'electrum': 0, 'gold': 0, 'platinum': 0, 'gems': 0, 'jewellery': 0, 'magic': 0}
-                                    monster_valuations = {'gems':[],'jewellery':[], 'magic':[]}
-                                    monster_valuations['magic_list'] = []
-                                    monster_valuations['magic_xp'] = [] 
-                                    monster_valuations['magic_values'] = []
-
-                                    treasure_list = room_stack['shape_dict'][room]['contents']['monster']['treasure_individual'] + room_stack['shape_dict'][room]['contents']['monster']['treasure_lair']
-                                    lairtry = int(room_stack['shape_dict'][room]['contents']['monster']['lair'].replace('%',''))
-
-                                    inlair = False
-                                    if lairtry > 0:
-                                        l = roll_dice(1,100)
-                                        individual = ['I','J','K','L','M','N']
-                                        if VERBOSITY:
-                                            if abs(keylist[0][2]) == down + 1:
-                                                f.write("LairTry:" + str(l) + ' from ' + str(lairtry))
-                                    
-                                        if l <= lairtry:
-                                            inlair = True
-                                            if VERBOSITY:
-                                                if abs(keylist[0][2]) == down + 1:
-                                                    f.write(' is in lair: ' + str(inlair)  + '<br>')
-                                            
-                                    
-                                    if inlair:
-                                        if len(treasure_list) > 0:
-                                            for t in room_stack['shape_dict'][room]['contents']['monster']['treasure_lair']:
-                                                if 'x' not in t:
-                                                    treasure = treasure_choice(t, room_stack['shape_dict'][room]['contents']['monster']['No'])
-                                                    if VERBOSITY:               
-                                                        #if isinstance(treasure['magic'], list): #if no data                                                                                         
-                                                            #print("MTMAGIC",monster_treasure['magic'],treasure['magic'])
-                                                        pass
-                                                    #has been an exception here, maybe a treasure type problem in monster dict
-                                                    try:
-                                                        monster_treasure['copper'] = monster_treasure['copper'] + treasure['copper']
-                                                    except Exception as treasureE:
-                                                        print(room_stack['shape_dict'][room]['contents']['monster']['treasure_lair'])
-                                                        print(treasure)
-                                                        print(treasureE)
-                                                        print("OBSCURE BUG TO FIX TRACKING") #H, S, T U
-                                                        quit()
-                                                    monster_treasure['silver'] = monster_treasure['silver'] + treasure['silver']
-                                                    monster_treasure['electrum'] = monster_treasure['electrum'] + treasure['electrum']
-                                                    monster_treasure['gold'] = monster_treasure['gold'] + treasure['gold']
-                                                    monster_treasure['platinum'] = monster_treasure['platinum'] + treasure['platinum']
-                                                    monster_treasure['gems'] = monster_treasure['gems'] + treasure['gems']
-                                                    monster_treasure['jewellery'] = monster_treasure['jewellery'] + treasure['jewellery']
-                                                    if isinstance(treasure['magic'], list): #if no data
-                                                        monster_treasure['magic'] = monster_treasure['magic'] + len(treasure['magic'])
-                                                    else:
-                                                        monster_treasure['magic'] = monster_treasure['magic'] + treasure['magic']
-                                    else:
-                                        for t in room_stack['shape_dict'][room]['contents']['monster']['treasure_individual']:
-                                            if 'x' not in t:
-                                                treasure = treasure_choice(t, room_stack['shape_dict'][room]['contents']['monster']['No'])
-                                                for n in range(room_stack['shape_dict'][room]['contents']['monster']['No']):
-                                                    if VERBOSITY:                                                
-                                                        print("MTMAGIC",monster_treasure['magic'],treasure['magic'])
-                                                    monster_treasure['copper'] = monster_treasure['copper'] + treasure['copper']
-                                                    monster_treasure['silver'] = monster_treasure['silver'] + treasure['silver']
-                                                    monster_treasure['electrum'] = monster_treasure['electrum'] + treasure['electrum']
-                                                    monster_treasure['gold'] = monster_treasure['gold'] + treasure['gold']
-                                                    monster_treasure['platinum'] = monster_treasure['platinum'] + treasure['platinum']
-                                                    monster_treasure['gems'] = monster_treasure['gems'] + treasure['gems']
-                                                    monster_treasure['jewellery'] = monster_treasure['jewellery'] + treasure['jewellery']
-                                                    if isinstance(treasure['magic'], list): #if no data
-                                                        monster_treasure['magic'] = monster_treasure['magic'] + len(treasure['magic'])
-                                                    else:
-                                                        monster_treasure['magic'] = monster_treasure['magic'] + treasure['magic']
-
-                                    #do valuations
-                                    monster_gems_list = []
-                                    for g in range(monster_treasure['gems']):
-                                        base_value, description = select_gemstone()
-                                        new_base_value = update_gemstone(base_value)
-                                        monster_gems_list.append(new_base_value)
-                                    monster_valuations['gems'] = monster_gems_list                                            
-
-                                    monster_jewellery_list = []
-                                    for g in range(monster_treasure['jewellery']):
-                                        base_value, description = select_jewellery()
-                                        monster_jewellery_list.append(base_value)
-                                    monster_valuations['jewellery'] = monster_jewellery_list
-
-                                    monster_magic_list = []
-                                    for g in range(monster_treasure['magic']):
-                                        item, choice = select_magic_item()
-                                        monster_magic_list.append([item, choice])
-                                    monster_valuations['magic_list'] = monster_magic_list
-                                    
-                                    for m in monster_valuations['magic_list']:
-                                        monster_valuations['magic_xp'].append(m[1][1]) 
-                                        monster_valuations['magic_values'].append(m[1][2])
-
-                                    if len(treasure_list) > 0:
-                                        if inlair:
-                                            if abs(keylist[0][2]) == down + 1:
-                                                f.write('<i>Monster Lair Treasure:</i>')
-                                                f.write(str(monster_treasure) + '<br>')
-                                                f.write(str(monster_valuations) + '<br>')
-                                                #f.write('<br>')
-
-                                        total_treasure_monster['copper'] = total_treasure_monster['copper'] + monster_treasure['copper']
-                                        total_treasure_monster['silver'] = total_treasure_monster['silver'] + monster_treasure['silver']
-                                        total_treasure_monster['electrum'] = total_treasure_monster['electrum'] + monster_treasure['electrum']
-                                        total_treasure_monster['gold'] = total_treasure_monster['gold'] + monster_treasure['gold']
-                                        total_treasure_monster['platinum'] = total_treasure_monster['platinum'] + monster_treasure['platinum']
-                                        total_treasure_monster['gems'] = total_treasure_monster['gems'] + monster_treasure['gems']
-                                        total_treasure_monster['jewellery'] = total_treasure_monster['jewellery'] + monster_treasure['jewellery']
-                                        total_treasure_monster['magic'] = total_treasure_monster['magic'] + monster_treasure['magic']
-
-                                        total_valuations_monster['jewellery'] = total_valuations_monster['jewellery'] + monster_valuations['jewellery']
-                                        total_valuations_monster['gems'] = total_valuations_monster['gems'] + monster_valuations['gems']
-                                        total_valuations_monster['magic_list'] = total_valuations_monster['magic_list'] + monster_valuations['magic_list']
-                                        total_valuations_monster['magic_xp'] = total_valuations_monster['magic_values'] + monster_valuations['magic_xp']
-                                        total_valuations_monster['magic_values'] = total_valuations_monster['magic_values'] + monster_valuations['magic_values']
-
-                            # to here??
-                            else: #other key
-                                pass #just informational data
-                                #if 'empty' not in room_stack['shape_dict'][room]['contents']:
-                                    #f.write('<br><b>Key ' + str(room) + ': </b>')
-                                    #f.write('Empty<br>')                                
-
-                    if 'water' in room_stack['shape_dict'][room] and room_stack['shape_dict'][room]['water'] != 'N':
-                        #print(room_stack['shape_dict'][room])
-                        monster_details = False
-                        if 'pool' in room_stack['shape_dict'][room]:
-                            #print('pool')
-                            if 'monster_details' in room_stack['shape_dict'][room]['pool']:
-                                #print(room_stack['shape_dict'][room]['pool'])
-                                wett = 'pool'
-                                monster_details = True
-                            if abs(keylist[0][2]) == down + 1:                                
-                                f.write("water:" + str(room_stack['shape_dict'][room]['pool']) + '<br>')
-                        if 'lake' in room_stack['shape_dict'][room]:
-                            #print('lake')
-                            #print(room_stack['shape_dict'][room]['lake'])
-                            if 'monster_details' in room_stack['shape_dict'][room]['lake']:
-                                #print(room_stack['shape_dict'][room]['lake'])
-                                wett = 'lake'
-                                monster_details = True
-                            if abs(keylist[0][2]) == down + 1:                                
-                                f.write("water:" + str(room_stack['shape_dict'][room]['lake']) + '<br>')
-
-                        if monster_details:
-                            #room_stack['shape_dict'][room][wet]
-                            ## doing second round of monster accounting
-                            monster_stack['key_count'] += 1
-
-                            mno = room_stack['shape_dict'][room][wett]['monster_details']['No']
-                            mxp = room_stack['shape_dict'][room][wett]['monster_details']['XP']
-
-                            if isinstance(room_stack['shape_dict'][room][wett]['monster_details']['type'], dict):
-                                # problems with no encounter here
-                                if VERBOSITY:
-                                    print("CHARACTER PARTY!")
-                                for c in room_stack['shape_dict'][room][wett]['monster_details']['type']:
-                                    if 'level' in room_stack['shape_dict'][room][wett]['monster_details']['type'][c]: #hack for a base xp points based on DMG table
-                                        cxp = xp_d[room_stack['shape_dict'][room][wett]['monster_details']['type'][c]['level']]
-                                    else:
-                                        cxp = 20
-                                    m_xp_total = m_xp_total + cxp
-                            else:
-                                if VERBOSITY:
-                                    print("key:",key,"MNO:",mno,"WNXP",mxp)
-                                m_xp_total = m_xp_total + mxp * mno
-
-                            monster_treasure =  {'copper': 0, 'silver': 0, 'electrum': 0, 'gold': 0, 'platinum': 0, 'gems': 0, 'jewellery': 0, 'magic': 0}
-                            monster_valuations = {'gems':[],'jewellery':[], 'magic':[]}
-                            monster_valuations['magic_list'] = []
-                            monster_valuations['magic_xp'] = [] 
-                            monster_valuations['magic_values'] = []
-
-                            treasure_list = room_stack['shape_dict'][room][wett]['monster_details']['treasure_individual'] + room_stack['shape_dict'][room][wett]['monster_details']['treasure_lair']
-                            lairtry = int(room_stack['shape_dict'][room][wett]['monster_details']['lair'].replace('%',''))
-
-                            inlair = False
-                            if lairtry > 0:
-                                l = roll_dice(1,100)
-                                individual = ['I','J','K','L','M','N']
-                                if VERBOSITY:
-                                    if abs(keylist[0][2]) == down + 1:                                
-                                        f.write("LairTry:" + str(l) + ' from ' + str(lairtry))
-                            
-                                if l <= lairtry:
-                                    inlair = True
-                                    if abs(keylist[0][2]) == down + 1:                                    
-                                        f.write(' is in lair: ' + str(inlair)  + '<br>')
-                                    
-                            
-                            if inlair:
-                                if len(treasure_list) > 0:
-                                    for t in room_stack['shape_dict'][room][wett]['monster_details']['treasure_lair']:
-                                        if 'x' not in t:
-                                            treasure = treasure_choice(t, room_stack['shape_dict'][room][wett]['monster_details']['No'])
-                                            if VERBOSITY:                                                
-                                                print("MTMAGIC",monster_treasure['magic'],treasure['magic'])
-                                            #has been an exception here, maybe a treasure type problem in monster dict
-                                            monster_treasure['copper'] = monster_treasure['copper'] + treasure['copper']
-                                            monster_treasure['silver'] = monster_treasure['silver'] + treasure['silver']
-                                            monster_treasure['electrum'] = monster_treasure['electrum'] + treasure['electrum']
-                                            monster_treasure['gold'] = monster_treasure['gold'] + treasure['gold']
-                                            monster_treasure['platinum'] = monster_treasure['platinum'] + treasure['platinum']
-                                            monster_treasure['gems'] = monster_treasure['gems'] + treasure['gems']
-                                            monster_treasure['jewellery'] = monster_treasure['jewellery'] + treasure['jewellery']
-                                            if isinstance(treasure['magic'], list): #if no data
-                                                monster_treasure['magic'] = monster_treasure['magic'] + len(treasure['magic'])
-                                            else:
-                                                monster_treasure['magic'] = monster_treasure['magic'] + treasure['magic']
-                            else:
-                                for t in room_stack['shape_dict'][room][wett]['monster_details']['treasure_individual']:
-                                    if 'x' not in t:
-                                        treasure = treasure_choice(t, room_stack['shape_dict'][room][wett]['monster_details']['No'])
-                                        for n in range(room_stack['shape_dict'][room][wett]['monster_details']['No']):
-                                            if VERBOSITY:                                                
-                                                print("MTMAGIC",monster_treasure['magic'],treasure['magic'])
-                                            monster_treasure['copper'] = monster_treasure['copper'] + treasure['copper']
-                                            monster_treasure['silver'] = monster_treasure['silver'] + treasure['silver']
-                                            monster_treasure['electrum'] = monster_treasure['electrum'] + treasure['electrum']
-                                            monster_treasure['gold'] = monster_treasure['gold'] + treasure['gold']
-                                            monster_treasure['platinum'] = monster_treasure['platinum'] + treasure['platinum']
-                                            monster_treasure['gems'] = monster_treasure['gems'] + treasure['gems']
-                                            monster_treasure['jewellery'] = monster_treasure['jewellery'] + treasure['jewellery']
-                                            if isinstance(treasure['magic'], list): #if no data
-                                                monster_treasure['magic'] = monster_treasure['magic'] + len(treasure['magic'])
-                                            else:
-                                                monster_treasure['magic'] = monster_treasure['magic'] + treasure['magic']
-
-                            #do valuations
-                            monster_gems_list = []
-                            for g in range(monster_treasure['gems']):
-                                base_value, description = select_gemstone()
-                                new_base_value = update_gemstone(base_value)
-                                monster_gems_list.append(new_base_value)
-                            monster_valuations['gems'] = monster_gems_list                                            
-
-                            monster_jewellery_list = []
-                            for g in range(monster_treasure['jewellery']):
-                                base_value, description = select_jewellery()
-                                monster_jewellery_list.append(base_value)
-                            monster_valuations['jewellery'] = monster_jewellery_list
-
-                            monster_magic_list = []
-                            for g in range(monster_treasure['magic']):
-                                item, choice = select_magic_item()
-                                monster_magic_list.append([item, choice])
-                            monster_valuations['magic_list'] = monster_magic_list
-                            
-                            for m in monster_valuations['magic_list']:
-                                monster_valuations['magic_xp'].append(m[1][1]) 
-                                monster_valuations['magic_values'].append(m[1][2])
-
-                            if len(treasure_list) > 0:
-                                if inlair:
-                                    if abs(keylist[0][2]) == down + 1:
-                                        f.write('<h5>Wet Monster Lair Treasure:</h5>')
-                                        f.write(str(monster_treasure) + '<br>')
-                                        f.write(str(monster_valuations) + '<br>')
-                                        f.write('<br>')
-
-                                total_treasure_monster['copper'] = total_treasure_monster['copper'] + monster_treasure['copper']
-                                total_treasure_monster['silver'] = total_treasure_monster['silver'] + monster_treasure['silver']
-                                total_treasure_monster['electrum'] = total_treasure_monster['electrum'] + monster_treasure['electrum']
-                                total_treasure_monster['gold'] = total_treasure_monster['gold'] + monster_treasure['gold']
-                                total_treasure_monster['platinum'] = total_treasure_monster['platinum'] + monster_treasure['platinum']
-                                total_treasure_monster['gems'] = total_treasure_monster['gems'] + monster_treasure['gems']
-                                total_treasure_monster['jewellery'] = total_treasure_monster['jewellery'] + monster_treasure['jewellery']
-                                total_treasure_monster['magic'] = total_treasure_monster['magic'] + monster_treasure['magic']
-
-                                total_valuations_monster['jewellery'] = total_valuations_monster['jewellery'] + monster_valuations['jewellery']
-                                total_valuations_monster['gems'] = total_valuations_monster['gems'] + monster_valuations['gems']
-                                total_valuations_monster['magic_list'] = total_valuations_monster['magic_list'] + monster_valuations['magic_list']
-                                total_valuations_monster['magic_xp'] = total_valuations_monster['magic_values'] + monster_valuations['magic_xp']
-                                total_valuations_monster['magic_values'] = total_valuations_monster['magic_values'] + monster_valuations['magic_values']
-
-
-
-                        if VERBOSITY:                                                
-                            print("HAS WATER TO DO")
-                        water_dict[room] = room_stack['shape_dict']
-            #if down == 0:
-            if len(wandering_monster_stack) > 0:
-                if VERBOSITY:                                          
-                    print("roll numbers:",wandering_monster_rolls)
-                wm_xp_total = 0
-                wm_total_treasure = {'copper': 0, 'silver': 0, 'electrum': 0, 'gold': 0, 'platinum': 0, 'gems': 0, 'jewellery': 0, 'magic': 0}
-                f.write('<br>')
-                for wm in range(wandering_monster_stack['key_count']):
-                    wmkeylist = list(wandering_monster_stack[wm+1].keys())
-                    if abs(wmkeylist[0][2]) == down+1:                    
-                        f.write('<b>Wandering Monster ' + str(wm) + ': </b>')
-                        f.write(str(wandering_monster_stack[wm+1]) + ' ')
-
-                    for key in wandering_monster_stack[wm+1]:
-                        #f.write("key" + str(key) + '<br>')
-                        #for subkey in wandering_monster_stack[wm+1]:
-                        wmno = wandering_monster_stack[wm+1][key]['No']
-                        wmxp = wandering_monster_stack[wm+1][key]['XP']
-
-                        #wandering_monster_stack[wandering_monster_stack['key_count']][wm_coord]['No'] = 9
-                        if VERBOSITY:                                                
-                            print("LOOP:",wm,"WMKEY:",wandering_monster_stack[wm+1])
-                        if isinstance(wandering_monster_stack[wm+1][key]['type'], dict):
-                            if VERBOSITY:                                                
-                                print("CHARACTER PARTY!")
-                                print("WMSUBTABLE:",len(wandering_monster_subtable),wandering_monster_subtable,"KEYCOUNT:",wandering_monster_stack['key_count'])
-                            for c in wandering_monster_stack[wm+1][key]['type']:
-                                if 'level' in wandering_monster_stack[wm+1][key]['type'][c]: #hack for a base xp points based on DMG table
-                                    cxp = xp_d[wandering_monster_stack[wm+1][key]['type'][c]['level']]
-                                else:
-                                    cxp = 20
-                                wm_xp_total = wm_xp_total + cxp
-                        else:
-                            if VERBOSITY:                                                
-                                print("key:",key,"WMNO:",wmno,"WNXP",wmxp)
-                            wm_xp_total = wm_xp_total + wmxp * wmno
-                        #treasures
-                        wmti = []
-                        if 'NO-ENCOUNTER' not in wandering_monster_stack[wm+1][key]['type']:
-                            if VERBOSITY:                                                
-                                print("wm treasure checking",str(wandering_monster_stack[wm+1]))
-                            #wmlair = wandering_monster_stack[wm+1][key]['lair']
-                            #wmlair = wmlair.replace('%','')
-                            #wmlair = int(wmlair)
-                            wmti = wandering_monster_stack[wm+1][key]['treasure_individual']
-                            if abs(wmkeylist[0][2]) == down+1:                    
-                                f.write(" - XP:" + str(wmxp*wmno) + '<br>')
-
-                        if len(wmti) > 0:
-                            for t in wmti:
-                                #do treasure check
-                                if 'x' not in t:
-                                    treasure = treasure_choice(t, wmno)
-                                    wm_total_treasure['copper'] = wm_total_treasure['copper'] + treasure['copper']
-                                    wm_total_treasure['silver'] = wm_total_treasure['silver'] + treasure['silver']
-                                    wm_total_treasure['electrum'] = wm_total_treasure['electrum'] + treasure['electrum']
-                                    wm_total_treasure['gold'] = wm_total_treasure['gold'] + treasure['gold']
-                                    wm_total_treasure['platinum'] = wm_total_treasure['platinum'] + treasure['platinum']
-                                    wm_total_treasure['gems'] = wm_total_treasure['gems'] + treasure['gems']
-                                    wm_total_treasure['jewellery'] = wm_total_treasure['jewellery'] + treasure['jewellery']
-                                    wm_total_treasure['magic'] = wm_total_treasure['magic'] + treasure['magic']
-                                    if abs(wmkeylist[0][2]) == down+1:                    
-                                        f.write("Treasure:" + str(treasure) + '<br>')
-
-                #got to do valuations if there are any, but probably not
-                #have to get WM to carry magic if they have too
-                f.write('<br><b>Full Dungeon Stats:</b><br>')                            
-                f.write('<br>' + "Monster Total XP: " + str(m_xp_total) + '<br>')                            
-                f.write('' + "Monster Total Treasure: " + str(total_treasure_monster) + " Total Valuations: " + str(total_valuations_monster) + '<br>')                            
-
-                f.write('<br>' + "Wandering Monster Total XP: " + str(wm_xp_total) + '<br>')                            
-                f.write('' + "Wandering Monster Total Treasure: " + str(wm_total_treasure) + '<br>')                            
-                if VERBOSITY:
-                    f.write('<br>' + "Wandering Monster Subtable:" + str(wandering_monster_subtable) + '<br>')  
-
-                f.write('<br>' + "Room Total Treasure:" + str(total_treasure) + '<br>')                            
-                f.write('' + "Room Total Gems: " + str(sum([gem for gem in valuations['gems']])) + " Jewellery: " + str(sum([j for j in valuations['jewellery']])) + " Magic:" + str(sum([m for m in valuations['magic']])) + '<br>')                                        
-
-                #want a wm count
-                #want a monster count
-                df = pd.DataFrame()
-                df['monster_xp'] = [m_xp_total]
-                df['wm_xp'] = [wm_xp_total]
-                df['monster_total'] = [monster_stack['key_count']]
-                df['wm_total'] = [wandering_monster_stack['key_count']]
-                df['traps'] = [trap_stack['key_count']]
-                df['rooms'] = [room_stack['key_count']]
-
-                df['total_treasure_copper'] = [total_treasure['copper']]
-                df['total_treasure_silver'] = [total_treasure['silver']]
-                df['total_treasure_electrum'] = [total_treasure['electrum']]
-                df['total_treasure_gold'] = [total_treasure['gold']]
-                df['total_treasure_platinum'] = [total_treasure['platinum']]
-                df['total_treasure_gems'] = [total_treasure['gems']]
-                df['total_treasure_jewellery'] = [total_treasure['jewellery']]
-                df['total_treasure_magic'] = [total_treasure['magic']]
-                df['total_treasure_monster_copper'] = [total_treasure_monster['copper']]
-                df['total_treasure_monster_silver'] = [total_treasure_monster['silver']]
-                df['total_treasure_monster_electrum'] = [total_treasure_monster['electrum']]
-                df['total_treasure_monster_gold'] = [total_treasure_monster['gold']]
-                df['total_treasure_monster_platinum'] = [total_treasure_monster['platinum']]
-                df['total_treasure_monster_gems'] = [total_treasure_monster['gems']]
-                df['total_treasure_monster_jewellery'] = [total_treasure_monster['jewellery']]
-                df['total_treasure_monster_magic'] = [total_treasure_monster['magic']]
-                df['wm_total_treasure_copper'] = [wm_total_treasure['copper']]
-                df['wm_total_treasure_silver'] = [wm_total_treasure['silver']]
-                df['wm_total_treasure_electrum'] = [wm_total_treasure['electrum']]
-                df['wm_total_treasure_gold'] = [wm_total_treasure['gold']]
-                df['wm_total_treasure_platinum'] = [wm_total_treasure['platinum']]
-                df['wm_total_treasure_gems'] = [wm_total_treasure['gems']]
-                df['wm_total_treasure_jewellery'] = [wm_total_treasure['jewellery']]
-                df['wm_total_treasure_magic'] = [wm_total_treasure['magic']]
-
-
-                total_treasure['copper'] = total_treasure['copper'] + wm_total_treasure['copper'] + total_treasure_monster['copper']
-                total_treasure['silver'] = total_treasure['silver'] + wm_total_treasure['silver'] + total_treasure_monster['silver']
-                total_treasure['electrum'] = total_treasure['electrum'] + wm_total_treasure['electrum'] + total_treasure_monster['electrum']
-                total_treasure['gold'] = total_treasure['gold'] + wm_total_treasure['gold'] + total_treasure_monster['gold']
-                total_treasure['platinum'] = total_treasure['platinum'] + wm_total_treasure['platinum'] + total_treasure_monster['platinum']
-                total_treasure['gems'] = total_treasure['gems'] + wm_total_treasure['gems'] + total_treasure_monster['gems']
-                total_treasure['jewellery'] = total_treasure['jewellery'] + wm_total_treasure['jewellery'] + total_treasure_monster['jewellery']
-                total_treasure['magic'] = total_treasure['magic'] + wm_total_treasure['magic'] + total_treasure_monster['magic']
-
-            f.write('<h4>Total Treasure: ' + str(total_treasure) + '</h4>')
-            gold = total_treasure['copper'] / 100.0 + total_treasure['silver'] / 10.0 + total_treasure['electrum']/2.0 + total_treasure['gold'] + total_treasure['platinum'] * 10
-            gem_total = 0
-            jewellery_total = 0
-            magic_total = 0
-            if total_treasure['gems'] > 0:
-                for g in valuations['gems'] + total_valuations_monster['gems']:
-                    gem_total = gem_total + g
-            if total_treasure['jewellery'] > 0:
-                for j in valuations['jewellery'] + total_valuations_monster['jewellery']:
-                    jewellery_total = jewellery_total + j
-            if total_treasure['magic'] > 0:
-                for m in valuations['magic'] + total_valuations_monster['magic_values']:
-                    magic_total = magic_total + int(m)
-
-            f.write('Coins: ' + str(gold) + '<br>')
-            f.write('Gems: ' + str(gem_total) + '<br>')
-            f.write('Jewellery: ' + str(jewellery_total) + '<br>')
-            f.write('Magic: ' + str(magic_total) + '<br>')
-            f.write('<b>Total Gold Equivalent: ' + str(gold + gem_total + jewellery_total + magic_total) + '</b><br>')
-
-            f.write('<b>Total Rooms: ' + str(room_stack['key_count'])  + '</b>')
-
-            f.write('<br><br>')
-            # Add link to enhanced version
-            enhanced_url = 'dungeon_' + str(down+1) + '_enhanced.html'
-            f.write('<a href="' + enhanced_url + '" style="display: inline-block; background: linear-gradient(135deg, #ffd700 0%, #ffed4e 100%); color: #000; padding: 10px 20px; text-decoration: none; border-radius: 5px; font-weight: bold; margin-bottom: 10px;">🏰 View Enhanced Map</a>' + '<br><br>')
-            
-            for link in range(zwidth-1):                
-                url = 'dungeon_' + str(link+1) + '.html'
-                f.write('<a href="' + url + '"' + '>Dungeon Level ' + str(link+1) + '</a>' + '<br>')
-
-            f.write('<br><b>Legend</b><br>')                
-            for key in legend_dict:
-                f.write(str(key) + ':' + ' ' + str(legend_dict[key]) + '<br>')
-            for key in background_dict:
-                f.write(str(key) + ':' + ' ' + str(background_dict[key]) + '<br>')
-
-            #end of page
-            f.write(strend)
-        
-        # Generate enhanced HTML visualization
-        try:
-            enhanced_html = generate_enhanced_html(
-                dungeon_data={'level': down+1},
-                level_num=down,
-                room_stack=room_stack,
-                downlist=downlist,
-                coord_limits=coord_lim
-            )
-            
-            if usepath != '' and str(suffix) != '':
-                enhanced_path = os.path.join(usepath, str(suffix), 'dungeon_' + str(down+1) + '_enhanced.html')
-            else:
-                enhanced_path = 'dungeon_' + str(down+1) + '_enhanced.html'
-            
-            with open(enhanced_path, 'w', encoding='utf-8') as f:
-                f.write(enhanced_html)
-            
-            if VERBOSITY:
-                print(f"Generated enhanced visualization: {enhanced_path}")
-        except Exception as e:
-            print(f"Warning: Could not generate enhanced visualization for level {down+1}: {e}")
-            if VERBOSITY:
-                import traceback
-                traceback.print_exc()
-
-        df['Coins'] = [gold]
-        df['Gems'] = [gem_total]
-        df['Jewellery'] = [jewellery_total]
-        df['Magic'] = [magic_total]
-        df['Total Gold Equivalent'] = [gold + gem_total + jewellery_total + magic_total]
-        df['coord_lim'] = [coord_lim]
-        df['x'] = [xwidth]
-        df['y'] = [ywidth]
-        df['z'] = [zwidth-1]
-        df['Periodic Checks'] = [PERIODIC_CHECKS]
-
-        df.to_csv('dungeon-stats.csv', index=False)
+            print("downloop:",down,"ORIGIN",downlist.origins[down],"SHAPE",downlist.codes[down].shape)
 
+    #treasure, XP and valuations, rolled once for the whole dungeon - the room key under each
+    #classic map (classic_mapper.level_notes_html) and the stats below only read these records
     if VERBOSITY:
-        with open('dungeon.pkl','wb') as fd:
-            pickle.dump(dungeon, fd)
-
-        with open('downlist.pkl','wb') as fd:
-            pickle.dump(downlist, fd)
-
-        with open('room_stack.pkl','wb') as fd:
-            pickle.dump(room_stack, fd)
-
-        with open('exit_stack.pkl','wb') as fd:
-            pickle.dump(room_stack, fd)
-
-        with open('wandering_monster_stack.pkl','wb') as fd:
-            pickle.dump(wandering_monster_stack, fd)
-
-        with open('dungeon.pkl','rb') as fd:
-            df = pickle.load(fd)
-            if zwidth -1 > 1:
-                #print("picklecheck",df)
-                pass
-
-        with open('downlist.pkl','rb') as fd:
-            df = pickle.load(fd)
-            if zwidth -1 > 1:
-                #print("picklecheck",df)
-                pass
+        print("roll numbers:",wandering_monster_rolls)
+    accounting = account_dungeon(room_stack, wandering_monster_stack, xp_d, VERBOSITY, totals)
+
+    #want a wm count
+    #want a monster count
+    df = pd.DataFrame()
+    df['monster_xp'] = [accounting['monster_xp']]
+    df['wm_xp'] = [accounting['wm_xp']]
+    df['monster_total'] = [accounting['monsters']]
+    df['wet_monster_total'] = [accounting['wet_monsters']]
+    df['wm_total'] = [totals['wandering']]
+    df['traps'] = [totals['traps']]
+    df['rooms'] = [room_stack['key_count']]
+    for prefix, treasure in [('total_treasure_', accounting['room_treasure']), ('total_treasure_monster_', accounting['monster_treasure']), ('wm_total_treasure_', accounting['wm_treasure'])]:
+        for kind in TREASURE_KINDS:
+            df[prefix + kind] = [treasure[kind]]
+    df['Coins'] = [accounting['coins']]
+    df['Gems'] = [accounting['gems_value']]
+    df['Jewellery'] = [accounting['jewellery_value']]
+    df['Magic'] = [accounting['magic_value']]
+    df['Total Gold Equivalent'] = [accounting['gold_equivalent']]
+    df['coord_lim'] = [coord_lim]
+    df['x'] = [xwidth]
+    df['y'] = [ywidth]
+    df['z'] = [zwidth-1]
+    df['Periodic Checks'] = [PERIODIC_CHECKS]
+
+
+    run = {
+        'suffix': suffix,
+        'usepath': usepath,
+        'verbosity': VERBOSITY,
+        'levels': zwidth-1,
+        'coord_lim': coord_lim,
+        'dungeon': dungeon,
+        'downlist': downlist,
+        'accounting': accounting,
+        'wandering_monster_subtable': wandering_monster_subtable,
+        'room_stack': room_stack,
+        'exit_stack': exit_stack,
+        'wandering_monster_stack': wandering_monster_stack,
+        'dead_end_dict': dead_end_dict,
+        'border_index': border_index,
+        'error_dict': error_dict,
+        'df': df,
+        'render_cache': render_cache,
+    }
+    write_outputs(run, OUTPUTS, render_workers)
 
+    if VERBOSITY:
         print("\nFINAL ROOM STACK",room_stack)   
             
         #print("\nERROR LOG",error_dict,"WATER_DICT:",water_dict, "WM_STACK:",wandering_monster_stack)
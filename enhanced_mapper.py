@@ -2,93 +2,71 @@
 Enhanced dungeon mapper with sophisticated SVG-based visualization.
 This module provides modern, visually appealing dungeon maps while maintaining
 compatibility with the original HTML table output.
+
+Only squares that are not empty rock are drawn. Every square is a <use> of
+one tile symbol, coloured by a CSS class per colour pair, and the tooltips
+live in a JSON table read by the page script instead of on each square.
+
+generate_canvas_html is the same map for very large levels: the squares go
+in as a base64 array of codes and a canvas paints only the part in view.
+
+The shared viewer (generate_viewer_html) is one page for every level of a
+dungeon: its styles and script are written once, and each level's codes and
+room details are a small data file loaded when the level is opened.
 """
 
+import base64
 import html
+import json
 
+import numpy as np
 
-def sanitize_for_html(value):
-    """Safely convert a value to HTML-escaped string."""
-    if value is None:
-        return ''
-    return html.escape(str(value))
 
+# border_index sides, y grows down the map
+WALL_NAMES = {'xmin': 'west', 'xmax': 'east', 'ymin': 'north', 'ymax': 'south'}
 
-def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_limits):
-    """
-    Generate an enhanced HTML visualization with SVG-based rendering.
-    
-    Args:
-        dungeon_data: Dictionary containing dungeon information
-        level_num: The level number (0-indexed)
-        room_stack: Stack containing room information
-        downlist: Array of dungeon levels
-        coord_limits: Tuple of (min_coords, max_coords)
-    
-    Returns:
-        HTML string for enhanced visualization
-    """
-    down = level_num
-    xmin, ymin, zmin = coord_limits[0]
-    xmax, ymax, zmax = coord_limits[1]
-    
-    # Calculate dimensions
-    width = xmax - xmin + 1
-    height = ymax - ymin + 1
-    
-    # SVG cell size (larger for better detail)
-    cell_size = 40
-    svg_width = width * cell_size
-    svg_height = height * cell_size
-    
-    output_html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Enhanced Dungeon Map - Level {level_num + 1}</title>
-    <style>
-        * {{
+# page styles shared by the SVG and canvas maps
+ENHANCED_STYLE = """        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             background: linear-gradient(135deg, #1e1e1e 0%, #2d2d2d 100%);
             color: #e0e0e0;
             padding: 20px;
             min-height: 100vh;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1600px;
             margin: 0 auto;
             background: rgba(0, 0, 0, 0.3);
             border-radius: 12px;
             padding: 30px;
             box-shadow: 0 8px 32px rgba(0, 0, 0, 0.5);
-        }}
+        }
         
-        h1 {{
+        h1 {
             text-align: center;
             color: #ffd700;
             font-size: 2.5em;
             margin-bottom: 10px;
             text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.7);
             font-family: 'Palatino Linotype', 'Book Antiqua', Palatino, serif;
-        }}
+        }
         
-        .subtitle {{
+        .subtitle {
             text-align: center;
             color: #c0c0c0;
             font-size: 1.2em;
             margin-bottom: 30px;
             font-style: italic;
-        }}
+        }
         
-        .map-container {{
+        .map-container {
             background: #1a1a1a;
             border: 3px solid #4a4a4a;
             border-radius: 8px;
@@ -96,9 +74,9 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
             margin-bottom: 30px;
             overflow: auto;
             box-shadow: inset 0 2px 10px rgba(0, 0, 0, 0.5);
-        }}
+        }
         
-        .map-wrapper {{
+        .map-wrapper {
             display: inline-block;
             background: repeating-linear-gradient(
                 0deg,
@@ -114,17 +92,17 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
                 rgba(255, 255, 255, 0.02) 40px,
                 rgba(255, 255, 255, 0.02) 41px
             );
-        }}
+        }
         
-        .controls {{
+        .controls {
             display: flex;
             justify-content: center;
             gap: 15px;
             margin-bottom: 20px;
             flex-wrap: wrap;
-        }}
+        }
         
-        .btn {{
+        .btn {
             background: linear-gradient(135deg, #4a4a4a 0%, #2d2d2d 100%);
             color: #ffd700;
             border: 2px solid #6a6a6a;
@@ -134,164 +112,164 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
             font-size: 1em;
             transition: all 0.3s ease;
             font-weight: bold;
-        }}
+        }
         
-        .btn:hover {{
+        .btn:hover {
             background: linear-gradient(135deg, #5a5a5a 0%, #3d3d3d 100%);
             border-color: #ffd700;
             transform: translateY(-2px);
             box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
-        }}
+        }
         
-        .info-panel {{
+        .info-panel {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
             gap: 20px;
             margin-bottom: 30px;
-        }}
+        }
         
-        .info-card {{
+        .info-card {
             background: rgba(50, 50, 50, 0.5);
             border: 2px solid #4a4a4a;
             border-radius: 8px;
             padding: 20px;
             box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
-        }}
+        }
         
-        .info-card h3 {{
+        .info-card h3 {
             color: #ffd700;
             margin-bottom: 15px;
             font-size: 1.3em;
             border-bottom: 2px solid #4a4a4a;
             padding-bottom: 10px;
-        }}
+        }
         
-        .legend {{
+        .legend {
             background: rgba(30, 30, 30, 0.8);
             border: 2px solid #4a4a4a;
             border-radius: 8px;
             padding: 20px;
             margin-bottom: 20px;
-        }}
+        }
         
-        .legend h3 {{
+        .legend h3 {
             color: #ffd700;
             margin-bottom: 15px;
             font-size: 1.3em;
-        }}
+        }
         
-        .legend-grid {{
+        .legend-grid {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
             gap: 10px;
-        }}
+        }
         
-        .legend-item {{
+        .legend-item {
             display: flex;
             align-items: center;
             gap: 10px;
             padding: 5px;
-        }}
+        }
         
-        .legend-color {{
+        .legend-color {
             width: 30px;
             height: 30px;
             border: 1px solid #666;
             border-radius: 3px;
             flex-shrink: 0;
-        }}
+        }
         
-        .room-details {{
+        .room-details {
             background: rgba(30, 30, 30, 0.8);
             border: 2px solid #4a4a4a;
             border-radius: 8px;
             padding: 20px;
             max-height: 600px;
             overflow-y: auto;
-        }}
+        }
         
-        .room-details h3 {{
+        .room-details h3 {
             color: #ffd700;
             margin-bottom: 15px;
             font-size: 1.3em;
-        }}
+        }
         
-        .room-entry {{
+        .room-entry {
             background: rgba(50, 50, 50, 0.5);
             border-left: 4px solid #6a6a6a;
             padding: 15px;
             margin-bottom: 15px;
             border-radius: 4px;
-        }}
+        }
         
-        .room-entry:hover {{
+        .room-entry:hover {
             border-left-color: #ffd700;
             background: rgba(60, 60, 60, 0.5);
-        }}
+        }
         
-        .room-title {{
+        .room-title {
             color: #ffd700;
             font-size: 1.2em;
             font-weight: bold;
             margin-bottom: 10px;
-        }}
+        }
         
-        .room-content {{
+        .room-content {
             color: #c0c0c0;
             line-height: 1.6;
-        }}
+        }
         
-        .room-content strong {{
+        .room-content strong {
             color: #fff;
-        }}
+        }
         
-        .treasure {{
+        .treasure {
             color: #ffd700;
-        }}
+        }
         
-        .monster {{
+        .monster {
             color: #ff6b6b;
-        }}
+        }
         
-        .stats-grid {{
+        .stats-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
             gap: 10px;
-        }}
+        }
         
-        .stat-item {{
+        .stat-item {
             background: rgba(70, 70, 70, 0.3);
             padding: 10px;
             border-radius: 5px;
             border-left: 3px solid #ffd700;
-        }}
+        }
         
-        .stat-label {{
+        .stat-label {
             font-size: 0.85em;
             color: #a0a0a0;
             margin-bottom: 5px;
-        }}
+        }
         
-        .stat-value {{
+        .stat-value {
             font-size: 1.3em;
             font-weight: bold;
             color: #ffd700;
-        }}
+        }
         
         /* SVG Styles */
-        .cell {{
+        .cell {
             stroke: #333;
             stroke-width: 1;
             transition: all 0.2s ease;
-        }}
+        }
         
-        .cell:hover {{
+        .cell:hover {
             stroke: #ffd700;
             stroke-width: 3;
             filter: brightness(1.2);
-        }}
+        }
         
-        .cell-text {{
+        .cell-text {
             font-family: 'Courier New', monospace;
             font-size: 10px;
             fill: #000;
@@ -299,9 +277,9 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
             text-anchor: middle;
             dominant-baseline: middle;
             font-weight: bold;
-        }}
+        }
         
-        .tooltip {{
+        .tooltip {
             position: absolute;
             background: rgba(0, 0, 0, 0.9);
             color: #ffd700;
@@ -313,103 +291,349 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
             z-index: 1000;
             display: none;
             max-width: 300px;
-        }}
+        }
         
         /* Scrollbar styling */
-        ::-webkit-scrollbar {{
+        ::-webkit-scrollbar {
             width: 12px;
             height: 12px;
-        }}
+        }
         
-        ::-webkit-scrollbar-track {{
+        ::-webkit-scrollbar-track {
             background: #1a1a1a;
             border-radius: 6px;
-        }}
+        }
         
-        ::-webkit-scrollbar-thumb {{
+        ::-webkit-scrollbar-thumb {
             background: #4a4a4a;
             border-radius: 6px;
-        }}
+        }
         
-        ::-webkit-scrollbar-thumb:hover {{
+        ::-webkit-scrollbar-thumb:hover {
             background: #6a6a6a;
-        }}
+        }
         
-        @media print {{
-            body {{
+        @media print {
+            body {
                 background: white;
-            }}
-            .controls, .btn {{
+            }
+            .controls, .btn {
                 display: none;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🏰 Dungeon Level {level_num + 1} 🏰</h1>
-        <div class="subtitle">Advanced Dungeons & Dragons Random Dungeon</div>
+            }
+        }"""
+
+
+# map container rules of the canvas map, on top of ENHANCED_STYLE
+CANVAS_STYLE = """        .map-container {
+            position: relative;
+            height: 75vh;
+            padding: 0;
+        }
+        #dungeonCanvas {
+            position: absolute;
+            top: 0;
+            left: 0;
+        }"""
+
+# canvas renderer, showLevel(data) draws a canvas_payload
+CANVAS_SCRIPT = """        const cellSize = 40;
+        let currentZoom = 1;
+        const zoomStep = 0.2;
+        const minZoom = 0.1;
+        const maxZoom = 3;
+        let gridVisible = true;
+        let hovered = -1;
+        let pending = false;
+        let level = null;
+        let cells = null;
         
-        <div class="controls">
-            <button class="btn" onclick="zoomIn()">🔍 Zoom In</button>
-            <button class="btn" onclick="zoomOut()">🔍 Zoom Out</button>
-            <button class="btn" onclick="resetZoom()">↺ Reset View</button>
-            <button class="btn" onclick="toggleGrid()">⊞ Toggle Grid</button>
-            <button class="btn" onclick="window.print()">🖨️ Print</button>
-        </div>
+        const mapContainer = document.getElementById('mapContainer');
+        const spacer = document.getElementById('mapSpacer');
+        const canvas = document.getElementById('dungeonCanvas');
+        const ctx = canvas.getContext('2d');
+        const tooltip = document.getElementById('tooltip');
         
-        <div class="map-container">
-            <div class="map-wrapper">
-                <svg id="dungeonMap" width="{svg_width}" height="{svg_height}" xmlns="http://www.w3.org/2000/svg">
-"""
-    
-    # Generate SVG cells
-    for j in range(downlist[down].shape[1]):
-        for i in range(downlist[down].shape[0]):
-            cell_value = downlist[down][i, j, 0]
-            x = i * cell_size
-            y = j * cell_size
-            
-            # Determine cell color and styling
-            fill_color, stroke_color = get_cell_colors(cell_value)
-            
-            # Create cell with tooltip
-            cell_id = f"cell_{i}_{j}"
-            tooltip_text = get_tooltip_text(cell_value, room_stack, i + xmin, j + ymin, 0 - down - 1)
-            # Escape quotes in tooltip for HTML attribute
-            tooltip_text_attr = tooltip_text.replace('"', '&quot;')
-            
-            output_html += f'                    <rect class="cell" id="{cell_id}" x="{x}" y="{y}" '
-            output_html += f'width="{cell_size}" height="{cell_size}" '
-            output_html += f'fill="{fill_color}" stroke="{stroke_color}" '
-            output_html += f'data-tooltip="{tooltip_text_attr}"/>\n'
+        // Unpack a canvas_payload and draw it
+        function showLevel(data) {
+            const raw = atob(data.cells);
+            const bytes = new Uint8Array(raw.length);
+            for (let k = 0; k < raw.length; k++) {
+                bytes[k] = raw.charCodeAt(k);
+            }
+            level = data;
+            cells = data.bits === 8 ? bytes : new Uint16Array(bytes.buffer);
+            hovered = -1;
+            mapContainer.scrollLeft = 0;
+            mapContainer.scrollTop = 0;
+            updateZoom();
+        }
+        
+        // Paint only the squares inside the visible part of the map
+        function draw() {
+            pending = false;
+            if (level === null) return;
+            const size = cellSize * currentZoom;
+            const viewWidth = mapContainer.clientWidth;
+            const viewHeight = mapContainer.clientHeight;
+            const left = mapContainer.scrollLeft;
+            const top = mapContainer.scrollTop;
+            const ratio = window.devicePixelRatio || 1;
+            canvas.style.left = left + 'px';
+            canvas.style.top = top + 'px';
+            canvas.style.width = viewWidth + 'px';
+            canvas.style.height = viewHeight + 'px';
+            canvas.width = viewWidth * ratio;
+            canvas.height = viewHeight * ratio;
+            ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+            ctx.fillStyle = '#0a0a0a';
+            ctx.fillRect(0, 0, viewWidth, viewHeight);
             
-            # Add text label if not empty
-            if cell_value != 'B':
-                text_color = get_text_color(cell_value)
-                # Truncate long labels for display and escape for SVG
-                display_text = cell_value[:6] if len(cell_value) > 6 else cell_value
-                display_text_escaped = html.escape(display_text)
-                output_html += f'                    <text class="cell-text" x="{x + cell_size/2}" y="{y + cell_size/2}" '
-                output_html += f'fill="{text_color}">{display_text_escaped}</text>\n'
-    
-    output_html += """                </svg>
+            // squares outside the box the payload sent are all rock
+            const i0 = Math.max(level.left, Math.floor(left / size));
+            const j0 = Math.max(level.top, Math.floor(top / size));
+            const i1 = Math.min(level.left + level.cols, Math.ceil((left + viewWidth) / size));
+            const j1 = Math.min(level.top + level.rows, Math.ceil((top + viewHeight) / size));
+            const labels = size >= 24;
+            ctx.lineWidth = 1;
+            ctx.font = 'bold ' + Math.round(10 * currentZoom) + "px 'Courier New', monospace";
+            ctx.textAlign = 'center';
+            ctx.textBaseline = 'middle';
+            for (let j = j0; j < j1; j++) {
+                for (let i = i0; i < i1; i++) {
+                    const code = cells[(i - level.left) + (j - level.top) * level.cols];
+                    if (code === 0) continue;
+                    const square = level.codes[code];
+                    const x = i * size - left;
+                    const y = j * size - top;
+                    ctx.fillStyle = square.fill;
+                    ctx.fillRect(x, y, size, size);
+                    if (gridVisible) {
+                        ctx.strokeStyle = square.stroke;
+                        ctx.strokeRect(x + 0.5, y + 0.5, size - 1, size - 1);
+                    }
+                    if (labels) {
+                        ctx.fillStyle = square.text;
+                        ctx.fillText(square.label, x + size / 2, y + size / 2);
+                    }
+                }
+            }
+            if (hovered >= 0) {
+                ctx.strokeStyle = '#ffd700';
+                ctx.lineWidth = 3;
+                ctx.strokeRect((hovered % level.width) * size - left, Math.floor(hovered / level.width) * size - top, size, size);
+            }
+        }
+        
+        function redraw() {
+            if (!pending) {
+                pending = true;
+                requestAnimationFrame(draw);
+            }
+        }
+        
+        function zoomIn() {
+            if (currentZoom < maxZoom) {
+                currentZoom += zoomStep;
+                updateZoom();
+            }
+        }
+        
+        function zoomOut() {
+            if (currentZoom > minZoom + 0.001) {
+                currentZoom = Math.max(minZoom, currentZoom - zoomStep);
+                updateZoom();
+            }
+        }
+        
+        function resetZoom() {
+            currentZoom = 1;
+            updateZoom();
+        }
+        
+        function updateZoom() {
+            if (level === null) return;
+            spacer.style.width = (level.width * cellSize * currentZoom) + 'px';
+            spacer.style.height = (level.height * cellSize * currentZoom) + 'px';
+            redraw();
+        }
+        
+        function toggleGrid() {
+            gridVisible = !gridVisible;
+            redraw();
+        }
+        
+        // Tooltip functionality
+        mapContainer.addEventListener('mousemove', function(e) {
+            if (isPanning || level === null) return;
+            const rect = mapContainer.getBoundingClientRect();
+            const size = cellSize * currentZoom;
+            const i = Math.floor((e.clientX - rect.left + mapContainer.scrollLeft) / size);
+            const j = Math.floor((e.clientY - rect.top + mapContainer.scrollTop) / size);
+            const inBox = i >= level.left && i < level.left + level.cols && j >= level.top && j < level.top + level.rows;
+            const index = i + j * level.width;
+            const code = inBox ? cells[(i - level.left) + (j - level.top) * level.cols] : 0;
+            if (code !== 0) {
+                tooltip.innerHTML = `<strong>Position:</strong> (${level.xmin + i}, ${level.ymin + j}, ${level.z})<br>` + level.text[level.codes[code].tip];
+                tooltip.style.display = 'block';
+                tooltip.style.left = (e.pageX + 10) + 'px';
+                tooltip.style.top = (e.pageY + 10) + 'px';
+            } else {
+                tooltip.style.display = 'none';
+            }
+            const next = code !== 0 ? index : -1;
+            if (next !== hovered) {
+                hovered = next;
+                redraw();
+            }
+        });
+        
+        mapContainer.addEventListener('scroll', redraw);
+        window.addEventListener('resize', redraw);
+        
+        // Pan functionality
+        let isPanning = false;
+        let startX, startY, scrollLeft, scrollTop;
+        
+        mapContainer.addEventListener('mousedown', function(e) {
+            if (e.button === 1 || e.shiftKey) { // Middle mouse or shift+left
+                isPanning = true;
+                startX = e.pageX - mapContainer.offsetLeft;
+                startY = e.pageY - mapContainer.offsetTop;
+                scrollLeft = mapContainer.scrollLeft;
+                scrollTop = mapContainer.scrollTop;
+                mapContainer.style.cursor = 'grabbing';
+                e.preventDefault();
+            }
+        });
+        
+        mapContainer.addEventListener('mousemove', function(e) {
+            if (!isPanning) return;
+            e.preventDefault();
+            const x = e.pageX - mapContainer.offsetLeft;
+            const y = e.pageY - mapContainer.offsetTop;
+            const walkX = (x - startX) * 2;
+            const walkY = (y - startY) * 2;
+            mapContainer.scrollLeft = scrollLeft - walkX;
+            mapContainer.scrollTop = scrollTop - walkY;
+        });
+        
+        mapContainer.addEventListener('mouseup', function() {
+            isPanning = false;
+            mapContainer.style.cursor = 'default';
+        });
+        
+        mapContainer.addEventListener('mouseleave', function() {
+            isPanning = false;
+            mapContainer.style.cursor = 'default';
+            tooltip.style.display = 'none';
+            hovered = -1;
+            redraw();
+        });
+        
+        // Zoom with mouse wheel
+        mapContainer.addEventListener('wheel', function(e) {
+            if (e.ctrlKey) {
+                e.preventDefault();
+                if (e.deltaY < 0) {
+                    zoomIn();
+                } else {
+                    zoomOut();
+                }
+            }
+        });
+        
+"""
+
+
+# level buttons of the shared viewer
+VIEWER_STYLE = """        .level-btn.current {
+            border-color: #ffd700;
+            background: linear-gradient(135deg, #6a6a6a 0%, #4d4d4d 100%);
+        }"""
+
+# level switching of the shared viewer, on top of CANVAS_SCRIPT
+VIEWER_SCRIPT = """        const loaded = {};
+        const requested = {};
+        let wanted = 1;
+        
+        // Called by each dungeon_N_data.js as it loads
+        function dungeonLevelLoaded(n, data) {
+            loaded[n] = data;
+            if (n === wanted) {
+                display(n);
+            }
+        }
+        
+        function request(n) {
+            if (n < 1 || n > levelCount || requested[n]) return;
+            requested[n] = true;
+            const script = document.createElement('script');
+            script.src = 'dungeon_' + n + '_data.js';
+            document.head.appendChild(script);
+        }
+        
+        function display(n) {
+            showLevel(loaded[n]);
+            document.getElementById('roomDetails').innerHTML = loaded[n].rooms;
+            document.getElementById('levelTitle').textContent = '🏰 Dungeon Level ' + n + ' 🏰';
+            document.title = 'Enhanced Dungeon Map - Level ' + n;
+            for (let k = 1; k <= levelCount; k++) {
+                document.getElementById('levelBtn' + k).classList.toggle('current', k === n);
+            }
+            // the neighbours are where the stairs go, have them ready
+            request(n - 1);
+            request(n + 1);
+        }
+        
+        function openLevel(n) {
+            wanted = n;
+            location.hash = n;
+            if (loaded[n]) {
+                display(n);
+            } else {
+                request(n);
+            }
+        }
+        
+        openLevel(Math.min(levelCount, Math.max(1, parseInt(location.hash.slice(1)) || 1)));
+"""
+
+
+LEGEND_ITEMS = [
+    ('#2d5016', 'Outside Entrance'),
+    ('#4a4a4a', 'Room/Chamber'),
+    ('#2f2f2f', 'Corridor/Passage'),
+    ('#654321', 'Dead End'),
+    ('#1e3a5f', 'Water (Pool/Lake)'),
+    ('#1c1c1c', 'Chasm'),
+    ('#8b4789', 'Stairs/Vertical'),
+    ('#8b0000', 'Traps / Monsters'),
+    ('#8b4513', 'Copper Treasure'),
+    ('#778899', 'Silver Treasure'),
+    ('#9acd32', 'Electrum Treasure'),
+    ('#b8860b', 'Gold Treasure'),
+    ('#c0c0c0', 'Platinum Treasure'),
+    ('#00ced1', 'Gems'),
+    ('#dc143c', 'Jewellery'),
+    ('#ff1493', 'Magic Items'),
+]
+
+LEGEND_HTML = """
+        <div class="legend">
+            <h3>📜 Legend</h3>
+            <div class="legend-grid">
+""" + ''.join(f"""
+                <div class="legend-item">
+                    <div class="legend-color" style="background-color: {color};"></div>
+                    <span>{description}</span>
+                </div>
+""" for color, description in LEGEND_ITEMS) + """
             </div>
         </div>
-        
-        <div class="tooltip" id="tooltip"></div>
 """
-    
-    # Add legend
-    output_html += generate_legend()
-    
-    # Add room details and statistics
-    output_html += generate_room_details(room_stack, level_num)
-    
-    output_html += """    </div>
-    
-    <script>
-        let currentZoom = 1;
+
+# script of the SVG map, after its tooltip table
+ENHANCED_SCRIPT = """        let currentZoom = 1;
         const zoomStep = 0.2;
         const minZoom = 0.5;
         const maxZoom = 3;
@@ -418,6 +642,7 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
         const mapWrapper = document.querySelector('.map-wrapper');
         const svg = document.getElementById('dungeonMap');
         const tooltip = document.getElementById('tooltip');
+        const tooltips = JSON.parse(document.getElementById('tooltips').textContent);
         
         function zoomIn() {
             if (currentZoom < maxZoom) {
@@ -455,9 +680,11 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
         svg.addEventListener('mousemove', function(e) {
             const target = e.target;
             if (target.classList.contains('cell')) {
-                const tooltipText = target.getAttribute('data-tooltip');
-                if (tooltipText && tooltipText !== 'Empty') {
-                    tooltip.innerHTML = tooltipText;
+                const i = Number(target.dataset.i);
+                if (i in tooltips.cells) {
+                    const x = tooltips.xmin + i % tooltips.width;
+                    const y = tooltips.ymin + Math.floor(i / tooltips.width);
+                    tooltip.innerHTML = `<strong>Position:</strong> (${x}, ${y}, ${tooltips.z})<br>` + tooltips.text[tooltips.cells[i]];
                     tooltip.style.display = 'block';
                     tooltip.style.left = (e.pageX + 10) + 'px';
                     tooltip.style.top = (e.pageY + 10) + 'px';
@@ -524,8 +751,396 @@ def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_
 </body>
 </html>
 """
+
+# constant stretches of the SVG map page, the level number, colour classes,
+# squares, room details and tooltip table go between them
+ENHANCED_PAGE = (
+    """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Enhanced Dungeon Map - Level """,
+    """</title>
+    <style>
+""" + ENHANCED_STYLE + "\n",
+    """    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🏰 Dungeon Level """,
+    """ 🏰</h1>
+        <div class="subtitle">Advanced Dungeons & Dragons Random Dungeon</div>
+        
+        <div class="controls">
+            <button class="btn" onclick="zoomIn()">🔍 Zoom In</button>
+            <button class="btn" onclick="zoomOut()">🔍 Zoom Out</button>
+            <button class="btn" onclick="resetZoom()">↺ Reset View</button>
+            <button class="btn" onclick="toggleGrid()">⊞ Toggle Grid</button>
+            <button class="btn" onclick="window.print()">🖨️ Print</button>
+        </div>
+        
+        <div class="map-container">
+            <div class="map-wrapper">
+""",
+    """                </svg>
+            </div>
+        </div>
+        
+        <div class="tooltip" id="tooltip"></div>
+""" + LEGEND_HTML,
+    """    </div>
     
-    return output_html
+    <script type="application/json" id="tooltips">""",
+    "</script>\n    <script>\n" + ENHANCED_SCRIPT,
+)
+
+
+def sanitize_for_html(value):
+    """Safely convert a value to HTML-escaped string."""
+    if value is None:
+        return ''
+    return html.escape(str(value))
+
+
+def generate_enhanced_html(dungeon_data, level_num, room_stack, downlist, coord_limits, border_index=None):
+    """
+    Generate an enhanced HTML visualization with SVG-based rendering.
+    
+    Args:
+        dungeon_data: Dictionary containing dungeon information
+        level_num: The level number (0-indexed)
+        room_stack: Stack containing room information
+        downlist: Array of dungeon levels
+        coord_limits: Tuple of (min_coords, max_coords)
+        border_index: Optional wall side of each secret door, keyed by coordinate
+    
+    Returns:
+        HTML string for enhanced visualization
+    """
+    down = level_num
+    xmin, ymin, zmin = coord_limits[0]
+    xmax, ymax, zmax = coord_limits[1]
+    
+    # Calculate dimensions
+    width = xmax - xmin + 1
+    height = ymax - ymin + 1
+    
+    # SVG cell size (larger for better detail)
+    cell_size = 40
+    svg_width = width * cell_size
+    svg_height = height * cell_size
+    
+    cells, cell_styles, tooltips = svg_cells(downlist[down], down, room_stack, coord_limits, cell_size, border_index)
+    
+    output_html = [
+        ENHANCED_PAGE[0], str(level_num + 1),
+        ENHANCED_PAGE[1], cell_styles,
+        ENHANCED_PAGE[2], str(level_num + 1),
+        ENHANCED_PAGE[3],
+        f"""                <svg id="dungeonMap" width="{svg_width}" height="{svg_height}" xmlns="http://www.w3.org/2000/svg">
+                    <defs><symbol id="tile"><rect width="{cell_size}" height="{cell_size}"/></symbol></defs>
+                    <rect width="{svg_width}" height="{svg_height}" fill="#0a0a0a"/>
+""",
+    ]
+    output_html.extend(cells)
+    output_html.append(ENHANCED_PAGE[4])
+    
+    # Add room details and statistics
+    output_html.append(generate_room_details(room_stack, level_num))
+    
+    output_html.append(ENHANCED_PAGE[5])
+    # keep a </script> inside a tooltip from closing the block
+    output_html.append(json.dumps(tooltips, ensure_ascii=False).replace('</', '<\\/'))
+    output_html.append(ENHANCED_PAGE[6])
+    
+    return ''.join(output_html)
+
+
+def svg_cells(level, down, room_stack, coord_limits, cell_size=40, border_index=None):
+    """
+    Build the SVG squares of one level.
+
+    Each distinct fill code is worked out once: its colour class, label and
+    tooltip. Squares are numbered i + j*width across the level, which is the
+    key of the tooltip table.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1)
+        down: The level number (0-indexed)
+        room_stack: Stack containing room information
+        coord_limits: Tuple of (min_coords, max_coords)
+        cell_size: Size of a square in pixels
+        border_index: Optional wall side of each secret door, keyed by coordinate
+
+    Returns:
+        Tuple of (list of SVG element strings, CSS rules of the colour
+        classes, tooltip table dict)
+    """
+    xmin, ymin, zmin = coord_limits[0]
+    width = level.shape[0]
+    z = 0 - down - 1
+    color_classes = {}
+    templates = {}
+    tooltip_text = {}
+    tooltips = {'xmin': int(xmin), 'ymin': int(ymin), 'z': int(z), 'width': width, 'text': [], 'cells': {}}
+    cells = []
+    #rows of the map run along y, only squares that are not empty rock
+    grid = level[:, :, 0].T
+    rows, cols = np.nonzero(grid != 'B')
+    for j, i, cell_value in zip(rows.tolist(), cols.tolist(), grid[rows, cols].tolist()):
+        if cell_value not in templates:
+            colors = get_cell_colors(cell_value)
+            if colors not in color_classes:
+                color_classes[colors] = 'k' + str(len(color_classes))
+            # Truncate long labels for display and escape for SVG
+            display_text = html.escape(cell_value[:6])
+            templates[cell_value] = (color_classes[colors], get_text_color(cell_value), display_text)
+        color_class, text_color, display_text = templates[cell_value]
+
+        #only secret doors say something that depends on where they are
+        side = (border_index or {}).get((i + xmin, j + ymin, z)) if 'sd' in cell_value else None
+        if (cell_value, side) not in tooltip_text:
+            tooltip_text[(cell_value, side)] = len(tooltips['text'])
+            tooltips['text'].append(get_tooltip_details(cell_value, room_stack, i + xmin, j + ymin, z, border_index))
+        index = i + j * width
+        tooltips['cells'][index] = tooltip_text[(cell_value, side)]
+
+        x = i * cell_size
+        y = j * cell_size
+        cells.append(f'<use href="#tile" class="cell {color_class}" x="{x}" y="{y}" data-i="{index}"/>'
+                     f'<text class="cell-text" x="{x + cell_size/2}" y="{y + cell_size/2}" fill="{text_color}">{display_text}</text>\n')
+
+    cell_styles = ''.join(f'        .{name} {{ fill: {fill}; stroke: {stroke}; }}\n' for (fill, stroke), name in color_classes.items())
+    return cells, cell_styles, tooltips
+
+
+def canvas_payload(level, down, room_stack, coord_limits, border_index=None):
+    """
+    Pack one level for the canvas map.
+
+    Every square is a code, 0 for empty rock, into a table of the distinct
+    squares on the level: colours, label and tooltip. Secret doors get a code
+    per wall side, since their tooltip names it. Codes are one byte when the
+    table is short enough, else two, and only the box around the level's own
+    squares is sent; left and top place it in the whole dungeon's extent, so
+    levels still line up.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1)
+        down: The level number (0-indexed)
+        room_stack: Stack containing room information
+        coord_limits: Tuple of (min_coords, max_coords)
+        border_index: Optional wall side of each secret door, keyed by coordinate
+
+    Returns:
+        Dict of the level size and origin, the box of squares sent, the
+        base64 little endian code array of the box (row by row along y), the
+        code table and the tooltip texts
+    """
+    xmin, ymin, zmin = coord_limits[0]
+    width, height = level.shape[0], level.shape[1]
+    z = 0 - down - 1
+    grid = level[:, :, 0].T
+    codes = np.zeros(grid.shape, dtype='<u2')
+    table = [None]
+    code_of = {}
+    tooltip_text = {}
+    texts = []
+    for j, i in zip(*np.nonzero(grid != 'B')):
+        cell_value = grid[j, i]
+        side = (border_index or {}).get((int(i) + xmin, int(j) + ymin, z)) if 'sd' in cell_value else None
+        if (cell_value, side) not in code_of:
+            if cell_value not in tooltip_text or side is not None:
+                texts.append(get_tooltip_details(cell_value, room_stack, int(i) + xmin, int(j) + ymin, z, border_index))
+                if side is None:
+                    tooltip_text[cell_value] = len(texts) - 1
+            fill, stroke = get_cell_colors(cell_value)
+            code_of[(cell_value, side)] = len(table)
+            table.append({
+                'label': cell_value[:6],
+                'fill': fill,
+                'stroke': stroke,
+                'text': get_text_color(cell_value),
+                'tip': tooltip_text[cell_value] if side is None else len(texts) - 1,
+            })
+        codes[j, i] = code_of[(cell_value, side)]
+    if len(table) > 65536:
+        raise ValueError('too many distinct squares on level ' + str(down+1) + ' for uint16 codes')
+    rows = np.flatnonzero(codes.any(axis=1))
+    cols = np.flatnonzero(codes.any(axis=0))
+    if len(rows) == 0:
+        rows = cols = np.zeros(1, dtype=int)
+    box = codes[rows[0]:rows[-1]+1, cols[0]:cols[-1]+1]
+    bits = 8 if len(table) <= 256 else 16
+    if bits == 8:
+        box = box.astype(np.uint8)
+    return {
+        'width': int(width),
+        'height': int(height),
+        'xmin': int(xmin),
+        'ymin': int(ymin),
+        'z': int(z),
+        'left': int(cols[0]),
+        'top': int(rows[0]),
+        'cols': int(box.shape[1]),
+        'rows': int(box.shape[0]),
+        'bits': bits,
+        'cells': base64.b64encode(np.ascontiguousarray(box).tobytes()).decode('ascii'),
+        'codes': table,
+        'text': texts,
+    }
+
+
+def generate_canvas_html(dungeon_data, level_num, room_stack, downlist, coord_limits, border_index=None):
+    """
+    Generate the enhanced map drawn on a canvas, for levels too big for the SVG map.
+
+    The level is embedded as a canvas_payload and the page script paints only
+    the squares in view, so the page stays the same weight in the browser
+    however large the level is.
+
+    Args:
+        dungeon_data: Dictionary containing dungeon information
+        level_num: The level number (0-indexed)
+        room_stack: Stack containing room information
+        downlist: Array of dungeon levels
+        coord_limits: Tuple of (min_coords, max_coords)
+        border_index: Optional wall side of each secret door, keyed by coordinate
+
+    Returns:
+        HTML string for the canvas visualization
+    """
+    payload = canvas_payload(downlist[level_num], level_num, room_stack, coord_limits, border_index)
+    output_html = [f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Enhanced Dungeon Map - Level {level_num + 1}</title>
+    <style>
+{ENHANCED_STYLE}
+{CANVAS_STYLE}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🏰 Dungeon Level {level_num + 1} 🏰</h1>
+        <div class="subtitle">Advanced Dungeons & Dragons Random Dungeon</div>
+        
+        <div class="controls">
+            <button class="btn" onclick="zoomIn()">🔍 Zoom In</button>
+            <button class="btn" onclick="zoomOut()">🔍 Zoom Out</button>
+            <button class="btn" onclick="resetZoom()">↺ Reset View</button>
+            <button class="btn" onclick="toggleGrid()">⊞ Toggle Grid</button>
+            <button class="btn" onclick="window.print()">🖨️ Print</button>
+        </div>
+        
+        <div class="map-container" id="mapContainer">
+            <div id="mapSpacer"></div>
+            <canvas id="dungeonCanvas"></canvas>
+        </div>
+        
+        <div class="tooltip" id="tooltip"></div>
+"""]
+    output_html.append(generate_legend())
+    output_html.append(generate_room_details(room_stack, level_num))
+    output_html.append("""    </div>
+    
+    <script type="application/json" id="levelData">""")
+    # keep a </script> inside a tooltip from closing the block
+    output_html.append(json.dumps(payload, ensure_ascii=False).replace('</', '<\\/'))
+    output_html.append("""</script>
+    <script>
+""")
+    output_html.append(CANVAS_SCRIPT)
+    output_html.append("""        showLevel(JSON.parse(document.getElementById('levelData').textContent));
+    </script>
+</body>
+</html>
+""")
+    
+    return ''.join(output_html)
+
+
+def generate_level_data(level_num, room_stack, downlist, coord_limits, border_index=None):
+    """
+    Data file of one level for the shared viewer, dungeon_N_data.js.
+
+    It is a script rather than JSON so the viewer can load it from disk,
+    where browsers refuse fetch(); it hands the canvas_payload and the room
+    details to dungeonLevelLoaded.
+
+    Args:
+        level_num: The level number (0-indexed)
+        room_stack: Stack containing room information
+        downlist: Array of dungeon levels
+        coord_limits: Tuple of (min_coords, max_coords)
+        border_index: Optional wall side of each secret door, keyed by coordinate
+
+    Returns:
+        JavaScript source
+    """
+    payload = canvas_payload(downlist[level_num], level_num, room_stack, coord_limits, border_index)
+    payload['rooms'] = generate_room_details(room_stack, level_num)
+    return 'dungeonLevelLoaded(' + str(level_num + 1) + ', ' + json.dumps(payload, ensure_ascii=False) + ');\n'
+
+
+def generate_viewer_html(levels):
+    """
+    The shared viewer page, dungeon_viewer.html, for a dungeon of levels levels.
+
+    Styles and script are in viewer.css and viewer.js (viewer_css and
+    viewer_js), written once per output directory; each level is read from
+    its data file the first time it is opened.
+    """
+    buttons = ''.join(f'<button class="btn level-btn" id="levelBtn{n}" onclick="openLevel({n})">{n}</button>' for n in range(1, levels + 1))
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Enhanced Dungeon Map</title>
+    <link rel="stylesheet" href="viewer.css">
+</head>
+<body>
+    <div class="container">
+        <h1 id="levelTitle">🏰 Dungeon 🏰</h1>
+        <div class="subtitle">Advanced Dungeons & Dragons Random Dungeon</div>
+        
+        <div class="controls">{buttons}</div>
+        <div class="controls">
+            <button class="btn" onclick="zoomIn()">🔍 Zoom In</button>
+            <button class="btn" onclick="zoomOut()">🔍 Zoom Out</button>
+            <button class="btn" onclick="resetZoom()">↺ Reset View</button>
+            <button class="btn" onclick="toggleGrid()">⊞ Toggle Grid</button>
+            <button class="btn" onclick="window.print()">🖨️ Print</button>
+        </div>
+        
+        <div class="map-container" id="mapContainer">
+            <div id="mapSpacer"></div>
+            <canvas id="dungeonCanvas"></canvas>
+        </div>
+        
+        <div class="tooltip" id="tooltip"></div>
+{generate_legend()}
+        <div id="roomDetails"></div>
+    </div>
+    <script>const levelCount = {levels};</script>
+    <script src="viewer.js"></script>
+</body>
+</html>
+"""
+
+
+def viewer_css():
+    """Styles of the shared viewer, viewer.css."""
+    return ENHANCED_STYLE + '\n' + CANVAS_STYLE + '\n' + VIEWER_STYLE + '\n'
+
+
+def viewer_js():
+    """Script of the shared viewer, viewer.js."""
+    return CANVAS_SCRIPT + VIEWER_SCRIPT
 
 
 def get_cell_colors(cell_value):
@@ -604,12 +1219,17 @@ def get_text_color(cell_value):
         return '#e0e0e0'
 
 
-def get_tooltip_text(cell_value, room_stack, x, y, z):
-    """Generate tooltip text for a cell."""
+def get_tooltip_text(cell_value, room_stack, x, y, z, border_index=None):
+    """Generate tooltip text for a cell, naming the wall of a secret door when border_index has it."""
     if cell_value == 'B':
         return 'Empty'
     
-    tooltip = f"<strong>Position:</strong> ({x}, {y}, {z})<br>"
+    return f"<strong>Position:</strong> ({x}, {y}, {z})<br>" + get_tooltip_details(cell_value, room_stack, x, y, z, border_index)
+
+
+def get_tooltip_details(cell_value, room_stack, x, y, z, border_index=None):
+    """Tooltip text for a cell after its position line."""
+    tooltip = ""
     
     if cell_value == 'O':
         tooltip += "<strong>Type:</strong> Outside Entrance"
@@ -672,51 +1292,16 @@ def get_tooltip_text(cell_value, room_stack, x, y, z):
     
     if 'sd' in cell_value:
         tooltip += "<br>🔒 Secret Door"
+        side = (border_index or {}).get((x, y, z))
+        if side in WALL_NAMES:
+            tooltip += f" ({WALL_NAMES[side]} wall)"
     
     return tooltip
 
 
 def generate_legend():
     """Generate the legend section."""
-    legend_items = [
-        ('#2d5016', 'Outside Entrance'),
-        ('#4a4a4a', 'Room/Chamber'),
-        ('#2f2f2f', 'Corridor/Passage'),
-        ('#654321', 'Dead End'),
-        ('#1e3a5f', 'Water (Pool/Lake)'),
-        ('#1c1c1c', 'Chasm'),
-        ('#8b4789', 'Stairs/Vertical'),
-        ('#8b0000', 'Traps / Monsters'),
-        ('#8b4513', 'Copper Treasure'),
-        ('#778899', 'Silver Treasure'),
-        ('#9acd32', 'Electrum Treasure'),
-        ('#b8860b', 'Gold Treasure'),
-        ('#c0c0c0', 'Platinum Treasure'),
-        ('#00ced1', 'Gems'),
-        ('#dc143c', 'Jewellery'),
-        ('#ff1493', 'Magic Items'),
-    ]
-    
-    output_html = """
-        <div class="legend">
-            <h3>📜 Legend</h3>
-            <div class="legend-grid">
-"""
-    
-    for color, description in legend_items:
-        output_html += f"""
-                <div class="legend-item">
-                    <div class="legend-color" style="background-color: {color};"></div>
-                    <span>{description}</span>
-                </div>
-"""
-    
-    output_html += """
-            </div>
-        </div>
-"""
-    
-    return output_html
+    return LEGEND_HTML
 
 
 def generate_room_details(room_stack, level_num):
@@ -0,0 +1,376 @@
+"""
+3D export of the level arrays.
+
+Every square of every level is put in one of the 3D classes below with a
+single lookup - the class of each distinct fill code is worked out once and
+spread over the stacked levels with numpy - and the block is written as a VTK
+voxel file that ParaView, VisIt or pyvista can open:
+
+- write_vtk: legacy VTK structured points, every square of the bounding box
+- write_vtu: VTK XML unstructured grid of only the squares that are not
+  empty rock, the same mesh 3d_dungeon.py used to save as ghost.vtu
+
+For VTTs and 3D printing, greedy_mesh turns the voxels into a surface
+instead: the faces between a square and a neighbour of another class (or
+rock) are merged into as few rectangles as possible, slice by slice, and
+write_obj / write_ply save them with a material per class. Level 1 is on
+top and north is +y.
+
+Only numpy is needed, so it runs headless in batch runs (the vtu, vtk, obj
+and ply output sinks). plot() shows the mesh with pyvista when that is
+installed.
+
+Usage:
+    python export_3d.py seed rolls [vtu|vtk|obj|ply]
+"""
+
+import base64
+import struct
+import sys
+
+import numpy as np
+
+from level_codes import LevelList
+
+
+# value of squares with nothing in them
+EMPTY = -999
+
+# traps, pits and the other bad_things squares
+TRAP_CODES = ['pi', 'pt', 'ps', 'pc', 'el', 'ar', 'sp', 'df', 'sf', 'gs', 'bw', 'ol', 'td']
+
+# 3D classes, by the simplified fill 3d_dungeon.py reduced squares to
+CLASS_CODES = {
+    'O': 0,
+    'C': 1,
+    'Cbr': 6,
+    'Cbo': 6,
+    'Cbn': 6,
+    'R': 2,
+    'W': 6,
+    'D': 3,
+    'CH': 4,
+    'wm': 5,
+    'cm': 5,
+    'ch': 5,
+    'st': 5,
+    'sn': 5,
+}
+CLASS_CODES.update({code: 7 for code in TRAP_CODES})
+
+CLASS_NAMES = {0: 'Out', 1: 'C', 2: 'R', 3: 'D', 4: 'CH', 5: 'Feature', 6: 'Wet', 7: 'Trap'}
+
+CLASS_COLORS = ['green', 'white', 'gray', 'brown', 'brown', 'orange', 'blue', 'red']
+
+# mesh material and colour of each class
+MATERIALS = {
+    0: ('outside', (0, 128, 0)),
+    1: ('corridor', (230, 230, 230)),
+    2: ('room', (128, 128, 128)),
+    3: ('dead_end', (165, 42, 42)),
+    4: ('chasm', (101, 67, 33)),
+    5: ('features', (255, 140, 0)),  #stairs, chutes, chimneys and wandering monsters
+    6: ('water', (0, 0, 255)),
+    7: ('traps', (200, 0, 0)),
+}
+
+# VTK_VOXEL corner order, as (dx, dy, dz)
+VOXEL_CORNERS = np.array([
+    (0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0),
+    (0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1),
+])
+
+
+def simplify_fill(fill):
+    """Reduce a fill code to the key of its 3D class, as 3d_dungeon.py did."""
+    if 'wm' in fill:
+        fill = 'wm'
+    if fill[:1].islower():
+        #stairs, chutes and traps, with any secret door drawn on the same square
+        fill = fill[:2]
+    if 'Cbr' in fill or 'Cbn' in fill or 'Cbo' in fill:
+        fill = 'W'
+    if 'R' in fill:
+        if 'P' in fill or 'L' in fill:
+            fill = 'W'
+        else:
+            fill = 'R'
+    if 'CH' in fill:
+        fill = 'CH'
+    if 'D' in fill:
+        fill = fill[0:1]
+    if 'C' in fill and 'CH' not in fill:
+        fill = fill[0:1]
+    return fill
+
+
+def classify_levels(downlist):
+    """
+    3D class of every square.
+
+    Args:
+        downlist: LevelList, or a list of level arrays of shape (xwidth, ywidth, 1)
+
+    Returns:
+        int32 array of shape (xwidth, ywidth, levels), EMPTY where nothing is
+    """
+    if isinstance(downlist, LevelList):
+        #classify the fill table once and look the codes up in it
+        lookup = np.array([CLASS_CODES.get(simplify_fill(fill), EMPTY) for fill in downlist.fills], dtype=np.int32)
+        codes = np.empty(downlist.shape + (len(downlist),), dtype=np.int32)
+        for down in range(len(downlist)):
+            codes[:, :, down] = lookup[downlist.level_codes(down)[:, :, 0]]
+        return codes
+    stacked = np.concatenate([level[:, :, :1] for level in downlist], axis=2)
+    uniq, inverse = np.unique(stacked, return_inverse=True)
+    lookup = np.array([CLASS_CODES.get(simplify_fill(fill), EMPTY) for fill in uniq.tolist()], dtype=np.int32)
+    return lookup[inverse.reshape(stacked.shape)]
+
+
+def write_vtk(path, codes, title='dungeon'):
+    """
+    Write codes as a legacy binary VTK structured points file, one cell per square.
+
+    Args:
+        path: File to write
+        codes: Array from classify_levels
+        title: Title line of the file
+    """
+    nx, ny, nz = codes.shape
+    header = '\n'.join([
+        '# vtk DataFile Version 3.0',
+        title,
+        'BINARY',
+        'DATASET STRUCTURED_POINTS',
+        'DIMENSIONS %d %d %d' % (nx + 1, ny + 1, nz + 1),
+        'ORIGIN 0 0 0',
+        'SPACING 1 1 1',
+        'CELL_DATA %d' % codes.size,
+        'SCALARS map int 1',
+        'LOOKUP_TABLE default',
+        '',
+    ])
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        #legacy binary is big endian, x varies fastest
+        f.write(codes.astype('>i4').tobytes(order='F'))
+        f.write(b'\n')
+
+
+def voxel_mesh(codes):
+    """
+    Unstructured voxel mesh of the squares that are not EMPTY.
+
+    Returns:
+        Tuple of (points float32 (n, 3), connectivity int32 (cells, 8),
+        cell values int32 (cells,)), corners shared between voxels once
+    """
+    filled = np.argwhere(codes != EMPTY)
+    values = codes[codes != EMPTY]
+    nx, ny, nz = codes.shape
+    corners = (filled[:, None, :] + VOXEL_CORNERS[None, :, :]).reshape(-1, 3)
+    keys = (corners[:, 2] * (ny + 1) + corners[:, 1]) * (nx + 1) + corners[:, 0]
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    points = np.stack([uniq % (nx + 1), (uniq // (nx + 1)) % (ny + 1), uniq // ((nx + 1) * (ny + 1))], axis=1)
+    return points.astype(np.float32), inverse.reshape(-1, 8).astype(np.int32), values.astype(np.int32)
+
+
+def vtu_array(array, name=None, components=1):
+    """A base64 binary DataArray element of the VTK XML format."""
+    types = {'float32': 'Float32', 'int32': 'Int32', 'int64': 'Int64', 'uint8': 'UInt8'}
+    data = np.ascontiguousarray(array).astype(array.dtype.newbyteorder('<')).tobytes()
+    encoded = base64.b64encode(struct.pack('<I', len(data)) + data).decode('ascii')
+    attrs = ' Name="%s"' % name if name else ''
+    if components > 1:
+        attrs += ' NumberOfComponents="%d"' % components
+    return '<DataArray type="%s"%s format="binary">%s</DataArray>' % (types[array.dtype.name], attrs, encoded)
+
+
+def write_vtu(path, codes):
+    """
+    Write the squares that are not EMPTY as a VTK XML unstructured grid of voxels.
+
+    Args:
+        path: File to write
+        codes: Array from classify_levels
+    """
+    points, connectivity, values = voxel_mesh(codes)
+    cells = len(values)
+    offsets = np.arange(1, cells + 1, dtype=np.int32) * 8
+    types = np.full(cells, 11, dtype=np.uint8)
+    text = ''.join([
+        '<?xml version="1.0"?>\n',
+        '<VTKFile type="UnstructuredGrid" version="0.1" byte_order="LittleEndian" header_type="UInt32">\n',
+        '<UnstructuredGrid>\n',
+        '<Piece NumberOfPoints="%d" NumberOfCells="%d">\n' % (len(points), cells),
+        '<Points>', vtu_array(points, components=3), '</Points>\n',
+        '<Cells>',
+        vtu_array(connectivity.ravel(), 'connectivity'),
+        vtu_array(offsets, 'offsets'),
+        vtu_array(types, 'types'),
+        '</Cells>\n',
+        '<CellData Scalars="map">', vtu_array(values, 'map'), '</CellData>\n',
+        '</Piece>\n',
+        '</UnstructuredGrid>\n',
+        '</VTKFile>\n',
+    ])
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def greedy_quads(labels):
+    """
+    Merge a 2D array of face labels into rectangles of one label.
+
+    Args:
+        labels: int array, -1 where there is no face
+
+    Returns:
+        List of (u, v, du, dv, label) rectangles, covering every face once
+    """
+    labels = labels.copy()
+    height, width = labels.shape
+    quads = []
+    for u, v in zip(*np.nonzero(labels >= 0)):
+        label = labels[u, v]
+        if label < 0:
+            continue  #already in a rectangle
+        row = labels[u, v:] != label
+        dv = int(np.argmax(row)) if row.any() else width - v
+        du = 1
+        while u + du < height and (labels[u + du, v:v + dv] == label).all():
+            du += 1
+        labels[u:u + du, v:v + dv] = -1
+        quads.append((int(u), int(v), du, dv, int(label)))
+    return quads
+
+
+def greedy_mesh(codes):
+    """
+    Surface of the voxels, with coplanar faces of one class merged.
+
+    A face is kept wherever a square borders rock or a square of another
+    class, so every class is a closed shell of its own.
+
+    Args:
+        codes: Array from classify_levels
+
+    Returns:
+        Tuple of (vertices float32 (n, 3), quads int32 (m, 4) counter
+        clockwise seen from outside, class of each quad int32 (m,))
+    """
+    #level 1 on top and north up: turning the block over about x keeps it unmirrored
+    codes = codes[:, ::-1, ::-1]
+    corners = []
+    classes = []
+    for axis in range(3):
+        a, b = (axis + 1) % 3, (axis + 2) % 3
+        block = np.moveaxis(codes, axis, 0)
+        padded = np.full((block.shape[0] + 2,) + block.shape[1:], EMPTY, dtype=block.dtype)
+        padded[1:-1] = block
+        for step in (1, -1):
+            neighbour = padded[1 + step:padded.shape[0] - 1 + step]
+            faces = np.where((block != EMPTY) & (neighbour != block), block, -1)
+            for k in np.flatnonzero((faces >= 0).any(axis=(1, 2))):
+                plane = k + (1 if step > 0 else 0)
+                for u, v, du, dv, label in greedy_quads(faces[k]):
+                    quad = np.zeros((4, 3), dtype=np.int64)
+                    quad[:, axis] = plane
+                    quad[:, a] = [u, u + du, u + du, u]
+                    quad[:, b] = [v, v, v + dv, v + dv]
+                    corners.append(quad if step > 0 else quad[::-1])
+                    classes.append(label)
+    if not corners:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 4), np.int32), np.zeros(0, np.int32)
+    corners = np.concatenate(corners)
+    vertices, inverse = np.unique(corners, axis=0, return_inverse=True)
+    return vertices.astype(np.float32), inverse.reshape(-1, 4).astype(np.int32), np.array(classes, dtype=np.int32)
+
+
+def write_obj(path, codes):
+    """
+    Write the greedy mesh as Wavefront OBJ, a group and material per class.
+
+    The materials go in a .mtl file next to it.
+    """
+    vertices, quads, classes = greedy_mesh(codes)
+    mtl_path = path[:-4] + '.mtl' if path.endswith('.obj') else path + '.mtl'
+    lines = ['mtllib ' + mtl_path.replace('\\', '/').split('/')[-1] + '\n']
+    lines.extend('v %g %g %g\n' % tuple(vertex) for vertex in vertices.tolist())
+    for code in sorted(set(classes.tolist())):
+        name = MATERIALS[code][0]
+        lines.append('g ' + name + '\nusemtl ' + name + '\n')
+        lines.extend('f %d %d %d %d\n' % tuple(quad) for quad in (quads[classes == code] + 1).tolist())
+    with open(path, 'w') as f:
+        f.write(''.join(lines))
+    with open(mtl_path, 'w') as f:
+        for code, (name, rgb) in MATERIALS.items():
+            f.write('newmtl %s\nKd %.3f %.3f %.3f\n\n' % ((name,) + tuple(c / 255 for c in rgb)))
+
+
+def write_ply(path, codes):
+    """Write the greedy mesh as binary PLY, each face coloured and tagged with its class."""
+    vertices, quads, classes = greedy_mesh(codes)
+    colors = np.array([MATERIALS[code][1] for code in range(len(MATERIALS))], dtype=np.uint8)
+    header = '\n'.join([
+        'ply',
+        'format binary_little_endian 1.0',
+        'comment classes ' + ' '.join('%d=%s' % (code, name) for code, (name, rgb) in MATERIALS.items()),
+        'element vertex %d' % len(vertices),
+        'property float x',
+        'property float y',
+        'property float z',
+        'element face %d' % len(quads),
+        'property list uchar int vertex_indices',
+        'property uchar red',
+        'property uchar green',
+        'property uchar blue',
+        'property uchar class',
+        'end_header',
+        '',
+    ])
+    face = np.zeros(len(quads), dtype=[('n', 'u1'), ('v', '<i4', 4), ('rgb', 'u1', 3), ('class', 'u1')])
+    face['n'] = 4
+    face['v'] = quads
+    face['rgb'] = colors[classes]
+    face['class'] = classes
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(vertices.astype('<f4').tobytes())
+        f.write(face.tobytes())
+
+
+def plot(codes):
+    """Show the voxels with pyvista, which is only needed here."""
+    import pyvista as pv
+
+    points, connectivity, values = voxel_mesh(codes)
+    cells = np.hstack([np.full((len(values), 1), 8, dtype=np.int32), connectivity]).ravel()
+    mesh = pv.UnstructuredGrid(cells, np.full(len(values), pv.CellType.VOXEL, dtype=np.uint8), points)
+    mesh.cell_data['map'] = values
+    pv.global_theme.background = 'black'
+    plotter = pv.Plotter(notebook=False)
+    plotter.add_mesh(mesh, cmap=CLASS_COLORS, clim=[0, len(CLASS_COLORS) - 1], annotations=CLASS_NAMES, scalars='map')
+    plotter.show()
+
+
+if __name__ == '__main__':
+    import random
+    from dungeon_simulation import dungeon_sim
+
+    ARGV = sys.argv
+    seed = 0
+    rolls = 200
+    fmt = 'vtu'
+
+    if len(ARGV) > 1:
+        seed = int(ARGV[1])
+
+    if len(ARGV) > 2:
+        rolls = int(ARGV[2])
+
+    if len(ARGV) > 3:
+        fmt = ARGV[3]
+
+    random.seed(seed)
+    dungeon_sim('', '', rolls, 0, 0, 0, outputs=[fmt])
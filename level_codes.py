@@ -0,0 +1,100 @@
+"""
+Compact storage of the level arrays.
+
+A LevelList keeps each level as a uint16 array of codes into one fill table
+shared by the whole dungeon, cut to the level's own extent and placed by an
+origin offset. That is 2 bytes per square of the level's own extent, rather
+than the 40 bytes per square of the whole dungeon's extent that a U10 array
+of every level takes.
+
+It is a sequence of levels, so code written for a list of level arrays
+keeps working: indexing it gives the level's full (xwidth, ywidth, 1) U10
+array, decoded on demand. Code that can work from the codes (the 3D,
+PNG and mapper exports) uses level_codes and fills instead and never
+builds the string arrays. Pickling it pickles only the codes, the table and
+the origins.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+ROCK = 'B'
+
+FILL_DTYPE = 'U10'
+
+
+class LevelList(Sequence):
+    """
+    The levels of a dungeon as cropped code arrays over one fill table.
+
+    Args:
+        buckets: Per level (0-indexed down), a tuple of (x index array, y index
+            array, fill array) of its filled squares, indices into the whole
+            dungeon's extent
+        shape: (xwidth, ywidth) of the whole dungeon
+    """
+
+    def __init__(self, buckets, shape):
+        self.shape = (int(shape[0]), int(shape[1]))
+        fills = set()
+        for xs, ys, level_fills in buckets:
+            fills.update(np.unique(level_fills).tolist())
+        self.fills = [ROCK] + sorted(fills - {ROCK})
+        if len(self.fills) > np.iinfo(np.uint16).max:
+            raise ValueError('too many distinct fills for uint16 codes: ' + str(len(self.fills)))
+        lookup = {fill: code for code, fill in enumerate(self.fills)}
+
+        self.origins = []
+        self.codes = []
+        for xs, ys, level_fills in buckets:
+            if len(xs) == 0:
+                self.origins.append((0, 0))
+                self.codes.append(np.zeros((0, 0), dtype=np.uint16))
+                continue
+            x0 = int(xs.min())
+            y0 = int(ys.min())
+            codes = np.zeros((int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1), dtype=np.uint16)
+            uniq, inverse = np.unique(level_fills, return_inverse=True)
+            codes[xs - x0, ys - y0] = np.array([lookup[fill] for fill in uniq.tolist()], dtype=np.uint16)[inverse.reshape(-1)]
+            self.origins.append((x0, y0))
+            self.codes.append(codes)
+
+    @classmethod
+    def from_arrays(cls, downlist):
+        """Pack a list of U10 level arrays, e.g. from an older downlist.pkl."""
+        buckets = []
+        for level in downlist:
+            xs, ys = np.nonzero(level[:, :, 0] != ROCK)
+            buckets.append((xs, ys, level[xs, ys, 0]))
+        return cls(buckets, downlist[0].shape[:2])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, down):
+        if isinstance(down, slice):
+            return [self[i] for i in range(*down.indices(len(self)))]
+        return np.array(self.fills, dtype=FILL_DTYPE)[self.level_codes(down)]
+
+    def level_codes(self, down):
+        """
+        Codes of one level over the whole dungeon's extent.
+
+        Returns:
+            uint16 array of shape (xwidth, ywidth, 1), 0 for rock, indexing fills
+        """
+        codes = self.codes[down]
+        x0, y0 = self.origins[down]
+        full = np.zeros(self.shape + (1,), dtype=np.uint16)
+        full[x0:x0+codes.shape[0], y0:y0+codes.shape[1], 0] = codes
+        return full
+
+    def squares(self, down):
+        """Number of squares of a level that are not rock."""
+        return int(np.count_nonzero(self.codes[down]))
+
+    @property
+    def nbytes(self):
+        return sum(codes.nbytes for codes in self.codes)
@@ -0,0 +1,242 @@
+"""
+Level-sharded dungeon generation.
+
+The normal walk is one long sequence of rolls that wanders up and down
+levels, so deep runs only use one core. Sharded generation splits it in two
+stages:
+
+1. stair network: a LEVELS_CHECK walk that stops as soon as it is deep
+   enough, recording where the walk first arrived on each level
+2. level growth: every level is grown from its entry point in its own
+   process, with the walk locked to that level - stairs, chutes and
+   trapdoors it finds are drawn but not followed
+
+The shards are then merged (rooms and wandering monsters renumbered after
+the stair network's) and run through the normal output stage of
+dungeon_sim, so all output sinks work as usual.
+
+This is a different generator from the single walk: levels are grown
+independently and a seed gives a different dungeon than the same seed in
+dungeon.py. Every stage gets its own seed derived from the run seed, so the
+result does not depend on the number of workers.
+
+Usage:
+    python level_shards.py seed levels rolls_per_level [workers]
+"""
+
+import concurrent.futures
+import copy
+import multiprocessing as mp
+import os
+import random
+import re
+import sys
+
+from batch_runner import task_seed, warm_worker
+
+
+# fills that connect levels, used as entry points for levels the walk only passed through
+CONNECTION_FILLS = ['st', 'ch', 'td', 'cm', 'el']
+
+ROOM_FILL = re.compile(r'^(Rd?)(\d+)')
+
+
+def stair_network(seed, levels, verbosity=0):
+    """
+    Stage 1: walk until the dungeon is levels deep.
+
+    Returns:
+        The walked state from dungeon_sim, with level_entries mapping each z
+        level to the coordinate and facing the walk arrived with
+    """
+    from dungeon_simulation import dungeon_sim
+
+    random.seed(seed)
+    network = dungeon_sim('', '', 0, verbosity, 0, levels, outputs=[], start={'walk_only': True})
+
+    #levels a chute or stairs dropped straight through still need somewhere to grow from
+    for key in sorted(network['dungeon']):
+        if key[2] < 0 and key[2] not in network['level_entries']:
+            if network['dungeon'][key].get('fill') in CONNECTION_FILLS:
+                network['level_entries'][key[2]] = {'coord': key, 'facing': (0, 1)}
+    return network
+
+
+def grow_level(task):
+    """
+    Stage 2: grow one level from its entry point, in a worker process.
+
+    Args:
+        task: Dict with z, seed, rolls, entry and the stair network dungeon
+
+    Returns:
+        Tuple of (z, shard dict of the new cells and stacks on that level)
+    """
+    from dungeon_simulation import dungeon_sim
+
+    z = task['z']
+    network = task['dungeon']
+    random.seed(task['seed'])
+    start = {
+        'dungeon': network,
+        'coord': task['entry']['coord'],
+        'facing': task['entry']['facing'],
+        'z': z,
+        'walk_only': True,
+    }
+    state = dungeon_sim('', '', task['rolls'], 0, 0, 0, outputs=[], start=start)
+
+    on_level = lambda key: key[2] == z and key not in network
+    rooms = {}
+    for key in state['room_stack']:
+        if isinstance(key, int) and key in state['room_stack']['shape_dict'] and state['room_stack'][key]:
+            if list(state['room_stack'][key].keys())[0][2] == z:
+                rooms[key] = (state['room_stack'][key], state['room_stack']['shape_dict'][key])
+    wandering = []
+    for wm in range(state['wandering_monster_stack']['key_count']):
+        if list(state['wandering_monster_stack'][wm+1].keys())[0][2] == z:
+            wandering.append(state['wandering_monster_stack'][wm+1])
+
+    shard = {
+        'cells': {key: cell for key, cell in state['dungeon'].items() if on_level(key)},
+        'rooms': rooms,
+        'wandering': wandering,
+        'traps': state['trap_stack']['key_count'],
+        'dead_ends': {key: side for key, side in state['dead_end_dict'].items() if on_level(key)},
+        'borders': {key: side for key, side in state['border_index'].items() if on_level(key)},
+        'exits': {key: value for key, value in state['exit_stack'].items() if on_level(key)},
+    }
+    return z, shard
+
+
+def renumber_fill(fill, mapping):
+    """Replace the room number at the start of a room fill like R12m."""
+    match = ROOM_FILL.match(fill)
+    if match is None or int(match.group(2)) not in mapping:
+        return fill
+    return match.group(1) + str(mapping[int(match.group(2))]) + fill[match.end():]
+
+
+def merge_shards(network, shards):
+    """
+    Merge grown levels into the stair network.
+
+    Args:
+        network: Stair network state from stair_network
+        shards: Dict of z level to shard from grow_level
+
+    Returns:
+        Dict of the merged dungeon and the stacks dungeon_sim takes as start['stacks']
+    """
+    dungeon = copy.deepcopy(network['dungeon'])
+    room_stack = copy.deepcopy(network['room_stack'])
+    wandering_monster_stack = copy.deepcopy(network['wandering_monster_stack'])
+    trap_stack = copy.deepcopy(network['trap_stack'])
+    dead_end_dict = dict(network['dead_end_dict'])
+    border_index = dict(network['border_index'])
+    exit_stack = dict(network['exit_stack'])
+
+    #stair network rooms keep their numbers, every shard's rooms follow on
+    next_room = max([key for key in room_stack if isinstance(key, int)] + [room_stack['key_count']])
+    for z in sorted(shards, reverse=True):
+        shard = shards[z]
+        mapping = {}
+        for old in sorted(shard['rooms']):
+            next_room += 1
+            mapping[old] = next_room
+        for old, (cells, shape) in shard['rooms'].items():
+            room_stack[mapping[old]] = {key: dict(cell, fill=renumber_fill(cell['fill'], mapping)) if 'fill' in cell else cell for key, cell in cells.items()}
+            room_stack['shape_dict'][mapping[old]] = shape
+        room_stack['key_count'] += len(mapping)
+
+        for key, cell in shard['cells'].items():
+            if 'fill' in cell:
+                cell = dict(cell, fill=renumber_fill(cell['fill'], mapping))
+            dungeon[key] = cell
+
+        for wm in shard['wandering']:
+            wandering_monster_stack['key_count'] += 1
+            wandering_monster_stack[wandering_monster_stack['key_count']] = wm
+        trap_stack['key_count'] += shard['traps']
+        dead_end_dict.update(shard['dead_ends'])
+        border_index.update(shard['borders'])
+        exit_stack.update(shard['exits'])
+
+    return {
+        'dungeon': dungeon,
+        'room_stack': room_stack,
+        'trap_stack': trap_stack,
+        'wandering_monster_stack': wandering_monster_stack,
+        'dead_end_dict': dead_end_dict,
+        'border_index': border_index,
+        'exit_stack': exit_stack,
+    }
+
+
+def generate_sharded(seed, levels, rolls_per_level, suffix='', usepath='', workers=None, outputs=None, verbosity=0):
+    """
+    Generate a dungeon with the two stage level-sharded walk.
+
+    Args:
+        seed: Run seed, the stages get seeds derived from it
+        levels: Depth the stair network walks to (LEVELS_CHECK)
+        rolls_per_level: Walk rolls each level is grown with
+        suffix: Output suffix, as for dungeon_sim
+        usepath: Output directory, as for dungeon_sim
+        workers: Worker processes for the level stage, 1 runs in process
+        outputs: Output sinks for the merged dungeon, None for the defaults
+        verbosity: VERBOSITY for the stair network and output stages
+
+    Returns:
+        Stats frame of the merged dungeon, as from dungeon_sim
+    """
+    from dungeon_simulation import dungeon_sim
+
+    network = stair_network(seed, levels, verbosity)
+    tasks = []
+    for z in sorted(network['level_entries'], reverse=True):
+        if z < 0:
+            tasks.append({
+                'z': z,
+                'seed': task_seed(seed, 'level' + str(z)),
+                'rolls': rolls_per_level,
+                'entry': network['level_entries'][z],
+                'dungeon': network['dungeon'],
+            })
+    print("SHARDS:", len(tasks), "levels of", rolls_per_level, "rolls")
+
+    if workers is None:
+        workers = min(len(tasks), os.cpu_count() or 1)
+    if workers <= 1:
+        shards = dict(map(grow_level, tasks))
+    else:
+        ctx = mp.get_context("spawn")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=warm_worker) as executor:
+            shards = dict(executor.map(grow_level, tasks))
+
+    merged = merge_shards(network, shards)
+    random.seed(task_seed(seed, 'merge'))
+    start = {'dungeon': merged['dungeon'], 'stacks': merged, 'walk': False}
+    return dungeon_sim(suffix, usepath, rolls_per_level * len(tasks), verbosity, 0, levels, outputs, start=start)
+
+
+if __name__ == '__main__':
+    ARGV = sys.argv
+    seed = 0
+    levels = 4
+    rolls_per_level = 100
+    workers = None
+
+    if len(ARGV) > 1:
+        seed = int(ARGV[1])
+
+    if len(ARGV) > 2:
+        levels = int(ARGV[2])
+
+    if len(ARGV) > 3:
+        rolls_per_level = int(ARGV[3])
+
+    if len(ARGV) > 4:
+        workers = int(ARGV[4])
+
+    generate_sharded(seed, levels, rolls_per_level, workers=workers)
@@ -0,0 +1,235 @@
+"""
+Gridmapper and Text Mapper export of the level arrays.
+
+Both formats are written straight from a level array (or a dumped
+downlist.pkl), with no HTML in between:
+
+- gridmapper: one line of Gridmapper key strokes per map row, using the
+  glyph table that gridmapper_ref.py used to apply to a scraped classic map
+- textmapper: a Text Mapper square map, a "XXYY type" line per square that
+  is not rock with the room number or feature code as its label, after
+  attribute lines giving each type its classic map colour
+
+Fill codes are mapped to glyphs once per distinct code with np.unique, and
+each row is written as it is built, so large levels convert in one pass.
+The sinks pass the uint16 codes of a LevelList with its fill table, so the
+string arrays are never built.
+
+Usage:
+    python mapper_export.py [downlist.pkl] [gridmapper|textmapper]
+"""
+
+import pickle
+import re
+import sys
+
+import numpy as np
+
+from classic_mapper import cell_kind, room_number_text
+from level_codes import LevelList
+from png_export import KIND_COLORS
+
+
+# Gridmapper key strokes of each legend code
+GRIDMAPPER_GLYPHS = {
+    'B': "pvvvv",
+    'O': "fF",
+    'C': "f",
+    'R': "fQ",
+    'RA': "cQ",  #room square with treasure
+    'D': "gS",
+    'CH': "n",
+    'ri': "fVVB",
+    'br': "fVVB",  #bridges and boats are drawn as the river
+    'bo': "fVVB",
+    'bn': "fVVB",
+    'L': "fvvD",
+    'P': "fvvB",
+    'W': "bvB",
+    'S': "bvv",
+    'd': "d",
+    'wm': "fE",
+    'sd': "dv",
+    'st': "oE",
+    'sn': "ovE",
+    'ch': "oE",  #chutes and chimneys are drawn as stairs
+    'cm': "oE",
+    'td': "tvvvE",
+    'pi': "tvE",
+    'pt': "tvE",
+    'ps': "tvE",
+    'pc': "tvE",
+    'el': "svE",
+    'ar': "tvvvvvvE",
+    'sp': "tvvvvvvE",
+    'df': "dvvvvvE",
+    'sf': "tvvvvvvE",
+    'gs': "tvvvvvvE",
+    'bw': "wE",
+    'ol': "tvvvvvvE",
+    'm': "fE",
+    't': "cA",
+    'c': "cA",
+    's': "cA",
+    'e': "cA",
+    'g': "cA",
+    'p': "cA",
+    'G': "cA",
+    'j': "cA",
+    'M': "cA",
+}
+
+TREASURE_CODES = ['t', 'c', 's', 'e', 'g', 'p', 'G', 'j', 'M']
+
+MONSTER_CODES = ['wm', 'm']
+
+# legend codes in a fill, longest first so sd is not read as s then d
+LEGEND_CODE_RE = re.compile('|'.join(sorted((re.escape(code) for code in GRIDMAPPER_GLYPHS), key=len, reverse=True)))
+
+# Text Mapper type of each cell_kind
+TEXTMAPPER_TYPES = {
+    'CH': 'chasm',
+    'water': 'water',
+    'C': 'corridor',
+    'R': 'room',
+    'D': 'dead-end',
+    'O': 'entrance',
+    'other': 'feature',
+}
+
+
+def legend_code(fill):
+    """
+    Legend code a fill code is drawn as in Gridmapper.
+
+    A fill that is not itself a legend code is drawn as the first water,
+    trap, stair or door code in it, then as a treasure room, then as a
+    monster, and otherwise as plain room, corridor or dead end.
+    """
+    if fill in GRIDMAPPER_GLYPHS:
+        return fill
+    if 'CH' in fill:
+        return 'CH'
+    codes = LEGEND_CODE_RE.findall(fill.lstrip('RCD0123456789'))
+    for code in codes:
+        if code not in TREASURE_CODES and code not in MONSTER_CODES:
+            return code
+    if fill[0] == 'R':
+        if any(code in TREASURE_CODES for code in codes):
+            return 'RA'
+        return 'R'
+    for code in codes:
+        if code in MONSTER_CODES:
+            return code
+    return fill[0] if fill[0] in 'CD' else 'C'
+
+
+def fill_codes(level, crop=False, fills=None):
+    """
+    Distinct fill codes of a level and the index of each square's code.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1), or an
+            integer array of codes into fills
+        crop: Cut the level to its own extent first
+        fills: Fill code of each integer code, for integer arrays
+
+    Returns:
+        Tuple of (list of fill codes, int array of shape (rows, columns)
+        indexing it, rows along y)
+    """
+    grid = level[:, :, 0].T
+    coded = grid.dtype.kind in 'iu'
+    if crop:
+        used = grid != (0 if coded else 'B')
+        ys = np.flatnonzero(used.any(axis=1))
+        xs = np.flatnonzero(used.any(axis=0))
+        if len(xs):
+            grid = grid[ys[0]:ys[-1]+1, xs[0]:xs[-1]+1]
+    uniq, inverse = np.unique(grid, return_inverse=True)
+    uniq = uniq.tolist()
+    if coded:
+        uniq = [fills[code] for code in uniq]
+    return uniq, inverse.reshape(grid.shape)
+
+
+def gridmapper_rows(level, crop=False, fills=None):
+    """
+    Gridmapper lines of a level, one per row, as a generator.
+
+    Glyphs are separated by a space except after plain corridor floor, as
+    the reference script wrote them.
+    """
+    fills, grid = fill_codes(level, crop, fills)
+    glyphs = []
+    for fill in fills:
+        glyph = GRIDMAPPER_GLYPHS[legend_code(fill)]
+        glyphs.append(glyph if glyph == 'f' else glyph + ' ')
+    glyphs = np.array(glyphs, dtype=object)
+    for row in grid:
+        yield ''.join(glyphs[row].tolist()) + '\n'
+
+
+def textmapper_rows(level, crop=False, fills=None):
+    """
+    Text Mapper lines of a level as a generator, the type attributes then a line per square that is not rock.
+
+    Rooms are labelled with their number on their first square; squares
+    that are neither room, corridor nor dead end are labelled with their
+    fill code.
+    """
+    fills, grid = fill_codes(level, crop, fills)
+    kinds = [cell_kind(fill) for fill in fills]
+    for kind in sorted(set(kinds) - {'B'}, key=list(TEXTMAPPER_TYPES).index):
+        yield '%s attributes fill="#%02x%02x%02x"\n' % ((TEXTMAPPER_TYPES[kind],) + KIND_COLORS[kind])
+
+    width = max(2, len(str(max(grid.shape))))
+    labelled = set()
+    rock = [kind == 'B' for kind in kinds]
+    for y, row in enumerate(grid):
+        lines = []
+        for x, code in enumerate(row.tolist()):
+            if rock[code]:
+                continue
+            fill = fills[code]
+            line = '%0*d%0*d %s' % (width, x + 1, width, y + 1, TEXTMAPPER_TYPES[kinds[code]])
+            if kinds[code] == 'other':
+                line += ' "' + fill + '"'
+            elif fill[0] == 'R' and kinds[code] == 'R':
+                number = room_number_text(fill)
+                if number.isdigit() and number not in labelled:
+                    labelled.add(number)
+                    line += ' "R' + number + '"'
+            lines.append(line + '\n')
+        if lines:
+            yield ''.join(lines)
+
+
+def write_rows(path, rows):
+    """Write lines from a generator to path as they come."""
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(row)
+
+
+if __name__ == '__main__':
+    ARGV = sys.argv
+    path = 'downlist.pkl'
+    fmt = 'gridmapper'
+
+    if len(ARGV) > 1:
+        path = ARGV[1]
+
+    if len(ARGV) > 2:
+        fmt = ARGV[2]
+
+    rows = {'gridmapper': gridmapper_rows, 'textmapper': textmapper_rows}[fmt]
+    with open(path, 'rb') as fd:
+        downlist = pickle.load(fd)
+    for down in range(len(downlist)):
+        out = 'dungeon_' + str(down+1) + '_' + fmt + '.txt'
+        if isinstance(downlist, LevelList):
+            write_rows(out, rows(downlist.level_codes(down), fills=downlist.fills))
+        else:
+            write_rows(out, rows(downlist[down]))
+        print("WROTE:", out)
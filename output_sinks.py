@@ -0,0 +1,279 @@
+"""
+Registrable output stages for dungeon_sim.
+
+The walk and the accounting always run; everything written to disk after that
+is an output sink that can be switched on per run. A sink is a dict of two
+optional hooks, called with the run dict dungeon_sim builds:
+
+- level(run, down): called once per level (0-indexed)
+- finish(run): called once after all levels
+
+Built in sinks:
+
+- classic: dungeon_N.html, the colour coded table map with the room key
+- classic_cropped: dungeon_N.html cut to each level's own extent, use it
+  instead of classic when levels need not line up with each other
+- enhanced: dungeon_N_enhanced.html, the SVG map
+- canvas: dungeon_N_canvas.html, the enhanced map drawn on a canvas, for
+  levels too large for the SVG map
+- viewer: dungeon_viewer.html, one page for every level with shared
+  viewer.css and viewer.js, reading dungeon_N_data.js as levels are opened
+- png: dungeon_N.png thumbnails in the classic map colours and
+  dungeon-levels.png, a contact sheet of every level
+- gridmapper: dungeon_N_gridmapper.txt, Gridmapper key strokes of the level
+- textmapper: dungeon_N_textmapper.txt, the level as a Text Mapper map
+- vtu: dungeon.vtu, the occupied squares of every level as 3D voxels
+- vtk: dungeon.vtk, the whole block as legacy VTK structured points
+- obj: dungeon.obj and dungeon.mtl, a greedy meshed surface with a
+  material per square type
+- ply: dungeon.ply, the same mesh as coloured binary PLY
+- stats: dungeon-stats.csv, the one row stats frame
+- pickle: dungeon, downlist and stack pickles for debugging
+
+By default a run writes classic, enhanced and stats, plus pickle when
+VERBOSITY is on. Batch runs can pass outputs=['stats'] (or []) and render the
+maps later by rerunning a seed with the map sinks switched on.
+
+Level hooks run one level after another, or across a process pool with
+render_workers (see render_pool.py). With a render_cache directory the map
+sinks reuse pages whose inputs have not changed (see render_cache.py).
+"""
+
+import os
+import pickle
+
+import export_3d
+import mapper_export
+import png_export
+
+from classic_mapper import generate_classic_html, level_notes_html
+from level_codes import LevelList
+from enhanced_mapper import generate_canvas_html, generate_enhanced_html, generate_level_data, generate_viewer_html, viewer_css, viewer_js
+from render_cache import cached_page
+
+
+SINKS = {}
+
+DEFAULT_OUTPUTS = ['classic', 'enhanced', 'stats']
+
+
+def register_sink(name, level=None, finish=None):
+    """
+    Register an output sink.
+
+    Args:
+        name: Name used in the outputs list of dungeon_sim
+        level: Function of (run, down) called for every level
+        finish: Function of (run) called once all levels are done
+    """
+    SINKS[name] = {'level': level, 'finish': finish}
+
+
+def resolve_outputs(outputs, verbosity=0):
+    """
+    Return the list of sinks a run writes to.
+
+    Args:
+        outputs: List of sink names, None for the defaults
+        verbosity: Adds the pickle sink to the defaults when set
+
+    Returns:
+        List of registered sink names
+    """
+    if outputs is None:
+        outputs = list(DEFAULT_OUTPUTS)
+        if verbosity:
+            outputs.append('pickle')
+    for name in outputs:
+        if name not in SINKS:
+            raise ValueError('unknown output sink: ' + str(name))
+    return list(outputs)
+
+
+def output_path(run, filename):
+    """Path for an output file, in usepath/suffix/ for batch runs, otherwise the working directory."""
+    usepath = run['usepath']
+    suffix = run['suffix']
+    if usepath != '' and str(suffix) != '':
+        if not os.path.exists(os.path.join(usepath, str(suffix))):
+            os.makedirs(os.path.join(usepath, str(suffix)))
+        return os.path.join(usepath, str(suffix), filename)
+    return filename
+
+
+def write_outputs(run, outputs, render_workers=None):
+    """
+    Run the level hooks of every sink for each level, then the finish hooks.
+
+    Args:
+        run: Run dict from dungeon_sim
+        outputs: List of sink names from resolve_outputs
+        render_workers: Processes to render levels in, None or 1 renders them in turn
+    """
+    if outputs and run['usepath'] != '' and str(run['suffix']) != '':
+        print("USEPATH:", run['usepath'], "SUFFIX", run['suffix'])
+    hooks = [SINKS[name]['level'] for name in outputs if SINKS[name]['level'] is not None]
+    if render_workers is not None and render_workers > 1 and run['levels'] > 1 and hooks:
+        from render_pool import render_levels
+        render_levels(run, hooks, render_workers)
+    else:
+        for down in range(run['levels']):
+            for hook in hooks:
+                hook(run, down)
+    for name in outputs:
+        if SINKS[name]['finish'] is not None:
+            SINKS[name]['finish'](run)
+
+
+def classic_level(run, down, crop=False):
+    #built once, for the cache key and the page
+    notes = level_notes_html(run, down)
+    page = cached_page(run, down, 'classic_cropped' if crop else 'classic', 'classic_mapper', lambda: generate_classic_html(
+        run['downlist'][down],
+        down,
+        notes,
+        run['border_index'],
+        run['coord_lim'],
+        run['error_dict'],
+        run['verbosity'],
+        crop=crop
+    ), notes)
+    with open(output_path(run, 'dungeon_' + str(down+1) + '.html'), 'w') as f:
+        f.write(page)
+
+
+def classic_cropped_level(run, down):
+    classic_level(run, down, crop=True)
+
+
+def enhanced_level(run, down):
+    try:
+        enhanced_html = cached_page(run, down, 'enhanced', 'enhanced_mapper', lambda: generate_enhanced_html(
+            dungeon_data={'level': down+1},
+            level_num=down,
+            room_stack=run['room_stack'],
+            downlist=run['downlist'],
+            coord_limits=run['coord_lim'],
+            border_index=run['border_index']
+        ))
+
+        enhanced_path = output_path(run, 'dungeon_' + str(down+1) + '_enhanced.html')
+        with open(enhanced_path, 'w', encoding='utf-8') as f:
+            f.write(enhanced_html)
+
+        if run['verbosity']:
+            print(f"Generated enhanced visualization: {enhanced_path}")
+    except Exception as e:
+        print(f"Warning: Could not generate enhanced visualization for level {down+1}: {e}")
+        if run['verbosity']:
+            import traceback
+            traceback.print_exc()
+
+
+def canvas_level(run, down):
+    page = cached_page(run, down, 'canvas', 'enhanced_mapper', lambda: generate_canvas_html(
+        dungeon_data={'level': down+1},
+        level_num=down,
+        room_stack=run['room_stack'],
+        downlist=run['downlist'],
+        coord_limits=run['coord_lim'],
+        border_index=run['border_index']
+    ))
+    with open(output_path(run, 'dungeon_' + str(down+1) + '_canvas.html'), 'w', encoding='utf-8') as f:
+        f.write(page)
+
+
+def viewer_level(run, down):
+    data = cached_page(run, down, 'viewer', 'enhanced_mapper', lambda: generate_level_data(
+        level_num=down,
+        room_stack=run['room_stack'],
+        downlist=run['downlist'],
+        coord_limits=run['coord_lim'],
+        border_index=run['border_index']
+    ))
+    with open(output_path(run, 'dungeon_' + str(down+1) + '_data.js'), 'w', encoding='utf-8') as f:
+        f.write(data)
+
+
+def viewer_finish(run):
+    for filename, text in [('dungeon_viewer.html', generate_viewer_html(run['levels'])), ('viewer.css', viewer_css()), ('viewer.js', viewer_js())]:
+        with open(output_path(run, filename), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def level_codes(run, down):
+    """A level's uint16 codes and fill table, or its string array and None for a plain list of levels."""
+    downlist = run['downlist']
+    if isinstance(downlist, LevelList):
+        return downlist.level_codes(down), downlist.fills
+    return downlist[down], None
+
+
+def png_level(run, down):
+    codes, fills = level_codes(run, down)
+    png_export.write_png(output_path(run, 'dungeon_' + str(down+1) + '.png'), png_export.level_rgb(codes, png_export.PNG_SCALE, fills))
+
+
+def png_finish(run):
+    if run['levels'] > 0:
+        images = []
+        for down in range(run['levels']):
+            codes, fills = level_codes(run, down)
+            images.append(png_export.level_rgb(codes, png_export.PNG_SCALE, fills))
+        png_export.write_png(output_path(run, 'dungeon-levels.png'), png_export.contact_sheet(images))
+
+
+def gridmapper_level(run, down):
+    codes, fills = level_codes(run, down)
+    mapper_export.write_rows(output_path(run, 'dungeon_' + str(down+1) + '_gridmapper.txt'), mapper_export.gridmapper_rows(codes, fills=fills))
+
+
+def textmapper_level(run, down):
+    codes, fills = level_codes(run, down)
+    mapper_export.write_rows(output_path(run, 'dungeon_' + str(down+1) + '_textmapper.txt'), mapper_export.textmapper_rows(codes, fills=fills))
+
+
+def vtu_finish(run):
+    if run['levels'] > 0:
+        export_3d.write_vtu(output_path(run, 'dungeon.vtu'), export_3d.classify_levels(run['downlist']))
+
+
+def vtk_finish(run):
+    if run['levels'] > 0:
+        export_3d.write_vtk(output_path(run, 'dungeon.vtk'), export_3d.classify_levels(run['downlist']))
+
+
+def obj_finish(run):
+    if run['levels'] > 0:
+        export_3d.write_obj(output_path(run, 'dungeon.obj'), export_3d.classify_levels(run['downlist']))
+
+
+def ply_finish(run):
+    if run['levels'] > 0:
+        export_3d.write_ply(output_path(run, 'dungeon.ply'), export_3d.classify_levels(run['downlist']))
+
+
+def stats_finish(run):
+    run['df'].to_csv(output_path(run, 'dungeon-stats.csv'), index=False)
+
+
+def pickle_finish(run):
+    for name in ['dungeon', 'downlist', 'room_stack', 'exit_stack', 'wandering_monster_stack']:
+        with open(output_path(run, name + '.pkl'), 'wb') as fd:
+            pickle.dump(run[name], fd)
+
+
+register_sink('classic', level=classic_level)
+register_sink('classic_cropped', level=classic_cropped_level)
+register_sink('enhanced', level=enhanced_level)
+register_sink('canvas', level=canvas_level)
+register_sink('viewer', level=viewer_level, finish=viewer_finish)
+register_sink('png', level=png_level, finish=png_finish)
+register_sink('gridmapper', level=gridmapper_level)
+register_sink('textmapper', level=textmapper_level)
+register_sink('vtu', finish=vtu_finish)
+register_sink('vtk', finish=vtk_finish)
+register_sink('obj', finish=obj_finish)
+register_sink('ply', finish=ply_finish)
+register_sink('stats', finish=stats_finish)
+register_sink('pickle', finish=pickle_finish)
@@ -0,0 +1,143 @@
+"""
+PNG thumbnails of the level arrays.
+
+Each square is coloured as on the classic map (rock black, rooms grey,
+corridors white, dead ends and chasms brown, water blue, the entrance green,
+everything else red) and written as a PNG using only zlib and struct. The
+colours are looked up once per distinct fill code and the image is built with
+numpy, one or scale pixels per square, so it is cheap enough to run for every
+dungeon of a batch.
+
+contact_sheet puts all levels of a dungeon side by side in one image.
+
+Usage:
+    python png_export.py seed rolls [scale]
+"""
+
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from classic_mapper import cell_kind
+
+
+# classic map colours of each cell_kind
+KIND_COLORS = {
+    'B': (0, 0, 0),
+    'CH': (165, 42, 42),
+    'water': (0, 0, 255),
+    'C': (255, 255, 255),
+    'R': (128, 128, 128),
+    'D': (165, 42, 42),
+    'O': (0, 128, 0),
+    'other': (255, 0, 0),
+}
+
+# between levels on a contact sheet
+GAP_COLOR = (64, 64, 64)
+
+PNG_SCALE = 4
+
+
+def palette(fills):
+    """Array of the RGB colour of each fill code, shape (len(fills), 3)."""
+    return np.array([KIND_COLORS[cell_kind(fill)] for fill in fills], dtype=np.uint8).reshape(-1, 3)
+
+
+def level_rgb(level, scale=1, fills=None):
+    """
+    Colour a level array.
+
+    Args:
+        level: Character array of the level, shape (xwidth, ywidth, 1), or an
+            integer array of codes into fills
+        scale: Pixels per square along each side
+        fills: Fill code of each integer code, for integer arrays
+
+    Returns:
+        uint8 array of shape (ywidth*scale, xwidth*scale, 3), rows along y
+    """
+    grid = level[:, :, 0].T
+    if grid.dtype.kind in 'iu':
+        rgb = palette(fills)[grid]
+    else:
+        uniq, inverse = np.unique(grid, return_inverse=True)
+        rgb = palette(uniq.tolist())[inverse.reshape(grid.shape)]
+    if scale > 1:
+        rgb = rgb.repeat(scale, axis=0).repeat(scale, axis=1)
+    return rgb
+
+
+def contact_sheet(images, columns=None, gap=2):
+    """
+    Tile images of one size into one, left to right then top to bottom.
+
+    Args:
+        images: List of RGB arrays of one shape
+        columns: Images per row, defaults to a near square sheet
+        gap: Pixels between images
+
+    Returns:
+        RGB array of the sheet
+    """
+    if columns is None:
+        columns = int(np.ceil(np.sqrt(len(images))))
+    rows = (len(images) + columns - 1) // columns
+    height, width = images[0].shape[:2]
+    sheet = np.empty((rows * (height + gap) + gap, columns * (width + gap) + gap, 3), dtype=np.uint8)
+    sheet[:, :] = GAP_COLOR
+    for n, image in enumerate(images):
+        top = gap + (n // columns) * (height + gap)
+        left = gap + (n % columns) * (width + gap)
+        sheet[top:top+height, left:left+width] = image
+    return sheet
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_png(rgb, level=6):
+    """Encode an RGB array as PNG bytes, 8 bit truecolour with no row filter."""
+    height, width = rgb.shape[:2]
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgb.reshape(height, width * 3)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        png_chunk(b'IDAT', zlib.compress(raw.tobytes(), level)),
+        png_chunk(b'IEND', b''),
+    ])
+
+
+def write_png(path, rgb):
+    """Write an RGB array to path as a PNG."""
+    with open(path, 'wb') as f:
+        f.write(encode_png(rgb))
+
+
+if __name__ == '__main__':
+    import random
+    from dungeon_simulation import dungeon_sim
+
+    ARGV = sys.argv
+    seed = 0
+    rolls = 300
+    scale = PNG_SCALE
+
+    if len(ARGV) > 1:
+        seed = int(ARGV[1])
+
+    if len(ARGV) > 2:
+        rolls = int(ARGV[2])
+
+    if len(ARGV) > 3:
+        scale = int(ARGV[3])
+
+    #the png sink reads the scale from the imported module, not __main__
+    import png_export
+    png_export.PNG_SCALE = scale
+    random.seed(seed)
+    dungeon_sim('', '', rolls, 0, 0, 0, outputs=['png'])
@@ -0,0 +1,126 @@
+"""
+Content-hash cache for level pages.
+
+Every level page is keyed by a hash of what goes into it:
+
+- the level's fill array
+- the squares' secret door sides and the dungeon origin
+- the room records of the level (and for the classic map the room key,
+  trap and wandering monster notes written under it from the accounting,
+  passed in by the sink so they are built once for the key and the page)
+- the renderer version, a hash of the mapper module's source, so editing
+  the CSS or templates of a mapper starts a fresh set of entries
+
+A page whose key is already in the cache directory is copied from it instead
+of being rendered again, so rerendering a seed or rerunning after a change to
+one mapper only redraws what changed. Errors the renderer logged go in the
+cache with the page and are logged again on a hit.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+
+CACHE_FORMAT = 1
+
+SOURCE_HASHES = {}
+
+
+def renderer_version(module_name):
+    """Hash of a mapper module's source, read once per process."""
+    if module_name not in SOURCE_HASHES:
+        module = sys.modules.get(module_name) or __import__(module_name)
+        with open(module.__file__, 'rb') as f:
+            SOURCE_HASHES[module_name] = hashlib.sha256(f.read()).hexdigest()
+    return SOURCE_HASHES[module_name]
+
+
+def level_rooms(room_stack, down):
+    """Room numbers whose squares are on level down (0-indexed)."""
+    rooms = []
+    for room_num in room_stack.get('shape_dict', {}):
+        if room_stack.get(room_num) and list(room_stack[room_num].keys())[0][2] == 0 - down - 1:
+            rooms.append(room_num)
+    return rooms
+
+
+def level_key(run, down, kind, module_name, notes=None):
+    """
+    Hash of everything a level page of one kind is drawn from.
+
+    Args:
+        run: Run dict from dungeon_sim
+        down: The level number (0-indexed)
+        kind: Name of the page kind, e.g. classic or enhanced
+        module_name: Mapper module that renders it
+        notes: HTML written under the map, for the classic pages
+
+    Returns:
+        Hex digest
+    """
+    level = run['downlist'][down]
+    z = 0 - down - 1
+    digest = hashlib.sha256()
+    digest.update(repr((CACHE_FORMAT, kind, renderer_version(module_name), down)).encode('utf-8'))
+    digest.update(repr((level.shape, level.dtype.str, run['coord_lim'][0][:2])).encode('utf-8'))
+    digest.update(np.ascontiguousarray(level).tobytes())
+    borders = sorted((key, side) for key, side in run['border_index'].items() if key[2] == z)
+    digest.update(repr(borders).encode('utf-8'))
+    rooms = level_rooms(run['room_stack'], down)
+    digest.update(repr([(room_num, run['room_stack']['shape_dict'][room_num]) for room_num in rooms]).encode('utf-8'))
+    if notes is not None:
+        digest.update(notes.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cached_page(run, down, kind, module_name, render, notes=None):
+    """
+    Return a level page from the run's render cache, rendering and storing it on a miss.
+
+    Without run['render_cache'] set this is just render().
+
+    Args:
+        run: Run dict from dungeon_sim
+        down: The level number (0-indexed)
+        kind: Name of the page kind, part of the key
+        module_name: Mapper module that renders it, part of the key
+        render: Function of no arguments returning the page
+        notes: HTML the page writes under the map, part of the key
+
+    Returns:
+        The page HTML
+    """
+    cache_dir = run.get('render_cache')
+    if not cache_dir:
+        return render()
+
+    error_dict = run['error_dict']
+    path = os.path.join(cache_dir, level_key(run, down, kind, module_name, notes))
+    if os.path.exists(path + '.html'):
+        with open(path + '.html', encoding='utf-8') as f:
+            page = f.read()
+        if os.path.exists(path + '.errors.json'):
+            with open(path + '.errors.json') as f:
+                for message in json.load(f):
+                    error_dict[error_dict['key_count']] = message
+                    error_dict['key_count'] += 1
+        if run['verbosity']:
+            print("RENDER CACHE HIT:", kind, down+1, path)
+        return page
+
+    first = error_dict['key_count']
+    page = render()
+    os.makedirs(cache_dir, exist_ok=True)
+    errors = [error_dict[key] for key in range(first, error_dict['key_count'])]
+    if errors:
+        with open(path + '.errors.json', 'w') as f:
+            json.dump(errors, f)
+    #write then rename, so a page is never half there for another process
+    with open(path + '.tmp' + str(os.getpid()), 'w', encoding='utf-8') as f:
+        f.write(page)
+    os.replace(path + '.tmp' + str(os.getpid()), path + '.html')
+    return page
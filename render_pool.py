@@ -0,0 +1,86 @@
+"""
+Parallel level rendering.
+
+Once the walk is done every level page is independent, so the level hooks of
+the output sinks can run side by side. The part of the run dict the level
+hooks read (LEVEL_KEYS) is pickled to each worker once by the pool
+initialiser; the levels are the compact uint16 codes of a LevelList (see
+level_codes.py) and the walked dungeon and the stats frame stay behind, so
+this is cheap, and a task is then just a level number.
+
+Level hooks run in spawn-context workers, so the sinks they belong to must be
+registered by an importable module (output_sinks registers the built in ones
+on import). Errors the renderers log in error_dict are sent back and added in
+level order, as a serial render would have.
+"""
+
+import concurrent.futures
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from level_codes import LevelList
+
+
+WORKER = {}
+
+# run dict keys the level hooks read, the maps' inputs and where to write them
+LEVEL_KEYS = [
+    'suffix', 'usepath', 'verbosity', 'levels', 'coord_lim', 'downlist', 'accounting',
+    'wandering_monster_subtable', 'room_stack', 'wandering_monster_stack', 'border_index',
+    'error_dict', 'render_cache',
+]
+
+
+def init_worker(run, hooks):
+    """Process pool initialiser: keep the run for the worker's tasks."""
+    WORKER['run'] = run
+    WORKER['hooks'] = hooks
+
+
+def render_level(down):
+    """
+    Worker task: run every level hook for one level.
+
+    Returns:
+        Tuple of (down, list of error messages logged while rendering it)
+    """
+    run = WORKER['run']
+    error_dict = run['error_dict']
+    first = error_dict['key_count']
+    for hook in WORKER['hooks']:
+        hook(run, down)
+    errors = [error_dict.pop(key) for key in range(first, error_dict['key_count'])]
+    error_dict['key_count'] = first
+    return down, errors
+
+
+def render_levels(run, hooks, workers=None):
+    """
+    Run level hooks for every level of a run across a process pool.
+
+    Args:
+        run: Run dict from dungeon_sim
+        hooks: Level hook functions, called as hook(run, down)
+        workers: Worker processes, defaults to one per level up to the CPU count
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, run['levels'])
+    downlist = run['downlist']
+    if isinstance(downlist, LevelList):
+        squares = [downlist.squares(down) for down in range(run['levels'])]
+    else:
+        squares = [int(np.count_nonzero(level != 'B')) for level in downlist]
+    ctx = mp.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_worker, initargs=({key: run[key] for key in LEVEL_KEYS if key in run}, hooks)) as executor:
+        #largest levels first, so the slowest page is not left until the end
+        order = sorted(range(run['levels']), key=lambda down: -squares[down])
+        results = dict(executor.map(render_level, order))
+
+    error_dict = run['error_dict']
+    for down in range(run['levels']):
+        for message in results[down]:
+            error_dict[error_dict['key_count']] = message
+            error_dict['key_count'] += 1
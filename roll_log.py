@@ -0,0 +1,218 @@
+"""
+Compact roll-log recording and deterministic replay.
+
+Every die the generator throws goes through the module level functions of
+``random`` (randint, choice, choices, ...), which all bottom out in either
+``Random._randbelow(n)`` or ``Random.random()``. Swapping those functions for
+the bound methods of a recording generator captures the whole dungeon as a
+stream of (die size, value) pairs - a couple of bytes per roll before zlib -
+instead of pickling ``dungeon``, ``room_stack`` and ``downlist``.
+
+A replaying generator feeds the same stream back, so the exact dungeon can be
+rebuilt on another machine without VERBOSITY output.
+
+Log layout: ``ADRL`` magic, version byte, varint length + JSON header (run
+parameters), then a zlib stream of records. A record is ``varint(sides)``
+followed by ``varint(value)``; sides 0 marks a float from ``random()`` stored
+as 8 little endian bytes.
+"""
+
+import json
+import random
+import struct
+import zlib
+from contextlib import contextmanager
+
+
+MAGIC = b'ADRL'
+VERSION = 1
+
+# module level functions that are bound to random's hidden generator; they all
+# end in _randbelow or random(). getrandbits is left alone: it is what
+# _randbelow draws from, so it cannot be recorded as a die of its own, and the
+# generator never calls it directly.
+PATCHED_NAMES = ['random', 'randint', 'randrange', 'choice', 'choices', 'shuffle', 'sample', 'uniform']
+
+FLUSH_BYTES = 1 << 16
+
+
+def write_varint(buf, value):
+    """Append an unsigned LEB128 varint to a bytearray."""
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data, pos):
+    """Read an unsigned LEB128 varint, returning (value, new position)."""
+    shift = 0
+    value = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, pos
+        shift += 7
+
+
+class RollRecorder(random.Random):
+    """Random generator that streams every die result to a roll log file."""
+
+    def __init__(self, fd, seed=None):
+        self.fd = fd
+        self.buf = bytearray()
+        self.compressor = zlib.compressobj(9)
+        self.count = 0
+        super().__init__(seed)
+
+    def _randbelow(self, n):
+        value = super()._randbelow(n)
+        write_varint(self.buf, n)
+        write_varint(self.buf, value)
+        self.count += 1
+        if len(self.buf) >= FLUSH_BYTES:
+            self.flush()
+        return value
+
+    def random(self):
+        value = super().random()
+        self.buf.append(0)
+        self.buf += struct.pack('<d', value)
+        self.count += 1
+        return value
+
+    def flush(self):
+        self.fd.write(self.compressor.compress(bytes(self.buf)))
+        self.buf.clear()
+
+    def close(self):
+        self.flush()
+        self.fd.write(self.compressor.flush())
+
+
+class RollReplayer(random.Random):
+    """Random generator that hands back the results stored in a roll log."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.count = 0
+        super().__init__(0)
+
+    def next_record(self, n):
+        if self.pos >= len(self.data):
+            raise ValueError('roll log exhausted after ' + str(self.count) + ' rolls')
+        sides, self.pos = read_varint(self.data, self.pos)
+        if sides != n:
+            raise ValueError('roll log diverged at roll ' + str(self.count) + ': expected die ' + str(sides) + ' got ' + str(n))
+        self.count += 1
+
+    def _randbelow(self, n):
+        self.next_record(n)
+        value, self.pos = read_varint(self.data, self.pos)
+        return value
+
+    def random(self):
+        self.next_record(0)
+        value = struct.unpack_from('<d', self.data, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def remaining(self):
+        return len(self.data) - self.pos
+
+
+@contextmanager
+def use_generator(rng):
+    """Route the module level ``random`` functions through rng for the block."""
+    saved = {name: getattr(random, name) for name in PATCHED_NAMES}
+    try:
+        for name in PATCHED_NAMES:
+            setattr(random, name, getattr(rng, name))
+        yield rng
+    finally:
+        for name in PATCHED_NAMES:
+            setattr(random, name, saved[name])
+
+
+def read_roll_log(path):
+    """
+    Load a roll log.
+
+    Args:
+        path: Roll log file written by record_rolls
+
+    Returns:
+        Tuple of (header dict, decompressed record bytes)
+    """
+    with open(path, 'rb') as fd:
+        raw = fd.read()
+    if raw[:4] != MAGIC:
+        raise ValueError(str(path) + ' is not a roll log')
+    if raw[4] != VERSION:
+        raise ValueError('unsupported roll log version ' + str(raw[4]))
+    length, pos = read_varint(raw, 5)
+    header = json.loads(raw[pos:pos + length].decode('utf-8'))
+    data = zlib.decompress(raw[pos + length:])
+    return header, data
+
+
+def iter_rolls(data):
+    """Yield (sides, value) for every record; sides 0 is a float from random()."""
+    pos = 0
+    while pos < len(data):
+        sides, pos = read_varint(data, pos)
+        if sides == 0:
+            value = struct.unpack_from('<d', data, pos)[0]
+            pos += 8
+        else:
+            value, pos = read_varint(data, pos)
+        yield sides, value
+
+
+@contextmanager
+def record_rolls(path, seed=None, params=None):
+    """
+    Record every roll made inside the block to a compact log file.
+
+    Args:
+        path: Output roll log file
+        seed: Optional seed for the recording generator
+        params: Run parameters stored in the header (periodic_checks etc.)
+
+    Yields:
+        The RollRecorder in use
+    """
+    header = json.dumps({'seed': seed, 'params': params or {}}).encode('utf-8')
+    with open(path, 'wb') as fd:
+        prefix = bytearray(MAGIC)
+        prefix.append(VERSION)
+        write_varint(prefix, len(header))
+        fd.write(bytes(prefix) + header)
+        recorder = RollRecorder(fd, seed)
+        try:
+            with use_generator(recorder):
+                yield recorder
+        finally:
+            recorder.close()
+
+
+@contextmanager
+def replay_rolls(path):
+    """
+    Replay a roll log so the generator rebuilds the recorded dungeon.
+
+    Args:
+        path: Roll log file written by record_rolls
+
+    Yields:
+        The header dict, whose 'params' hold the recorded run parameters
+    """
+    header, data = read_roll_log(path)
+    replayer = RollReplayer(data)
+    with use_generator(replayer):
+        yield header
+    if replayer.remaining():
+        print("Warning: roll log has", replayer.remaining(), "unread bytes after", replayer.count, "rolls")
@@ -1,7 +1,5 @@
 
 import os
-import concurrent.futures
-import multiprocessing as mp
 import pandas as pd
 
 import time as tm
@@ -4587,6 +4585,8 @@ def dungeon_simr(suffix, periodic_checks, verbosity, usepath):
 #def dungeon_simr(suffix, periodic_checks, verbosity, usepath):
 
 from dungeon_simulation import dungeon_sim
+from batch_runner import make_task, run_batch
+from batch_stats import StatsSink
 
 
 if __name__ == '__main__':
@@ -4597,11 +4597,18 @@ if __name__ == '__main__':
     simulations = 10
     rooms_check = False
     levels_check = False
+    workers = None
+    base_seed = 0
+    resume = False
+    #stats rows come back to the StatsSink, so nothing else is written per run
+    outputs = []
 
     ARGV = sys.argv
     print(ARGV)
 
-    #pc first param, simulations second
+    #pc first param, simulations second, worker processes third, batch seed fourth,
+    #'resume' fifth to append to an interrupted batch instead of starting over,
+    #comma separated output sinks sixth, e.g. classic,enhanced,stats
     if len(ARGV) > 1:
         periodic_checks = int(ARGV[1])
         print("USING PERIODIC CHECKS:",periodic_checks)
@@ -4610,58 +4617,52 @@ if __name__ == '__main__':
         simulations = int(ARGV[2])
         print("USING SIMULATIONS;",simulations)
 
-    result_list = []
-    index_list = []
-    pc_list = []
-    verbosity_list = []
-    usepath_list = []
-    rooms_check_list = []
-    levels_check_list = []
-    
-    for i in range(simulations):
-        index_list.append(i)
-        periodic_checks = random.randint(1, 1000)
-        rooms_check = random.randint(1, 1000)
-
-        pc_list.append(periodic_checks)
-        verbosity_list.append(verbosity)
-        usepath_list.append(usepath)
-        rooms_check_list.append(rooms_check)
-        
-        levels_check_list.append(levels_check)
-
-    #print(pc_list)
-    idx_list = index_list
-    print("RUNS:", len(idx_list))
-    #print(idx_list)
-    use_index = 0
-    #print(idx_list[use_index:use_index + 1]) ##
-    ctx = mp.get_context("spawn")
-    #with concurrent.futures.ProcessPoolExecutor(mp_context=ctx) as executor:
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_data = {executor.submit(dungeon_sim, idx, usepath_list[idx], pc_list[idx], verbosity_list[idx],  rooms_check_list[idx], levels_check_list[idx]): idx for idx in idx_list}		
-        #future_to_data = {executor.map(dungeon_sim, idx, usepath_list[idx], pc_list[idx], verbosity_list[idx],  rooms_check_list[idx], levels_check_list[idx],chunksize=10_000): idx for idx in idx_list}		
-        #suffix, usepath, periodic_checks, verbosity, rooms_check, levels_check
-        for future in concurrent.futures.as_completed(future_to_data):
-            datainfo = future_to_data[future]
-            #print(datainfo)
-            try:
-                data = future.result()
-                print("DATASHAPE",len(data))
-                result_list.append(data)
-
-                #print("BS", bin_series)
-                #if datainfo == '1-2021-10-25-06-21-Invert-the-Gawler-Mira_GeoscienceAnalyst.csv':
-            except Exception as exc:
-                print('%r generated an exception: %s' % (datainfo, exc))
+    if len(ARGV) > 3:
+        workers = int(ARGV[3])
+        print("USING WORKERS:",workers)
+
+    if len(ARGV) > 4:
+        base_seed = int(ARGV[4])
+        print("USING SEED:",base_seed)
+
+    if len(ARGV) > 5:
+        resume = ARGV[5] == 'resume'
+        print("RESUMING:",resume)
+
+    if len(ARGV) > 6:
+        outputs = [name for name in ARGV[6].split(',') if name]
+        print("USING OUTPUTS:",outputs)
+
+    #parameter draws come from the batch seed too so a batch can be rerun exactly
+    param_random = random.Random(base_seed)
+
+    stats_path = os.path.join(str(usepath),'dungeon-stats_simulation.csv')
+    finished = set()
+
+    def task_list():
+        for i in range(simulations):
+            periodic_checks = param_random.randint(1, 1000)
+            rooms_check = param_random.randint(1, 1000)
+            task = make_task(i, base_seed, usepath, periodic_checks, verbosity, rooms_check, levels_check, outputs=outputs)
+            if task['seed'] not in finished:
+                yield task
+
+    print("RUNS:", simulations)
+    if not os.path.exists(usepath):
+        os.mkdir(usepath)
+
+    #rows go straight to disk, only running aggregates stay in memory
+    with StatsSink(stats_path, resume=resume) as sink:
+        if resume and os.path.exists(stats_path) and os.path.getsize(stats_path) > 0:
+            finished.update(int(seed) for seed in pd.read_csv(stats_path, usecols=['seed'], dtype=str)['seed'])
+            print("ALREADY FINISHED:", len(finished))
+
+        for task, data, exc in run_batch(task_list(), workers=workers):
+            if exc is not None:
+                print('%r generated an exception: %s' % (task['index'], exc))
             else:
-                print('%r run finished' % (datainfo))
-
-    #print(bin_series)
-    print(result_list)
-    output = pd.concat(result_list)
-    print(output.head())
-
-    output.to_csv(os.path.join(str(usepath),'dungeon-stats_simulation.csv'), index=False)
-
+                sink.add(data)
+                print('%r run finished' % (task['index']))
 
+        for name, summary in sink.summary().items():
+            print(name, summary)
@@ -0,0 +1,224 @@
+"""
+Resumable, checkpointed parameter sweeps over dungeon simulations.
+
+A sweep is a design over PERIODIC_CHECKS, ROOMS_CHECK and LEVELS_CHECK times a
+range of seeds. Every finished (params, seed) task is appended to a JSON lines
+checkpoint together with its headline metrics, so a killed sweep picks up
+where it stopped: finished tasks are skipped and only the rest are dispatched
+to the process pool in batch_runner. Stats rows go to a resumable StatsSink.
+
+Designs are either a full grid, or adaptive: start from the grid and, each
+round, add the midpoint between the neighbouring values of a parameter whose
+mean metric differs the most.
+
+Usage:
+    python sweep.py sweep.json
+
+with a config like
+    {"usepath": "sweep1", "periodic_checks": [50, 100, 200], "rooms_check": [0],
+     "levels_check": [0], "seeds": [0, 20], "workers": 32, "outputs": [],
+     "adaptive": {"metric": "rooms", "rounds": 3, "refine": 2}}
+"""
+
+import csv
+import itertools
+import json
+import os
+import sys
+
+from batch_runner import make_task, run_batch
+from batch_stats import METRICS, StatsSink, truncate_torn_line
+
+
+PARAMS = ['periodic_checks', 'rooms_check', 'levels_check']
+
+
+def grid_design(periodic_checks, rooms_check=(0,), levels_check=(0,)):
+    """Return every combination of the parameter values as a list of dicts."""
+    return [dict(zip(PARAMS, values)) for values in itertools.product(periodic_checks, rooms_check, levels_check)]
+
+
+def task_key(params, seed):
+    """Stable identifier for a (params, seed) task, also used as the output suffix."""
+    return 'pc' + str(params['periodic_checks']) + '_r' + str(params['rooms_check']) + '_l' + str(params['levels_check']) + '_s' + str(seed)
+
+
+def load_checkpoint(path):
+    """Read finished tasks from a checkpoint file, keyed by task_key."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as fd:
+        for line in fd:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                #a torn last line from a killed run, that task just reruns
+                continue
+            done[task_key(record['params'], record['seed'])] = record
+    return done
+
+
+def prune_stats(path, done):
+    """
+    Drop stats rows of tasks that never reached the checkpoint.
+
+    A stats row is written before its checkpoint record, so a sweep killed in
+    between leaves a row for a task that will run again; without this the
+    rerun would add it a second time.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    truncate_torn_line(path)
+    with open(path, newline='') as fd:
+        reader = csv.DictReader(fd)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+    keep = [row for row in rows if task_key(row, row['seed']) in done]
+    if len(keep) == len(rows):
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='') as fd:
+        writer = csv.DictWriter(fd, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(keep)
+    os.replace(tmp_path, path)
+    print("SWEEP: dropped", len(rows) - len(keep), "stats rows without a checkpoint")
+
+
+def metric_means(done, metric):
+    """Mean of a checkpointed metric per parameter point."""
+    sums = {}
+    for record in done.values():
+        if metric not in record['metrics']:
+            continue
+        point = tuple(record['params'][p] for p in PARAMS)
+        total, count = sums.get(point, (0.0, 0))
+        sums[point] = (total + record['metrics'][metric], count + 1)
+    return {point: total / count for point, (total, count) in sums.items()}
+
+
+def refine_design(design, done, metric, refine=1):
+    """
+    Add midpoints where the metric changes most between neighbouring values.
+
+    For each parameter, neighbouring design points that differ only in that
+    parameter are compared; the refine largest jumps get a midpoint, when there
+    is an integer value between them.
+    """
+    means = metric_means(done, metric)
+    points = {tuple(p[name] for name in PARAMS) for p in design}
+    jumps = []
+    for axis in range(len(PARAMS)):
+        lines = {}
+        for point in points:
+            rest = point[:axis] + point[axis + 1:]
+            lines.setdefault(rest, []).append(point)
+        for line in lines.values():
+            line.sort(key=lambda point: point[axis])
+            for a, b in zip(line, line[1:]):
+                if a in means and b in means and b[axis] - a[axis] > 1:
+                    jumps.append((abs(means[b] - means[a]), axis, a, b))
+
+    jumps.sort(reverse=True)
+    new_design = list(design)
+    for jump, axis, a, b in jumps[:refine]:
+        mid = list(a)
+        mid[axis] = (a[axis] + b[axis]) // 2
+        if tuple(mid) not in points:
+            points.add(tuple(mid))
+            new_design.append(dict(zip(PARAMS, mid)))
+    return new_design
+
+
+def sweep_tasks(design, seeds, usepath, done, verbosity=0, outputs=None):
+    """Yield batch_runner task dicts for every unfinished (params, seed)."""
+    for params in design:
+        for seed in seeds:
+            key = task_key(params, seed)
+            if key in done:
+                continue
+            yield make_task(key, None, usepath, params['periodic_checks'], verbosity, params['rooms_check'], params['levels_check'], seed=seed, outputs=outputs)
+
+
+def run_sweep(design, seeds, usepath, workers=None, checkpoint=None, stats_path=None, chunksize=1, outputs=()):
+    """
+    Run every unfinished (params, seed) task of a design.
+
+    Args:
+        design: List of parameter dicts, e.g. from grid_design
+        seeds: Iterable of seeds, each task is random.seed(seed)
+        usepath: Output directory for the dungeons, checkpoint and stats
+        workers: Worker processes for batch_runner.run_batch
+        checkpoint: Checkpoint file, defaults to usepath/sweep-checkpoint.jsonl
+        stats_path: Stats CSV, defaults to usepath/dungeon-stats_sweep.csv
+        chunksize: Tasks per worker call
+        outputs: Output sinks each run writes, none by default (stats only)
+
+    Returns:
+        Dict of all finished tasks (including ones from earlier runs) keyed by task_key
+    """
+    if not os.path.exists(usepath):
+        os.makedirs(usepath)
+    if checkpoint is None:
+        checkpoint = os.path.join(usepath, 'sweep-checkpoint.jsonl')
+    if stats_path is None:
+        stats_path = os.path.join(usepath, 'dungeon-stats_sweep.csv')
+
+    seeds = list(seeds)
+    done = load_checkpoint(checkpoint)
+    prune_stats(stats_path, done)
+    todo = len(design) * len(seeds) - sum(1 for params in design for seed in seeds if task_key(params, seed) in done)
+    print("SWEEP:", len(design), "points x", len(seeds), "seeds,", todo, "to run")
+
+    with StatsSink(stats_path, resume=True) as sink, open(checkpoint, 'a') as fd:
+        for task, row, exc in run_batch(sweep_tasks(design, seeds, usepath, done, outputs=list(outputs)), workers=workers, chunksize=chunksize):
+            params = {name: task[name] for name in PARAMS}
+            if exc is not None:
+                print('%r generated an exception: %s' % (task['index'], exc))
+                continue
+            row.update(params)
+            sink.add(row)
+
+            metrics = {name: float(metric(row)) for name, metric in METRICS.items()}
+            record = {'params': params, 'seed': task['seed'], 'metrics': metrics}
+            fd.write(json.dumps(record) + '\n')
+            fd.flush()
+            done[task['index']] = record
+            print('%r run finished' % (task['index']))
+
+    return done
+
+
+def run_adaptive_sweep(design, seeds, usepath, metric='rooms', rounds=3, refine=1, **kwargs):
+    """Run the design, then refine it and run again for a number of rounds."""
+    done = run_sweep(design, seeds, usepath, **kwargs)
+    for r in range(rounds):
+        new_design = refine_design(design, done, metric, refine)
+        if len(new_design) == len(design):
+            break
+        design = new_design
+        print("ADAPTIVE ROUND:", r + 1, len(design), "points")
+        done = run_sweep(design, seeds, usepath, **kwargs)
+    return done
+
+
+if __name__ == '__main__':
+    ARGV = sys.argv
+    with open(ARGV[1]) as fd:
+        config = json.load(fd)
+
+    design = grid_design(config.get('periodic_checks', [1]), config.get('rooms_check', [0]), config.get('levels_check', [0]))
+    seeds = range(*config.get('seeds', [0, 1]))
+    usepath = config.get('usepath', 'sweep')
+    workers = config.get('workers')
+    outputs = config.get('outputs', [])
+
+    if 'adaptive' in config:
+        adaptive = config['adaptive']
+        run_adaptive_sweep(design, seeds, usepath, adaptive.get('metric', 'rooms'), adaptive.get('rounds', 3), adaptive.get('refine', 1), workers=workers, outputs=outputs)
+    else:
+        run_sweep(design, seeds, usepath, workers=workers, outputs=outputs)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from accounting import add_monster_totals, empty_treasure
+
+
+def monster(magic_xp, magic_values):
+    return {
+        'has_treasure': True,
+        'treasure': empty_treasure(),
+        'valuations': {'gems': [], 'jewellery': [], 'magic_list': [], 'magic_xp': magic_xp, 'magic_values': magic_values},
+    }
+
+
+def test_magic_xp_totals_only_magic_xp():
+    accounting = {
+        'monster_treasure': empty_treasure(),
+        'monster_valuations': {'gems': [], 'jewellery': [], 'magic': [], 'magic_xp': [], 'magic_values': [], 'magic_list': []},
+    }
+    add_monster_totals(accounting, monster([400], [2000]))
+    add_monster_totals(accounting, monster([250, 100], [1500, 700]))
+    assert accounting['monster_valuations']['magic_xp'] == [400, 250, 100]
+    assert accounting['monster_valuations']['magic_values'] == [2000, 1500, 700]
@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from batch_stats import StatsSink
+
+
+def make_row(i):
+    return {'rooms': i, 'z': i % 3, 'monster_xp': 10 * i, 'wm_xp': 1, 'Total Gold Equivalent': 100.0 * i, 'seed': 1000 + i}
+
+
+def test_csv_resume_drops_torn_line(tmp_path):
+    path = str(tmp_path / 'stats.csv')
+    with StatsSink(path) as sink:
+        for i in range(3):
+            sink.add(make_row(i))
+
+    #a crash part way through the fourth row
+    with open(path, 'a', newline='') as fd:
+        fd.write('3,0,30')
+
+    with StatsSink(path, resume=True) as sink:
+        assert sink.stats['rooms'].count == 3
+        sink.add(make_row(4))
+        assert sink.stats['rooms'].count == 4
+        assert sink.stats['rooms'].mean == (0 + 1 + 2 + 4) / 4
+
+    with open(path, newline='') as fd:
+        rows = list(csv.DictReader(fd))
+    assert [int(row['rooms']) for row in rows] == [0, 1, 2, 4]
+    assert rows[-1]['seed'] == '1004'
+
+
+def test_csv_resume_skips_unparseable_values(tmp_path):
+    path = str(tmp_path / 'stats.csv')
+    with StatsSink(path) as sink:
+        sink.add(make_row(1))
+    with open(path, 'a', newline='') as fd:
+        fd.write('oops,,,,,\r\n')
+
+    with StatsSink(path, resume=True) as sink:
+        assert sink.stats['rooms'].count == 1
+
+
+def test_csv_without_resume_starts_over(tmp_path):
+    path = str(tmp_path / 'stats.csv')
+    with StatsSink(path) as sink:
+        sink.add(make_row(1))
+        sink.add(make_row(2))
+    with StatsSink(path) as sink:
+        sink.add(make_row(3))
+
+    with open(path, newline='') as fd:
+        rows = list(csv.DictReader(fd))
+    assert [int(row['rooms']) for row in rows] == [3]
+
+
+def test_columnar_resume_realigns_columns(tmp_path):
+    path = str(tmp_path / 'cols')
+    with StatsSink(path, fmt='columnar') as sink:
+        for i in range(3):
+            sink.add(make_row(i))
+
+    with open(os.path.join(path, 'schema.json')) as fd:
+        names = json.load(fd)
+
+    #a crash part way through the fourth row: only the first column got its value
+    with open(os.path.join(path, names[0] + '.f8'), 'ab') as fd:
+        fd.write(struct.pack('<d', 3.0))
+
+    with StatsSink(path, fmt='columnar', resume=True) as sink:
+        assert sink.stats['rooms'].count == 3
+        sink.add(make_row(4))
+
+    sizes = {os.path.getsize(os.path.join(path, name + '.f8')) for name in names}
+    assert sizes == {4 * 8}
+    with open(os.path.join(path, 'rooms.f8'), 'rb') as fd:
+        rooms = struct.unpack('<4d', fd.read())
+    assert rooms == (0.0, 1.0, 2.0, 4.0)
+
+
+def test_columnar_resume_after_partial_value(tmp_path):
+    path = str(tmp_path / 'cols')
+    with StatsSink(path, fmt='columnar') as sink:
+        sink.add(make_row(1))
+        sink.add(make_row(2))
+
+    with open(os.path.join(path, 'rooms.f8'), 'ab') as fd:
+        fd.write(b'\x00\x01\x02')
+
+    with StatsSink(path, fmt='columnar', resume=True) as sink:
+        assert sink.stats['rooms'].count == 2
+        assert sink.stats['rooms'].mean == 1.5
+    assert os.path.getsize(os.path.join(path, 'rooms.f8')) == 16
@@ -0,0 +1,47 @@
+import io
+import contextlib
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from export_3d import CLASS_CODES, EMPTY, MATERIALS, TRAP_CODES, simplify_fill
+from level_codes import ROCK
+
+
+def fill_class(fill):
+    return CLASS_CODES.get(simplify_fill(fill), EMPTY)
+
+
+def generated_fills(seeds, rolls):
+    from dungeon_simulation import dungeon_sim
+    from output_sinks import register_sink
+
+    fills = set()
+    register_sink('test_fills', finish=lambda run: fills.update(run['downlist'].fills))
+    for seed in seeds:
+        random.seed(seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            dungeon_sim('', '', rolls, 0, 0, 0, outputs=['test_fills'])
+    return fills - {ROCK}
+
+
+def test_feature_codes_have_a_class():
+    #every code the walk writes on its own square, alone, under a secret door and with a wandering monster
+    codes = TRAP_CODES + ['st', 'sn', 'ch', 'cm', 'wm']
+    for code in codes:
+        for fill in (code, code + 'sd', code + 'wm', code + 'sdsd'):
+            assert fill_class(fill) != EMPTY, fill
+    for code in TRAP_CODES:
+        assert fill_class(code) == fill_class(code + 'sd') == 7
+    assert fill_class('sn') == fill_class('st')
+
+
+def test_generated_fills_have_a_class():
+    fills = generated_fills([1, 5, 7], 400)
+    assert [fill for fill in sorted(fills) if fill_class(fill) == EMPTY] == []
+
+
+def test_every_class_has_a_material():
+    assert sorted(set(CLASS_CODES.values())) == sorted(MATERIALS)